@@ -1,7 +1,8 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify
 from datetime import datetime
 import json
 import atexit
+import multiprocessing
 from config import Config
 from services import (
     DatabaseService,
@@ -12,6 +13,10 @@ from services import (
     AuthService,
     get_scheduler
 )
+from services.audit_buffer import close_all_audit_buffers
+from services.connection_pool import close_all_pools
+from services.query_metrics import query_budget
+from services.tariff_simulation import TariffScenario, load_billing_history, simulate_tariffs
 from utils.retry_decorator import handle_api_errors
 from utils.logger import setup_logger, LogContext
 
@@ -30,21 +35,48 @@ payment_service = PaymentService()
 whatsapp_service = WhatsAppService()
 auth_service = AuthService()
 
-# Initialize scheduler
-scheduler = get_scheduler()
-scheduler.start()
-logger.info("Billing scheduler started")
+# Initialize scheduler. Billing shard workers are spawned processes,
+# which re-import this module as __mp_main__ under `python app.py`; they
+# must not start a scheduler of their own.
+scheduler = None
+if multiprocessing.parent_process() is None:
+    scheduler = get_scheduler()
+    scheduler.start()
+    logger.info("Billing scheduler started")
 
 # Ensure scheduler stops on app shutdown
 def shutdown_scheduler():
-    logger.info("Shutting down scheduler...")
-    scheduler.stop()
+    if scheduler is not None:
+        logger.info("Shutting down scheduler...")
+        scheduler.stop()
+    close_all_audit_buffers()
+    close_all_pools()
 
 atexit.register(shutdown_scheduler)
 
 logger.info("All services initialized successfully")
 
 
+# Query budget per request: logs a warning when a request issues more
+# than QUERY_BUDGET_MAX_QUERIES queries or repeats one query shape
+# (N+1) QUERY_BUDGET_REPEAT_THRESHOLD times or more.
+@app.before_request
+def start_query_budget():
+    g.query_budget = query_budget(
+        f"{request.method} {request.path}",
+        max_queries=Config.QUERY_BUDGET_MAX_QUERIES or None,
+        repeat_threshold=Config.QUERY_BUDGET_REPEAT_THRESHOLD,
+    )
+    g.query_budget.__enter__()
+
+
+@app.teardown_request
+def finish_query_budget(error=None):
+    budget = g.pop('query_budget', None)
+    if budget is not None:
+        budget.__exit__(None, None, None)
+
+
 @app.route('/webhook/meter-reading', methods=['POST'])
 @handle_api_errors
 def process_meter_reading():
@@ -125,13 +157,19 @@ def process_meter_reading():
         connected_load = data.get('connected_load_kw', 7.0)  # Default 7KW
         tariff_type = data.get('tariff_type', 'residential')
         
+        motor_allocation = db_service.get_flat_motor_allocation(
+            reading_date, meter_id=meter_id, customer_id=customer_id
+        )
+        
         bill_calculation = ai_service.calculate_bill(
             current_reading=reading_value,
             previous_reading=previous_reading,
             meter_id=meter_id,
             customer_id=customer_id,
             connected_load_kw=connected_load,
-            tariff_type=tariff_type
+            tariff_type=tariff_type,
+            motor_units=motor_allocation.get('motor_units', 0.0),
+            total_flat_units_for_motor=motor_allocation.get('total_flat_units_for_motor', 0.0)
         )
         
         # Step 6: Store bill in database
@@ -226,7 +264,21 @@ def process_meter_reading():
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    return jsonify({"status": "healthy", "service": "billing-api"}), 200
+    return jsonify({
+        "status": "healthy",
+        "service": "billing-api",
+        "db_pool": db_service.get_pool_stats(),
+        "db_cache": db_service.get_cache_stats(),
+        "audit_buffer": db_service.audit.stats()
+    }), 200
+
+
+@app.route('/metrics', methods=['GET'])
+def query_metrics():
+    """Database query metrics (Prometheus text, or JSON with ?format=json)"""
+    if request.args.get('format') == 'json':
+        return jsonify(db_service.get_query_metrics()), 200
+    return Response(db_service.metrics.prometheus(), mimetype='text/plain; version=0.0.4')
 
 
 @app.route('/webhook/meter-reading/test', methods=['GET'])
@@ -239,7 +291,9 @@ def test_endpoint():
             "bill_status": "/api/bills/<bill_id> (GET)",
             "customer_bills": "/api/bills/customer/<customer_id> (GET)",
             "stripe_webhook": "/webhook/stripe (POST)",
-            "health": "/health (GET)"
+            "tariff_simulation": "/api/tariffs/simulate (POST)",
+            "health": "/health (GET)",
+            "metrics": "/metrics (GET)"
         }
     }), 200
 
@@ -461,16 +515,53 @@ def update_bill_status_manual(bill_id):
     }), 200
 
 
+@app.route('/api/tariffs/simulate', methods=['POST'])
+@handle_api_errors
+def simulate_tariff_changes():
+    """Replay past readings against candidate tariffs (what-if revenue)"""
+    data = request.json or {}
+    try:
+        scenarios = [TariffScenario.from_dict(item) for item in data.get('scenarios') or []]
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if not scenarios:
+        return jsonify({"error": "Provide at least one scenario"}), 400
+
+    # Scenarios take milliseconds, so the API runs them in-process unless
+    # asked otherwise; worker processes are capped (and spawned fresh by
+    # simulate_tariffs rather than forked from this threaded server).
+    max_workers = data.get('max_workers', 0)
+    if isinstance(max_workers, bool) or not isinstance(max_workers, int) or max_workers < 0:
+        return jsonify({"error": "max_workers must be a non-negative integer"}), 400
+    max_workers = min(max_workers, Config.TARIFF_SIMULATION_MAX_WORKERS)
+
+    logger.info(f"Simulating {len(scenarios)} tariff scenarios (max_workers={max_workers})")
+    history = load_billing_history(db_service)
+    report = simulate_tariffs(history, scenarios, max_workers=max_workers)
+
+    return jsonify({
+        "success": True,
+        **report
+    }), 200
+
+
 @app.route('/api/scheduler/status', methods=['GET'])
 @handle_api_errors
 def get_scheduler_status():
-    """Get status of all scheduled jobs"""
+    """Get status of all scheduled jobs
+
+    Each job includes its recent runs (``?history=N``, default 10) with
+    duration, items, latency percentiles and stage breakdown, plus the
+    change against the previous run.
+    """
     logger.debug("Fetching scheduler status")
-    jobs = scheduler.get_job_status()
+    history = max(0, min(request.args.get('history', 10, type=int), 100))
+    jobs = scheduler.get_job_status(history=history)
     
     return jsonify({
         "success": True,
         "scheduler_running": scheduler.scheduler.running,
+        "leader": scheduler.leader_status(),
         "jobs": jobs
     }), 200
 
@@ -478,9 +569,16 @@ def get_scheduler_status():
 @app.route('/api/scheduler/jobs/<job_id>/run', methods=['POST'])
 @handle_api_errors
 def run_scheduled_job(job_id):
-    """Manually trigger a scheduled job"""
-    logger.info(f"Manually triggering job: {job_id}")
-    result = scheduler.run_job_now(job_id)
+    """Manually trigger a scheduled job
+
+    ``resume`` (query string or JSON body, default true) continues the
+    unfinished billing run for the period instead of starting a new one.
+    """
+    data = request.get_json(silent=True) or {}
+    resume = data.get('resume', request.args.get('resume', 'true'))
+    resume = resume if isinstance(resume, bool) else str(resume).lower() != 'false'
+    logger.info(f"Manually triggering job: {job_id} (resume={resume})")
+    result = scheduler.run_job_now(job_id, resume=resume)
     
     if result['success']:
         return jsonify(result), 200
@@ -14,6 +14,12 @@ class Config:
     SUPABASE_URL = os.getenv('SUPABASE_URL', '')
     SUPABASE_KEY = os.getenv('SUPABASE_KEY', '')
 
+    # Database backend: 'supabase', 'postgres', 'local' (embedded SQLite
+    # built from database/supabase_schema.sql) or empty to pick Supabase
+    # when SUPABASE_URL is set and PostgreSQL otherwise
+    DATABASE_BACKEND = os.getenv('DATABASE_BACKEND', '').lower()
+    LOCAL_DATABASE_PATH = os.getenv('LOCAL_DATABASE_PATH', 'data/local_billing.db')
+
     # Cloudinary
     CLOUDINARY_URL = os.getenv('CLOUDINARY_URL', '')
     CLOUDINARY_UPLOAD_PRESET = os.getenv('CLOUDINARY_UPLOAD_PRESET', '')
@@ -25,6 +31,60 @@ class Config:
     POSTGRES_DB = os.getenv('POSTGRES_DB', 'billing_db')
     POSTGRES_USER = os.getenv('POSTGRES_USER', 'postgres')
     POSTGRES_PASSWORD = os.getenv('POSTGRES_PASSWORD', '')
+    POSTGRES_POOL_MIN_SIZE = int(os.getenv('POSTGRES_POOL_MIN_SIZE', '1'))
+    POSTGRES_POOL_MAX_SIZE = int(os.getenv('POSTGRES_POOL_MAX_SIZE', '10'))
+    POSTGRES_POOL_MAX_LIFETIME_SECONDS = float(os.getenv('POSTGRES_POOL_MAX_LIFETIME_SECONDS', '1800'))
+    POSTGRES_POOL_HEALTH_CHECK_SECONDS = float(os.getenv('POSTGRES_POOL_HEALTH_CHECK_SECONDS', '30'))
+    POSTGRES_POOL_ACQUIRE_TIMEOUT_SECONDS = float(os.getenv('POSTGRES_POOL_ACQUIRE_TIMEOUT_SECONDS', '30'))
+
+    # Identity registry (meters/flats/floors/flat_types alias index)
+    IDENTITY_REGISTRY_TTL_SECONDS = float(os.getenv('IDENTITY_REGISTRY_TTL_SECONDS', '300'))
+    QUERY_CACHE_ENABLED = os.getenv('QUERY_CACHE_ENABLED', 'true').lower() == 'true'
+    QUERY_CACHE_MAX_ENTRIES = int(os.getenv('QUERY_CACHE_MAX_ENTRIES', '2048'))
+    QUERY_CACHE_BILL_TTL_SECONDS = float(os.getenv('QUERY_CACHE_BILL_TTL_SECONDS', '60'))
+    QUERY_CACHE_METER_TTL_SECONDS = float(os.getenv('QUERY_CACHE_METER_TTL_SECONDS', '300'))
+    QUERY_CACHE_READING_TTL_SECONDS = float(os.getenv('QUERY_CACHE_READING_TTL_SECONDS', '60'))
+    QUERY_CACHE_AGGREGATE_TTL_SECONDS = float(os.getenv('QUERY_CACHE_AGGREGATE_TTL_SECONDS', '30'))
+
+    # Per-query instrumentation and per-request query budgets
+    QUERY_METRICS_ENABLED = os.getenv('QUERY_METRICS_ENABLED', 'true').lower() == 'true'
+    QUERY_BUDGET_MAX_QUERIES = int(os.getenv('QUERY_BUDGET_MAX_QUERIES', '25'))
+    QUERY_BUDGET_REPEAT_THRESHOLD = int(os.getenv('QUERY_BUDGET_REPEAT_THRESHOLD', '5'))
+
+    # Write-behind batching for notifications/payment_events audit rows
+    AUDIT_WRITE_BEHIND_ENABLED = os.getenv('AUDIT_WRITE_BEHIND_ENABLED', 'true').lower() == 'true'
+    AUDIT_BATCH_SIZE = int(os.getenv('AUDIT_BATCH_SIZE', '100'))
+    AUDIT_FLUSH_INTERVAL_SECONDS = float(os.getenv('AUDIT_FLUSH_INTERVAL_SECONDS', '2'))
+    AUDIT_SPILL_DIR = os.getenv('AUDIT_SPILL_DIR', 'data/audit_spill')
+
+    # Monthly billing pipeline: worker threads per stage and queue bound
+    BILLING_PIPELINE_READ_WORKERS = int(os.getenv('BILLING_PIPELINE_READ_WORKERS', '8'))
+    BILLING_PIPELINE_WRITE_WORKERS = int(os.getenv('BILLING_PIPELINE_WRITE_WORKERS', '4'))
+    BILLING_PIPELINE_PAYMENT_WORKERS = int(os.getenv('BILLING_PIPELINE_PAYMENT_WORKERS', '4'))
+    BILLING_PIPELINE_NOTIFY_WORKERS = int(os.getenv('BILLING_PIPELINE_NOTIFY_WORKERS', '4'))
+    BILLING_PIPELINE_QUEUE_SIZE = int(os.getenv('BILLING_PIPELINE_QUEUE_SIZE', '50'))
+    # Shard monthly billing by block across worker processes (1 = run in
+    # the scheduler process); each process runs its own pipeline with the
+    # worker counts above. Smaller runs stay in-process.
+    BILLING_SHARD_PROCESSES = int(os.getenv('BILLING_SHARD_PROCESSES', '1'))
+    BILLING_SHARD_MIN_METERS = int(os.getenv('BILLING_SHARD_MIN_METERS', '200'))
+
+    # Upper bound on worker processes for POST /api/tariffs/simulate
+    TARIFF_SIMULATION_MAX_WORKERS = int(os.getenv('TARIFF_SIMULATION_MAX_WORKERS', '4'))
+
+    # Scheduler leader election: only the lease holder runs cron jobs.
+    # 'file' coordinates processes on one host, 'postgres' uses an
+    # advisory lock (any host), 'none' runs jobs in every process.
+    SCHEDULER_LOCK_BACKEND = os.getenv('SCHEDULER_LOCK_BACKEND', 'file').lower()
+    SCHEDULER_LOCK_PATH = os.getenv('SCHEDULER_LOCK_PATH', 'data/scheduler.lock')
+    SCHEDULER_LEASE_SECONDS = float(os.getenv('SCHEDULER_LEASE_SECONDS', '15'))
+
+    # Weekly smart-meter polling: requests in flight, per-host request
+    # rate, per-attempt timeout and attempts per meter
+    SMART_METER_POLL_CONCURRENCY = int(os.getenv('SMART_METER_POLL_CONCURRENCY', '50'))
+    SMART_METER_POLL_RATE_PER_HOST = float(os.getenv('SMART_METER_POLL_RATE_PER_HOST', '10'))
+    SMART_METER_POLL_TIMEOUT_SECONDS = float(os.getenv('SMART_METER_POLL_TIMEOUT_SECONDS', '10'))
+    SMART_METER_POLL_MAX_ATTEMPTS = int(os.getenv('SMART_METER_POLL_MAX_ATTEMPTS', '3'))
     
     # Neo4j
     NEO4J_URI = os.getenv('NEO4J_URI', 'bolt://localhost:7687')
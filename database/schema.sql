@@ -29,7 +29,8 @@ CREATE TABLE IF NOT EXISTS bills (
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     INDEX idx_customer_id (customer_id),
     INDEX idx_meter_id (meter_id),
-    INDEX idx_status (status)
+    INDEX idx_status (status),
+    INDEX idx_status_period_end (status, billing_period_end)
 );
 
 -- Table: notifications
@@ -128,6 +128,66 @@ create unique index if not exists bills_flat_id_billing_period_start_key
 
 create index if not exists idx_bills_status on public.bills(status);
 create index if not exists idx_bills_created_at on public.bills(created_at);
+-- Reminder/overdue windows: pending bills by due date
+create index if not exists idx_bills_status_due_date on public.bills(status, due_date, id);
+create index if not exists idx_bills_flat_reading_id on public.bills(flat_reading_id);
+create index if not exists idx_bills_motor_reading_id on public.bills(motor_reading_id);
+
+-- Keyset pagination over readings walks (reading_date, id)
+create index if not exists idx_readings_reading_date_id on public.readings(reading_date, id);
+
+-- Readings not referenced by any bill, either as the flat reading or as
+-- the motor reading. Used by DatabaseService.get_unbilled_readings so the
+-- anti-join runs in Postgres instead of downloading every bill.
+create or replace view public.unbilled_readings as
+select r.*
+from public.readings r
+where not exists (select 1 from public.bills b where b.flat_reading_id = r.id)
+  and not exists (select 1 from public.bills b where b.motor_reading_id = r.id);
+
+-- Bill counts and amounts grouped by status, optionally restricted to a
+-- created_at window. Lets dashboards read counters without fetching rows.
+create or replace function public.bill_status_summary(
+    p_from timestamptz default null,
+    p_to timestamptz default null
+)
+returns table (status text, bill_count bigint, total_amount numeric)
+language sql
+stable
+as $$
+    select b.status, count(*)::bigint, coalesce(sum(b.total_amount), 0)
+    from public.bills b
+    where (p_from is null or b.created_at >= p_from)
+      and (p_to is null or b.created_at < p_to)
+    group by b.status;
+$$;
+
+-- Readings that can precede a batch of new readings: for each meter, the
+-- latest reading before p_from plus every reading in [p_from, p_to).
+-- Lets DatabaseService.insert_meter_readings_bulk compute consumption for
+-- a whole batch with one request.
+create or replace function public.readings_before_batch(
+    p_meter_ids bigint[],
+    p_from date,
+    p_to date
+)
+returns table (id bigint, meter_id bigint, reading_date date, reading_value numeric)
+language sql
+stable
+as $$
+    select * from (
+        select distinct on (r.meter_id) r.id, r.meter_id, r.reading_date, r.reading_value
+        from public.readings r
+        where r.meter_id = any(p_meter_ids) and r.reading_date < p_from
+        order by r.meter_id, r.reading_date desc, r.id desc
+    ) latest
+    union all
+    select r.id, r.meter_id, r.reading_date, r.reading_value
+    from public.readings r
+    where r.meter_id = any(p_meter_ids)
+      and r.reading_date >= p_from
+      and r.reading_date < p_to;
+$$;
 
 -- Notifications (Discord/WhatsApp audit log)
 create table if not exists public.notifications (
@@ -162,4 +222,78 @@ create table if not exists public.payment_events (
 create index if not exists idx_payment_events_bill_id on public.payment_events(bill_id);
 create index if not exists idx_payment_events_stripe_event_id on public.payment_events(stripe_event_id);
 
+-- Checkpointed scheduler runs. One row per run of a job for a period
+-- (e.g. monthly_bill_generation / 2026-01) and one checkpoint row per
+-- meter, so a restarted run resumes only the unfinished meters.
+create table if not exists public.billing_runs (
+    id bigint generated by default as identity primary key,
+    job_id text not null,
+    period text not null,
+    status text not null default 'running',
+    attempts integer not null default 1,
+    summary jsonb,
+    started_at timestamptz not null default now(),
+    finished_at timestamptz,
+    updated_at timestamptz
+);
+
+create index if not exists idx_billing_runs_job_period on public.billing_runs(job_id, period);
+
+-- state: pending -> billed -> linked -> notified (or skipped/failed).
+-- idempotency_key is job:period:meter; it is shared by every run of the
+-- same period so a forced rerun reuses bills instead of inserting again.
+create table if not exists public.billing_run_items (
+    id bigint generated by default as identity primary key,
+    run_id bigint not null references public.billing_runs(id) on delete cascade,
+    meter_id text not null,
+    idempotency_key text not null,
+    state text not null default 'pending',
+    bill_id bigint references public.bills(id) on delete set null,
+    amount numeric,
+    due_date date,
+    payment_link_id text,
+    payment_link text,
+    error text,
+    updated_at timestamptz
+);
+
+create unique index if not exists billing_run_items_run_id_meter_id_key
+    on public.billing_run_items(run_id, meter_id);
+create index if not exists idx_billing_run_items_idempotency_key on public.billing_run_items(idempotency_key);
+
+-- Scheduler job run history: one row per execution of any job, with
+-- item counts, per-item latency percentiles and the pipeline stage
+-- breakdown, so slowdowns show up month over month.
+create table if not exists public.scheduler_job_runs (
+    id bigint generated by default as identity primary key,
+    job_id text not null,
+    trigger text not null default 'cron',
+    status text not null,
+    host text,
+    started_at timestamptz not null,
+    finished_at timestamptz not null,
+    duration_seconds numeric not null default 0,
+    items_processed integer not null default 0,
+    items_failed integer not null default 0,
+    latency_p50_ms numeric,
+    latency_p90_ms numeric,
+    latency_p99_ms numeric,
+    latency_max_ms numeric,
+    stages jsonb,
+    summary jsonb,
+    error text
+);
+
+create index if not exists idx_scheduler_job_runs_job_started
+    on public.scheduler_job_runs(job_id, started_at);
+
+-- Cron firings claimed by the scheduler leader (SCHEDULER_LOCK_BACKEND=
+-- postgres), keyed by job id and scheduled time, so a firing handed over
+-- with the lease is not run again by the next leader.
+create table if not exists public.scheduler_job_claims (
+    claim_key text primary key,
+    owner text not null,
+    claimed_at timestamptz not null default now()
+);
+
 commit;
@@ -36,9 +36,14 @@ with tab1:
         
         # Top 4 Metrics
         try:
-            all_bills = db.get_all_bills()
-            pending = db.get_pending_bills_count()
-            invoices = len([b for b in all_bills if b.get('status')=='pending'])
+            # Independent queries, loaded concurrently (adb = AsyncDatabaseService(db))
+            kpis = adb.gather_sync(
+                bill_summary=lambda: adb.get_bill_status_summary(),
+                pending=lambda: adb.get_pending_bills_count(),
+            )
+            bill_summary = kpis['bill_summary']
+            pending = kpis['pending']
+            invoices = bill_summary.get('pending', {}).get('count', 0)
             overdue = 0  # Can calculate if needed
         except:
             pending = invoices = overdue = 0
@@ -95,8 +100,8 @@ with tab1:
             
             st.markdown('<br><div class="sh">📊 Status</div>', unsafe_allow_html=True)
             try:
-                payments = sum([b.get('amount',0) for b in all_bills if b.get('status')=='paid'])
-                outstanding = sum([b.get('amount',0) for b in all_bills if b.get('status')=='pending'])
+                payments = bill_summary.get('paid', {}).get('total_amount', 0)
+                outstanding = bill_summary.get('pending', {}).get('total_amount', 0)
             except:
                 payments = outstanding = 0
             
@@ -0,0 +1,61 @@
+"""
+Exercise the psycopg2 connection pool against a real PostgreSQL server.
+
+Point POSTGRES_HOST/POSTGRES_DB/... (or POSTGRES_CONNECTION_STRING) at a
+local database and leave SUPABASE_URL unset, then run:
+
+    python scripts/check_connection_pool.py --threads 20 --queries 50
+"""
+import sys
+import os
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.database_service import DatabaseService
+
+
+def run_queries(db: DatabaseService, count: int) -> int:
+    done = 0
+    for _ in range(count):
+        with db.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+                cur.fetchone()
+        done += 1
+    return done
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the PostgreSQL connection pool")
+    parser.add_argument("--threads", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=50, help="queries per thread")
+    args = parser.parse_args()
+
+    db = DatabaseService()
+    if db.use_supabase:
+        print("SUPABASE_URL is set - unset it to test the PostgreSQL pool.")
+        sys.exit(1)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        total = sum(executor.map(lambda _: run_queries(db, args.queries), range(args.threads)))
+    elapsed = time.perf_counter() - started
+
+    stats = db.get_pool_stats()
+    print(f"Ran {total} queries on {args.threads} threads in {elapsed:.2f}s")
+    print(f"Connections opened: {stats['created']} (max_size={stats['max_size']})")
+    print(f"Acquisitions that waited: {stats['waited']}/{stats['acquired']}")
+    print(f"Wait avg/max: {stats['wait_seconds_avg'] * 1000:.1f}ms / {stats['wait_seconds_max'] * 1000:.1f}ms")
+    print(f"Discarded: {stats['discarded']}, health check failures: {stats['health_check_failures']}")
+
+    if stats['created'] > stats['max_size'] + stats['discarded']:
+        print("FAILURE: pool opened more connections than max_size allows")
+        sys.exit(1)
+    print("SUCCESS: pool stayed within its bounds")
+
+
+if __name__ == "__main__":
+    main()
@@ -31,6 +31,7 @@ def import_readings_with_metadata():
         imported_count = 0
         skipped_count = 0
         errors = []
+        pending = []
         
         # Use current date for all readings
         current_date = datetime.now().strftime("%Y-%m-%d")
@@ -69,27 +70,33 @@ def import_readings_with_metadata():
                     "created_at": datetime.now().isoformat()
                 }
                 
-                # Insert to Supabase
-                try:
-                    result = db.insert_meter_reading(reading_data)
-                    
-                    if result:
-                        imported_count += 1
-                        if units_consumed > 0:
-                            logger.info(f"  ✓ {unit_id} - {client_name[:30]} - {units_consumed} kWh")
-                        else:
-                            if imported_count <= 5:  # Only log first few zeros
-                                logger.info(f"  ✓ {unit_id} - {client_name[:30]} - 0 kWh")
-                except Exception as insert_error:
-                    errors.append(f"{unit_id}: {str(insert_error)}")
-                    logger.warning(f"  ⚠ Skipped {unit_id}: {str(insert_error)}")
-                    continue
+                pending.append(reading_data)
                     
             except Exception as e:
                 errors.append(f"Row {idx}: {str(e)}")
                 logger.warning(f"  ⚠ Skipped row {idx}: {str(e)}")
                 continue
         
+        # Insert to Supabase in chunked batches (one previous-reading
+        # lookup for the whole batch instead of one per row)
+        outcomes = db.insert_meter_readings_bulk(pending)
+        for reading_data, outcome in zip(pending, outcomes):
+            unit_id = reading_data["unit_id"]
+            client_name = reading_data["client_name"] or ""
+            units_consumed = reading_data["reading_value"]
+            
+            if outcome["status"] == "error":
+                errors.append(f"{unit_id}: {outcome.get('message')}")
+                logger.warning(f"  ⚠ Skipped {unit_id}: {outcome.get('message')}")
+                continue
+            
+            imported_count += 1
+            if units_consumed > 0:
+                logger.info(f"  ✓ {unit_id} - {client_name[:30]} - {units_consumed} kWh")
+            else:
+                if imported_count <= 5:  # Only log first few zeros
+                    logger.info(f"  ✓ {unit_id} - {client_name[:30]} - 0 kWh")
+        
         logger.info("\n" + "=" * 60)
         logger.info(f"✓ Import completed!")
         logger.info(f"  - Total rows processed: {len(df)}")
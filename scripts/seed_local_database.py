@@ -0,0 +1,131 @@
+"""
+Seed the embedded local database with realistic synthetic data.
+
+Creates blocks of flats (GF/FF/SF) that share a water motor, one meter
+per flat and per motor, and monthly readings with plausible consumption,
+so load tests and benchmarks can run against DATABASE_BACKEND=local:
+
+    python scripts/seed_local_database.py --blocks 200 --months 24
+    DATABASE_BACKEND=local python scripts/seed_local_database.py --generate-bills
+"""
+import sys
+import os
+import argparse
+import random
+import time
+from datetime import date
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from services.local_backend import create_local_client
+
+FLOORS = [('GF', 'Ground Floor'), ('FF', 'First Floor'), ('SF', 'Second Floor')]
+FLAT_TYPES = [('2BHK', 1200), ('3BHK', 1600), ('4BHK', 1890), ('5BHK', 2300)]
+
+
+def month_starts(months: int, end: date):
+    year, month = end.year, end.month
+    starts = []
+    for _ in range(months):
+        starts.append(date(year, month, 1))
+        month -= 1
+        if month == 0:
+            year, month = year - 1, 12
+    return list(reversed(starts))
+
+
+def month_end(start: date) -> date:
+    next_month = date(start.year + start.month // 12, start.month % 12 + 1, 1)
+    return date.fromordinal(next_month.toordinal() - 1)
+
+
+def seed(path: str, blocks: int, months: int, seed_value: int) -> dict:
+    rng = random.Random(seed_value)
+    client = create_local_client(path)
+    if client.query('SELECT id FROM flats LIMIT 1'):
+        print(f"{path} already has flats - delete it to reseed.")
+        sys.exit(1)
+
+    client.bulk_insert('floors', [{'code': code, 'name': name} for code, name in FLOORS])
+    client.bulk_insert('flat_types', [{'name': name, 'monthly_fee': fee} for name, fee in FLAT_TYPES])
+    floor_ids = {r['code']: r['id'] for r in client.query('SELECT id, code FROM floors')}
+    type_ids = [r['id'] for r in client.query('SELECT id FROM flat_types ORDER BY id')]
+
+    client.bulk_insert('motors', [
+        {'name': f"Motor B{b}", 'description': f"Water motor for block B{b}", 'horsepower': 1.5}
+        for b in range(1, blocks + 1)
+    ])
+    motor_ids = [r['id'] for r in client.query('SELECT id FROM motors ORDER BY id')]
+
+    flats = []
+    for b in range(1, blocks + 1):
+        flat_type = rng.choice(type_ids)
+        for floor_code, _ in FLOORS:
+            flats.append({'code': f"B{b}-{floor_code}", 'floor_id': floor_ids[floor_code], 'type_id': flat_type})
+    client.bulk_insert('flats', flats)
+    flat_rows = client.query('SELECT id, code FROM flats ORDER BY id')
+
+    client.bulk_insert('owners', [{'name': f"Owner of {f['code']}"} for f in flat_rows])
+    owner_ids = [r['id'] for r in client.query('SELECT id FROM owners ORDER BY id')]
+    client.bulk_insert('flat_owners', [
+        {'flat_id': f['id'], 'owner_id': o, 'is_primary': True} for f, o in zip(flat_rows, owner_ids)
+    ])
+    client.bulk_insert('flat_motors', [
+        {'flat_id': f['id'], 'motor_id': motor_ids[i // len(FLOORS)]} for i, f in enumerate(flat_rows)
+    ])
+
+    meters = [{'meter_number': f"{20000000 + f['id']}", 'flat_id': f['id'], 'motor_id': None, 'status': 'active'}
+              for f in flat_rows]
+    meters += [{'meter_number': f"M{90000000 + m}", 'flat_id': None, 'motor_id': m, 'status': 'active'}
+               for m in motor_ids]
+    client.bulk_insert('meters', meters)
+    meter_rows = client.query('SELECT id, flat_id FROM meters ORDER BY id')
+
+    # Cumulative readings on the first of each month; consumption is the
+    # delta since the previous reading (motor meters use far less).
+    readings = []
+    for meter in meter_rows:
+        value = rng.uniform(1000, 20000)
+        base = rng.uniform(120, 450) if meter['flat_id'] else rng.uniform(40, 120)
+        for start in month_starts(months, date.today()):
+            consumption = round(max(base * rng.uniform(0.6, 1.4), 0), 2)
+            value = round(value + consumption, 2)
+            readings.append({
+                'meter_id': meter['id'],
+                'reading_date': start.isoformat(),
+                'reading_value': value,
+                'consumption': consumption,
+            })
+    client.bulk_insert('readings', readings)
+
+    return {'flats': len(flat_rows), 'meters': len(meter_rows), 'readings': len(readings)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed the local SQLite billing database")
+    parser.add_argument("--path", default=Config.LOCAL_DATABASE_PATH)
+    parser.add_argument("--blocks", type=int, default=100, help="blocks of three flats sharing a motor")
+    parser.add_argument("--months", type=int, default=12, help="monthly readings per meter")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--generate-bills", action="store_true",
+                        help="run generate_bills_for_month for the latest month afterwards")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    counts = seed(args.path, args.blocks, args.months, args.seed)
+    print(f"Seeded {args.path}: {counts} in {time.perf_counter() - started:.2f}s")
+
+    if args.generate_bills:
+        start = month_starts(1, date.today())[0]
+        started = time.perf_counter()
+        response = create_local_client(args.path).rpc('generate_bills_for_month', {
+            'p_billing_period_start': start.isoformat(),
+            'p_billing_period_end': month_end(start).isoformat(),
+            'p_due_date': month_end(start).isoformat(),
+        }).execute()
+        print(f"Generated {len(response.data)} bills in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+What-if tariff simulation over the full reading history.
+
+Replays every past month of readings against one or more candidate
+pricing scenarios (in parallel worker processes) and prints the revenue
+impact against current pricing, per month and per flat type.
+
+    python scripts/simulate_tariffs.py \\
+        --scenario '{"name": "13 rupees", "rates": {"12": 13}}' \\
+        --scenario '{"name": "5BHK 2500", "bhk_fixed": {"5": 2500}}'
+    python scripts/simulate_tariffs.py --scenarios-file scenarios.json --output report.json
+
+A scenarios file holds a JSON list of scenario objects.
+"""
+import sys
+import os
+import argparse
+import json
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.database_service import DatabaseService
+from services.tariff_simulation import TariffScenario, load_billing_history, simulate_tariffs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate candidate tariffs against past readings")
+    parser.add_argument("--scenario", action="append", default=[], help="Scenario as a JSON object (repeatable)")
+    parser.add_argument("--scenarios-file", help="JSON file with a list of scenarios")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count, 0 = in-process)")
+    parser.add_argument("--output", help="Write the full JSON report to this file")
+    args = parser.parse_args()
+
+    raw = [json.loads(s) for s in args.scenario]
+    if args.scenarios_file:
+        with open(args.scenarios_file, "r", encoding="utf-8") as f:
+            raw.extend(json.load(f))
+    if not raw:
+        parser.error("Give at least one --scenario or --scenarios-file")
+    scenarios = [TariffScenario.from_dict(item) for item in raw]
+
+    started = time.perf_counter()
+    history = load_billing_history(DatabaseService())
+    loaded = time.perf_counter()
+    report = simulate_tariffs(history, scenarios, max_workers=args.workers)
+    finished = time.perf_counter()
+
+    print(f"History: {report['flat_months']} flat-months, {len(report['months'])} months "
+          f"(loaded in {loaded - started:.2f}s, simulated in {finished - loaded:.2f}s)")
+    print(f"Baseline revenue: ₹{report['baseline_revenue']:,.2f}")
+    print("=" * 72)
+    for scenario in report["scenarios"]:
+        pct = f"{scenario['delta_pct']:+.2f}%" if scenario["delta_pct"] is not None else "n/a"
+        print(f"{scenario['name']}: ₹{scenario['revenue']:,.2f} (delta ₹{scenario['delta']:+,.2f}, {pct})")
+        by_type = {}
+        for cell in scenario["by_month"]:
+            by_type[cell["flat_type"]] = by_type.get(cell["flat_type"], 0.0) + cell["delta"]
+        for flat_type, delta in sorted(by_type.items()):
+            print(f"    {flat_type:<10} delta ₹{delta:+,.2f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Full report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Local HTTP stand-in for smart-meter endpoints.
+
+Serves ``GET /meters/<meter_id>`` with a JSON reading after a
+configurable delay, and fails a share of requests (HTTP 503 or a hang
+past the client timeout) so the collector's timeouts and retries can be
+exercised without real meters:
+
+    python scripts/smart_meter_standin.py --port 8765 --latency 0.2 --error-rate 0.1
+
+Meters then use ``api_endpoint = http://127.0.0.1:8765/meters/<meter_id>``.
+The server also records peak concurrency and request times per Host header.
+"""
+import sys
+import argparse
+import json
+import random
+import threading
+import time
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StandInStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.failures_served = 0
+        self.request_times = {}
+
+    def enter(self, host: str) -> None:
+        with self.lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            self.request_times.setdefault(host, []).append(time.monotonic())
+
+    def leave(self) -> None:
+        with self.lock:
+            self.in_flight -= 1
+
+
+def make_server(port: int = 0, latency: float = 0.1, error_rate: float = 0.0, hang_rate: float = 0.0,
+                hang_seconds: float = 30.0, seed: int = 7) -> ThreadingHTTPServer:
+    """Build (not start) a stand-in server; ``server.stats`` holds the counters"""
+    rng = random.Random(seed)
+    rng_lock = threading.Lock()
+    stats = StandInStats()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            stats.enter(self.headers.get('Host', ''))
+            try:
+                parts = self.path.strip('/').split('/')
+                if len(parts) != 2 or parts[0] != 'meters':
+                    self._send(404, {'error': 'not found'})
+                    return
+                with rng_lock:
+                    roll = rng.random()
+                    value = round(rng.uniform(1000, 5000), 2)
+                if roll < hang_rate:
+                    time.sleep(hang_seconds)
+                    return
+                time.sleep(latency)
+                if roll < hang_rate + error_rate:
+                    with stats.lock:
+                        stats.failures_served += 1
+                    self._send(503, {'error': 'meter busy'})
+                    return
+                self._send(200, {
+                    'meter_id': parts[1],
+                    'reading_value': value,
+                    'reading_date': date.today().isoformat(),
+                })
+            finally:
+                stats.leave()
+
+        def _send(self, status: int, payload: dict) -> None:
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    server.daemon_threads = True
+    server.stats = stats
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve fake smart-meter readings over HTTP")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.1, help="Seconds before each response")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Share of requests answered with 503")
+    parser.add_argument('--hang-rate', type=float, default=0.0, help="Share of requests that never answer in time")
+    args = parser.parse_args()
+
+    server = make_server(args.port, args.latency, args.error_rate, args.hang_rate)
+    print(f"Smart-meter stand-in on http://127.0.0.1:{server.server_address[1]}/meters/<meter_id>")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -35,19 +35,11 @@ def sync_bills():
         logger.error(f"Failed to initialize services: {e}")
         return
 
-    # Fetch all bills from Supabase
-    try:
-        logger.info("Fetching bills from Supabase...")
-        bills = db_service.get_all_bills(limit=10000)
-        logger.info(f"Retrieved {len(bills)} bills from Supabase")
-        
-        if not bills:
-            logger.warning("No bills found in Supabase. Nothing to sync.")
-            return
-            
-    except Exception as e:
-        logger.error(f"Failed to fetch bills from Supabase: {e}")
-        return
+    # Stream bills from Supabase page by page. The generator fetches
+    # lazily, so fetch errors surface in the sync result below and
+    # leave the existing Neo4j bills in place.
+    logger.info("Streaming bills from Supabase...")
+    bills = db_service.iter_bills(page_size=1000)
 
     # Sync to Neo4j
     try:
@@ -33,19 +33,11 @@ def sync_readings():
         logger.error(f"Failed to initialize services: {e}")
         return
 
-    # Fetch all readings from Supabase
-    try:
-        logger.info("Fetching readings from Supabase...")
-        readings = db_service.get_all_readings(limit=10000)
-        logger.info(f"Retrieved {len(readings)} readings from Supabase")
-        
-        if not readings:
-            logger.warning("No readings found in Supabase. Nothing to sync.")
-            return
-            
-    except Exception as e:
-        logger.error(f"Failed to fetch readings from Supabase: {e}")
-        return
+    # Stream readings from Supabase page by page. The generator fetches
+    # lazily, so fetch errors surface in the sync result below and
+    # leave the existing Neo4j readings in place.
+    logger.info("Streaming readings from Supabase...")
+    readings = db_service.iter_readings(page_size=1000)
 
     # Sync to Neo4j
     try:
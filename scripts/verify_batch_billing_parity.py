@@ -0,0 +1,87 @@
+"""
+Check that the vectorised billing engine matches TariffRules exactly.
+
+Generates random society-sized inputs (including zeros, negatives and
+values that sit on rounding ties), prices them with both
+services.billing_engine.calculate_bills_batch and the scalar
+TariffRules.calculate_simple_bill, and compares every column.
+
+    python scripts/verify_batch_billing_parity.py --flats 100000
+"""
+import sys
+import os
+import argparse
+import random
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.billing_engine import BILL_COLUMNS, calculate_bills_batch
+from services.tariff_rules import TariffRules
+
+
+def random_inputs(count: int, seed: int):
+    rng = random.Random(seed)
+
+    def units():
+        roll = rng.random()
+        if roll < 0.05:
+            return 0.0
+        if roll < 0.08:
+            return -rng.uniform(0, 50)
+        if roll < 0.25:
+            # x.xx5 values exercise round-half ties
+            return rng.randint(0, 99999) / 100 + 0.005
+        return round(rng.uniform(0, 900), rng.choice([0, 1, 2, 3]))
+
+    columns = {
+        "flat_units": [units() for _ in range(count)],
+        "motor_units": [units() for _ in range(count)],
+        "total_flat_units_for_motor": [units() * 3 for _ in range(count)],
+        "rate_per_unit": [rng.choice([12.0, 9.0, 10.5, 7.25]) for _ in range(count)],
+        "fixed_charge": [rng.choice([0.0, 1474.0, 1890.0, 2311.0, 1500.125]) for _ in range(count)],
+        "previous_outstanding": [rng.choice([0.0, 0.0, rng.uniform(0, 5000)]) for _ in range(count)],
+    }
+    return columns
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify batch billing parity with TariffRules")
+    parser.add_argument("--flats", type=int, default=50000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    inputs = random_inputs(args.flats, args.seed)
+
+    started = time.perf_counter()
+    scalar = [
+        TariffRules.calculate_simple_bill(*values)
+        for values in zip(
+            inputs["flat_units"], inputs["motor_units"], inputs["total_flat_units_for_motor"],
+            inputs["rate_per_unit"], inputs["fixed_charge"], inputs["previous_outstanding"],
+        )
+    ]
+    scalar_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    batch = calculate_bills_batch(**inputs)
+    batch_seconds = time.perf_counter() - started
+
+    mismatches = 0
+    for column in BILL_COLUMNS:
+        values = batch[column].tolist()
+        for i, bill in enumerate(scalar):
+            if bill[column] != values[i]:
+                mismatches += 1
+                if mismatches <= 10:
+                    print(f"MISMATCH row {i} {column}: scalar={bill[column]!r} batch={values[i]!r}")
+
+    print(f"Priced {args.flats} flats: scalar {scalar_seconds * 1000:.1f}ms, batch {batch_seconds * 1000:.1f}ms")
+    if mismatches:
+        print(f"FAILURE: {mismatches} mismatched values")
+        sys.exit(1)
+    print(f"SUCCESS: all {len(BILL_COLUMNS)} columns identical")
+
+
+if __name__ == "__main__":
+    main()
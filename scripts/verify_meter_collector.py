@@ -0,0 +1,158 @@
+"""
+Exercise MeterCollector against the local smart-meter stand-in.
+
+Starts scripts/smart_meter_standin.py in-process, spreads the meters
+over two host names (127.0.0.1 and localhost) and checks that polling
+stays within the concurrency and per-host rate limits, that 503s and
+hung requests are retried or reported, and how the wall time compares
+with polling the same meters one by one. A fake-fetch run also checks
+that requests queued behind slow hosts keep the per-host spacing.
+
+    python scripts/verify_meter_collector.py --meters 400 --concurrency 50 --rate 100
+
+With ``--ingest`` (DATABASE_BACKEND=local) the readings of the seeded
+meters go through DatabaseService.insert_meter_readings_bulk, as the
+weekly scheduler job does.
+"""
+import sys
+import os
+import argparse
+import asyncio
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.meter_collector import MeterCollector, http_get_json, new_http_client
+from smart_meter_standin import make_server
+
+
+def max_per_second(times):
+    """Most requests seen in any 1-second window"""
+    times = sorted(times)
+    best, start = 0, 0
+    for end, t in enumerate(times):
+        while t - times[start] >= 1.0:
+            start += 1
+        best = max(best, end - start + 1)
+    return best
+
+
+def check_slow_host_spacing(concurrency=2, rate=5.0, slow_seconds=1.0, meters=6):
+    """Fake hosts ``slow1``/``slow2`` hold every request slot for
+    ``slow_seconds`` while ``meters`` requests to host ``a`` queue behind
+    them; returns the gaps between the ``a`` requests as sent.
+    """
+    sent = []
+
+    async def fake_fetch(url, timeout):
+        host = url.split('/')[2]
+        if host.startswith('slow'):
+            await asyncio.sleep(slow_seconds)
+        else:
+            sent.append(asyncio.get_running_loop().time())
+        return 200, {'reading_value': 1}
+
+    queued = [{'meter_id': f"S{i}", 'api_endpoint': f"http://slow{i}/m"} for i in (1, 2)]
+    queued += [{'meter_id': f"A{i}", 'api_endpoint': f"http://a/m{i}"} for i in range(meters)]
+    collector = MeterCollector(concurrency=concurrency, per_host_rate=rate, fetch=fake_fetch)
+    asyncio.run(collector.collect_async(queued))
+    return [later - earlier for earlier, later in zip(sent, sent[1:])]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify concurrent smart-meter polling")
+    parser.add_argument('--meters', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--rate', type=float, default=100.0, help="Requests per second per host")
+    parser.add_argument('--latency', type=float, default=0.1)
+    parser.add_argument('--error-rate', type=float, default=0.1)
+    parser.add_argument('--hang-rate', type=float, default=0.02)
+    parser.add_argument('--timeout', type=float, default=1.0)
+    parser.add_argument('--ingest', action='store_true', help="Store readings for seeded local meters")
+    args = parser.parse_args()
+
+    server = make_server(0, args.latency, args.error_rate, args.hang_rate, hang_seconds=args.timeout * 3)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+
+    db = None
+    if args.ingest:
+        from services.database_service import DatabaseService
+        db = DatabaseService()
+        numbers = [m['meter_number'] for m in db.identity.meters() if m.get('meter_number')]
+        meter_ids = numbers[:args.meters]
+    else:
+        meter_ids = [f"SM{i:05d}" for i in range(args.meters)]
+
+    hosts = ['127.0.0.1', 'localhost']
+    meters = [
+        {'meter_id': meter_id, 'api_endpoint': f"http://{hosts[i % 2]}:{port}/meters/{meter_id}"}
+        for i, meter_id in enumerate(meter_ids)
+    ]
+
+    # Count requests in flight on the client side: the stand-in keeps
+    # sleeping on hung requests after the collector has timed them out
+    in_flight = {'now': 0, 'peak': 0}
+
+    async def collect():
+        # One shared client, as MeterCollector uses without a custom fetch
+        async with new_http_client(args.timeout, args.concurrency) as client:
+            async def counting_fetch(url, timeout):
+                in_flight['now'] += 1
+                in_flight['peak'] = max(in_flight['peak'], in_flight['now'])
+                try:
+                    return await http_get_json(url, timeout, client=client)
+                finally:
+                    in_flight['now'] -= 1
+
+            collector = MeterCollector(
+                concurrency=args.concurrency,
+                per_host_rate=args.rate,
+                timeout=args.timeout,
+                max_attempts=3,
+                backoff=0.2,
+                fetch=counting_fetch
+            )
+            return await collector.collect_async(meters)
+
+    started = time.perf_counter()
+    outcomes = asyncio.run(collect())
+    wall = time.perf_counter() - started
+    server.shutdown()
+
+    stats = server.stats
+    ok = [o for o in outcomes if o['status'] == 'ok']
+    retried = sum(1 for o in outcomes if o['attempts'] > 1)
+    print(f"Meters:            {len(meters)} ({len(ok)} ok, {len(meters) - len(ok)} failed, {retried} retried)")
+    print(f"Requests served:   {stats.requests} ({stats.failures_served} answered 503)")
+    print(f"Wall time:         {wall:.2f}s (one by one at {args.latency}s each: ~{len(meters) * args.latency:.0f}s)")
+    print(f"Peak in flight:    {in_flight['peak']} (limit {args.concurrency})")
+    for host, times in sorted(stats.request_times.items()):
+        print(f"Peak rate {host:<16} {max_per_second(times)}/s (limit {args.rate:g}/s)")
+
+    problems = []
+    # Requests queued behind slow hosts must still be spaced per host
+    gaps = check_slow_host_spacing()
+    print(f"Behind slow hosts: smallest gap {min(gaps):.3f}s between requests to one host (limit {1 / 5.0:.3f}s)")
+    if min(gaps) < 1 / 5.0 * 0.95:
+        problems.append("per-host rate limit exceeded behind slow hosts")
+    if in_flight['peak'] > args.concurrency:
+        problems.append("concurrency limit exceeded")
+    # Arrival times at the server jitter around the client's slots
+    if any(max_per_second(times) > args.rate * 1.05 + 1 for times in stats.request_times.values()):
+        problems.append("per-host rate limit exceeded")
+    if len(ok) + sum(1 for o in outcomes if o['status'] == 'error') != len(meters):
+        problems.append("missing outcomes")
+
+    if db is not None and ok:
+        results = db.insert_meter_readings_bulk([o['reading'] for o in ok])
+        created = sum(1 for r in results if r and r.get('status') == 'created')
+        print(f"Bulk ingested:     {created}/{len(ok)} readings")
+
+    print("OK" if not problems else f"FAILED: {', '.join(problems)}")
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,139 @@
+"""
+Check that compiled tariffs give the same bills as the linear tier walk.
+
+The reference below is the original ``calculate_energy_charges`` loop.
+Random and boundary consumption values are priced through
+TariffRules.calculate_total_bill (scalar, with breakdown) and
+CompiledTariff.energy_charges (NumPy array) and compared with it.
+
+    python scripts/verify_tariff_parity.py --values 100000
+"""
+import sys
+import os
+import argparse
+import random
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.tariff_rules import TariffRules
+
+
+def reference_energy_charges(consumption_kwh, tariff):
+    """Original linear walk over tariff["energy_tiers"]."""
+    tier_breakdown = []
+    remaining_kwh = consumption_kwh
+    total_energy_charge = 0.0
+
+    for tier in tariff["energy_tiers"]:
+        if remaining_kwh <= 0:
+            break
+        tier_min = tier["min_kwh"]
+        tier_max = tier["max_kwh"]
+        tier_capacity = tier_max - tier_min + 1 if tier_max != float('inf') else float('inf')
+        kwh_in_tier = min(remaining_kwh, tier_capacity)
+        tier_amount = kwh_in_tier * tier["rate"]
+        tier_breakdown.append({
+            "tier": tier["tier"],
+            "kwh": round(kwh_in_tier, 2),
+            "rate": tier["rate"],
+            "amount": round(tier_amount, 2)
+        })
+        total_energy_charge += tier_amount
+        remaining_kwh -= kwh_in_tier
+
+    return {
+        "tier_breakdown": tier_breakdown,
+        "total_energy_charge": round(total_energy_charge, 2)
+    }
+
+
+def reference_total_bill(consumption_kwh, connected_load_kw, tariff, previous_outstanding):
+    energy_calc = reference_energy_charges(consumption_kwh, tariff)
+    energy_charges = energy_calc["total_energy_charge"]
+    motor_charges = tariff["fixed_charges"]["motor_charges"]
+    grid_charges = connected_load_kw * tariff["fixed_charges"]["grid_charges_per_kw"]
+    common_area_charges = tariff["fixed_charges"]["common_area_maintenance"]
+    subtotal = energy_charges + motor_charges + grid_charges + common_area_charges
+    electricity_duty = energy_charges * tariff["taxes"]["electricity_duty"]
+    tax_on_sale = subtotal * tariff["taxes"].get("tax_on_sale", 0)
+    total_charges = subtotal + electricity_duty + tax_on_sale
+    return {
+        "breakdown": energy_calc["tier_breakdown"],
+        "energy": round(energy_charges, 2),
+        "duty": round(electricity_duty, 2),
+        "tax": round(tax_on_sale, 2),
+        "subtotal": round(subtotal, 2),
+        "payable": round(total_charges + previous_outstanding, 2),
+    }
+
+
+def consumption_values(count, seed, tariff):
+    rng = random.Random(seed)
+    values = [0.0, -5.0, 0.004, 1e7]
+    for tier in tariff["energy_tiers"]:
+        for edge in (tier["min_kwh"], tier["max_kwh"]):
+            if edge != float("inf"):
+                values.extend([edge - 1, edge - 0.005, edge, edge + 0.005, edge + 1])
+    while len(values) < count:
+        values.append(round(rng.uniform(0, 2000), rng.choice([0, 1, 2, 3])))
+    return values
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify compiled tariff parity with the linear walk")
+    parser.add_argument("--values", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    mismatches = 0
+    for tariff_type in ("residential", "commercial"):
+        tariff = TariffRules.get_tariff_by_type(tariff_type)
+        values = consumption_values(args.values, args.seed, tariff)
+
+        expected = [reference_total_bill(v, 7.0, tariff, 100.0) for v in values]
+        actual = [TariffRules.calculate_total_bill(v, 7.0, tariff_type, 100.0) for v in values]
+        batch = TariffRules.compiled(tariff_type).energy_charges(values).tolist()
+
+        # Energy charge timings: linear walk, compiled scalar, compiled array
+        started = time.perf_counter()
+        for v in values:
+            reference_energy_charges(v, tariff)
+        reference_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for v in values:
+            TariffRules.calculate_energy_charges(v, tariff_type, include_breakdown=False)
+        compiled_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        TariffRules.compiled(tariff_type).energy_charges(values)
+        batch_seconds = time.perf_counter() - started
+
+        for i, (want, got) in enumerate(zip(expected, actual)):
+            have = {
+                "breakdown": got["energy_charges"]["tier_breakdown"],
+                "energy": got["energy_charges"]["total"],
+                "duty": got["taxes"]["electricity_duty"],
+                "tax": got["taxes"]["tax_on_sale"],
+                "subtotal": got["subtotal"],
+                "payable": got["amount_payable"],
+            }
+            if have != want or batch[i] != want["energy"]:
+                mismatches += 1
+                if mismatches <= 10:
+                    print(f"MISMATCH {tariff_type} {values[i]!r}: expected={want} got={have} batch={batch[i]}")
+
+        print(
+            f"{tariff_type}: {len(values)} values, linear {reference_seconds * 1000:.1f}ms, "
+            f"compiled {compiled_seconds * 1000:.1f}ms, array {batch_seconds * 1000:.1f}ms"
+        )
+
+    if mismatches:
+        print(f"FAILURE: {mismatches} mismatched bills")
+        sys.exit(1)
+    print("SUCCESS: compiled tariffs match the linear tier walk")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 """Services package initialization"""
 from .database_service import DatabaseService
+from .async_database_service import AsyncDatabaseService
 from .neo4j_service import Neo4jService
 from .ai_agent_service import AIAgentService
 from .payment_service import PaymentService
@@ -10,6 +11,7 @@ from .scheduler_service import BillingScheduler, get_scheduler, start_scheduler,
 
 __all__ = [
     'DatabaseService',
+    'AsyncDatabaseService',
     'Neo4jService',
     'AIAgentService',
     'PaymentService',
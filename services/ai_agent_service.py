@@ -95,6 +95,9 @@ Respond with JSON: {{"valid": true/false, "reason": "explanation", "confidence":
         rate_per_unit: float | None = None,
         fixed_charge: float | None = None,
         previous_outstanding: float = 0.0,
+        # Shared water motor context (see DatabaseService.get_motor_allocations)
+        motor_units: float = 0.0,
+        total_flat_units_for_motor: float = 0.0,
     ) -> Dict:
         """
         Calculate electricity bill using the explicit formula-based rules.
@@ -107,10 +110,9 @@ Respond with JSON: {{"valid": true/false, "reason": "explanation", "confidence":
             4. Usage       = Total Units × rate_per_unit
             5. Final Bill  = Usage + Fixed Charge (+ previous_outstanding)
 
-        For now this helper only uses the flat units and does not
-        automatically infer motor share from Supabase. Callers that
-        have full motor context should compute water_motor_share and
-        use TariffRules.calculate_simple_bill directly.
+        The water motor share is applied when the caller passes the
+        flat's ``motor_units``/``total_flat_units_for_motor`` (e.g. from
+        DatabaseService.get_motor_allocations); otherwise it is 0.
         """
         from .tariff_rules import TariffRules
 
@@ -127,8 +129,8 @@ Respond with JSON: {{"valid": true/false, "reason": "explanation", "confidence":
 
         simple = TariffRules.calculate_simple_bill(
             flat_units=flat_units,
-            motor_units=0.0,
-            total_flat_units_for_motor=0.0,
+            motor_units=motor_units,
+            total_flat_units_for_motor=total_flat_units_for_motor,
             rate_per_unit=unit_rate,
             fixed_charge=fixed,
             previous_outstanding=previous_outstanding,
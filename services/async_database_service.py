@@ -0,0 +1,132 @@
+"""
+Asyncio facade over DatabaseService for concurrent fan-out queries.
+
+Dashboards and label lookups issue several independent queries back to
+back, so their latencies add up. AsyncDatabaseService exposes the same
+methods as DatabaseService as coroutines that run on a bounded thread
+pool, so independent calls can be awaited together:
+
+    adb = AsyncDatabaseService(db)
+    results = await adb.gather(
+        summary=adb.get_bill_status_summary(),
+        unbilled=adb.count_unbilled_readings(min_value=0),
+    )
+
+Each call goes through the wrapped DatabaseService, so the identity
+registry, query cache, connection pool and @retry behaviour are shared
+with synchronous callers. Synchronous code uses ``gather_sync`` (or
+``run_sync``) without touching an event loop.
+"""
+import asyncio
+import functools
+import inspect
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from services.database_service import DatabaseService
+from utils.logger import setup_logger
+
+logger = setup_logger('async_database_service')
+
+
+# Worker pools shared by every AsyncDatabaseService of the same size, so
+# recreating the facade (e.g. on a Streamlit cache clear) does not leak
+# idle threads.
+_executors: Dict[int, ThreadPoolExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def _shared_executor(max_workers: int) -> ThreadPoolExecutor:
+    with _executors_lock:
+        executor = _executors.get(max_workers)
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='async-db')
+            _executors[max_workers] = executor
+        return executor
+
+
+def run_sync(awaitable: Awaitable) -> Any:
+    """Run a coroutine to completion from synchronous code.
+
+    Uses ``asyncio.run`` normally; if this thread already runs an event
+    loop (e.g. inside a notebook), the coroutine runs on a helper thread
+    with its own loop instead.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(awaitable)
+
+    result: Dict[str, Any] = {}
+
+    def runner():
+        try:
+            result['value'] = asyncio.run(awaitable)
+        except BaseException as e:  # re-raised in the calling thread
+            result['error'] = e
+
+    thread = threading.Thread(target=runner, name='async-db-run-sync')
+    thread.start()
+    thread.join()
+    if 'error' in result:
+        raise result['error']
+    return result.get('value')
+
+
+class AsyncDatabaseService:
+    """Coroutine versions of every public DatabaseService method.
+
+    ``max_concurrency`` bounds how many queries run at once (each
+    occupies one worker thread of a pool shared by same-sized facades).
+    Generator methods such as ``iter_readings`` are not wrapped; use the
+    synchronous ``db`` attribute to stream.
+    """
+
+    def __init__(self, db: Optional[DatabaseService] = None, max_concurrency: int = 8):
+        self.db = db or DatabaseService()
+        self.max_concurrency = max_concurrency
+        self._executor = _shared_executor(max_concurrency)
+
+    def __getattr__(self, name: str):
+        attr = getattr(self.db, name)
+        if name.startswith('_') or not callable(attr) or inspect.isgeneratorfunction(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def call(*args, **kwargs):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._executor, functools.partial(attr, *args, **kwargs)
+            )
+
+        return call
+
+    async def gather(self, return_exceptions: bool = False, **calls: Awaitable) -> Dict[str, Any]:
+        """Await named coroutines concurrently and return ``{name: result}``.
+
+        With ``return_exceptions=True`` a failing call yields its
+        exception as the value instead of cancelling the others.
+        """
+        names = list(calls)
+        results = await asyncio.gather(*calls.values(), return_exceptions=return_exceptions)
+        return dict(zip(names, results))
+
+    def gather_sync(self, return_exceptions: bool = False, **calls: Callable[[], Awaitable]) -> Dict[str, Any]:
+        """Synchronous adapter for ``gather``.
+
+        Takes zero-argument callables that create the coroutines (so
+        they are created inside the loop that awaits them)::
+
+            adb.gather_sync(
+                summary=lambda: adb.get_bill_status_summary(),
+                unbilled=lambda: adb.count_unbilled_readings(min_value=0),
+            )
+        """
+        async def load():
+            return await self.gather(
+                return_exceptions=return_exceptions,
+                **{name: factory() for name, factory in calls.items()}
+            )
+
+        return run_sync(load())
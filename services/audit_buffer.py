@@ -0,0 +1,333 @@
+"""
+Write-behind buffer for audit rows (notifications, payment_events).
+
+Audit inserts used to run synchronously in the request path, one row at
+a time. AuditBuffer queues rows per table and a background thread
+flushes them in multi-row inserts when a table reaches ``batch_size``
+rows or every ``flush_interval`` seconds.
+
+A batch the database rejects is retried row by row. If some rows of a
+batch go in, the rest are bad rows and go to a dead-letter file
+(``<spill>.dead.jsonl``) for inspection. If none go in (e.g. the
+database is unreachable) the rows are appended to this process's spill
+file and replayed before the next flush. Each process spills to its own
+file (``<spill>.<host>-<pid>.jsonl``), and replay claims a file by
+renaming it, so processes sharing the spill directory never read or
+delete each other's rows; files left by processes that have exited are
+adopted the same way. ``close_all_audit_buffers`` drains everything at
+process exit.
+"""
+import atexit
+import json
+import os
+import socket
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from utils.logger import setup_logger
+
+logger = setup_logger('audit_buffer')
+
+
+class AuditBuffer:
+    """Batch audit rows per table and flush them off the request path.
+
+    ``insert`` is called as ``insert(table, rows)`` and must write all
+    rows or raise. Spilled rows that still fail after
+    ``dead_letter_after`` seconds are dead-lettered even when no other
+    row proves the database reachable.
+    """
+
+    # Rows tried one by one before a rejected chunk counts as an outage
+    _PROBE_ROWS = 3
+
+    def __init__(
+        self,
+        insert: Callable[[str, List[Dict]], None],
+        batch_size: int = 100,
+        flush_interval: float = 2.0,
+        spill_path: Optional[str] = None,
+        dead_letter_after: float = 86400.0
+    ):
+        self._insert = insert
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spill_path = spill_path
+        self.dead_letter_after = dead_letter_after
+
+        self._host = socket.gethostname().replace('.', '_').replace('-', '_')
+        if spill_path:
+            self._spill_root, self._spill_ext = os.path.splitext(os.path.abspath(spill_path))
+            self._spill_ext = self._spill_ext or '.jsonl'
+
+        self._pending: Dict[str, List[Dict]] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {
+            'queued': 0, 'written': 0, 'batches': 0, 'spilled': 0, 'replayed': 0, 'dead_lettered': 0
+        }
+
+    def add(self, table: str, row: Dict) -> None:
+        """Queue one row; never blocks on the database."""
+        if self._closed:
+            # Late writers after shutdown: write through synchronously
+            with self._flush_lock:
+                self._write({table: [row]})
+            return
+        with self._lock:
+            rows = self._pending.setdefault(table, [])
+            rows.append(row)
+            self._stats['queued'] += 1
+            full = len(rows) >= self.batch_size
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='audit-buffer', daemon=True)
+                self._thread.start()
+        if full:
+            self._wakeup.set()
+
+    def _run(self) -> None:
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:  # keep the flusher alive
+                logger.error(f"Audit flush failed: {e}")
+
+    def flush(self) -> int:
+        """Write everything queued (and anything spilled); returns rows written."""
+        with self._flush_lock:
+            with self._lock:
+                batches, self._pending = self._pending, {}
+            written = self._replay_spill()
+            written += self._write(batches)
+            return written
+
+    def _write(self, batches: Dict[str, List[Dict]], spilled_at: Optional[Dict[int, float]] = None) -> int:
+        """Insert ``batches`` in chunks; failed rows are spilled or dead-lettered.
+
+        ``spilled_at`` maps ``id(row)`` to when a replayed row was first
+        spilled, so its age survives another spill.
+        """
+        spilled_at = spilled_at or {}
+        written = 0
+        for table, rows in batches.items():
+            for i in range(0, len(rows), self.batch_size):
+                chunk = rows[i:i + self.batch_size]
+                try:
+                    self._insert(table, chunk)
+                except Exception as e:
+                    logger.warning(f"Could not write {len(chunk)} {table} rows, retrying row by row: {e}")
+                    written += self._write_rows(table, chunk, spilled_at)
+                    continue
+                written += len(chunk)
+                with self._lock:
+                    self._stats['written'] += len(chunk)
+                    self._stats['batches'] += 1
+        return written
+
+    def _write_rows(self, table: str, rows: List[Dict], spilled_at: Dict[int, float]) -> int:
+        """Insert a rejected chunk one row at a time and settle the failures"""
+        failed: List[Tuple[Dict, str]] = []
+        inserts = 0
+        for position, row in enumerate(rows):
+            if position == self._PROBE_ROWS and len(failed) == position:
+                # Nothing goes in: most likely an outage, so stop hammering
+                # the database. The probed rows go to the back, so a bad
+                # row at the front cannot block the rest next time.
+                failed = [(r, failed[0][1]) for r in rows[position:]] + failed
+                break
+            inserts += 1
+            try:
+                self._insert(table, [row])
+            except Exception as e:
+                failed.append((row, str(e)))
+        written = len(rows) - len(failed)
+        with self._lock:
+            self._stats['written'] += written
+            # One single-row insert issued per row tried
+            self._stats['batches'] += inserts
+
+        if not failed:
+            return written
+        now = time.time()
+        if written:
+            # The database took the other rows, so these are bad rows
+            self._dead_letter(table, failed)
+            return written
+        expired = [(row, err) for row, err in failed if now - spilled_at.get(id(row), now) >= self.dead_letter_after]
+        retry = [row for row, err in failed if now - spilled_at.get(id(row), now) < self.dead_letter_after]
+        if expired:
+            self._dead_letter(table, expired)
+        if retry:
+            logger.error(f"Could not write {len(retry)} {table} rows, spilling to disk: {failed[0][1]}")
+            self._spill(table, retry, [spilled_at.get(id(row), now) for row in retry])
+        return written
+
+    def _own_spill_file(self) -> str:
+        return f"{self._spill_root}.{self._host}-{os.getpid()}{self._spill_ext}"
+
+    def _dead_letter_file(self) -> str:
+        return f"{self._spill_root}.dead{self._spill_ext}"
+
+    @staticmethod
+    def _append_lines(path: str, lines: List[str]) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # One write per call so appends from several processes do not interleave
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(''.join(lines))
+
+    def _spill(self, table: str, rows: List[Dict], spilled_at: Optional[List[float]] = None) -> None:
+        if not self.spill_path:
+            logger.error(f"No spill file configured; dropping {len(rows)} {table} rows")
+            return
+        now = time.time()
+        spilled_at = spilled_at or [now] * len(rows)
+        self._append_lines(self._own_spill_file(), [
+            json.dumps({'table': table, 'row': row, 'spilled_at': at}, default=str) + '\n'
+            for row, at in zip(rows, spilled_at)
+        ])
+        with self._lock:
+            self._stats['spilled'] += len(rows)
+
+    def _dead_letter(self, table: str, failed: List[Tuple[Dict, str]]) -> None:
+        logger.error(f"Dead-lettering {len(failed)} {table} rows that cannot be written: {failed[0][1]}")
+        with self._lock:
+            self._stats['dead_lettered'] += len(failed)
+        if not self.spill_path:
+            return
+        now = time.time()
+        self._append_lines(self._dead_letter_file(), [
+            json.dumps({'table': table, 'row': row, 'error': error, 'failed_at': now}, default=str) + '\n'
+            for row, error in failed
+        ])
+
+    def _owner_alive(self, owner: str) -> bool:
+        """Whether the process that wrote a spill/claim file may still be running"""
+        host, _, pid = owner.rpartition('-')
+        if not pid.isdigit():
+            return False  # shared spill file from older versions
+        if int(pid) == os.getpid() and host == self._host:
+            return False  # ours (or left by an earlier process with our pid)
+        if host != self._host or os.name != 'posix':
+            return True  # cannot tell; leave it to its owner
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            return False
+        except OSError:
+            return True
+        return True
+
+    def _claimable_spill_files(self) -> List[str]:
+        """Spill files (and abandoned claims) this process may replay"""
+        directory = os.path.dirname(self._spill_root)
+        prefix = os.path.basename(self._spill_root)
+        if not os.path.isdir(directory):
+            return []
+        paths = []
+        for name in os.listdir(directory):
+            if not name.startswith(prefix):
+                continue
+            rest = name[len(prefix):]
+            if not rest.startswith('.'):
+                continue
+            if '.claimed-' in rest:
+                owner = rest.rsplit('.claimed-', 1)[1]
+            elif rest == self._spill_ext:
+                owner = ''
+            elif rest.endswith(self._spill_ext) and rest != f".dead{self._spill_ext}":
+                owner = rest[1:-len(self._spill_ext)]
+            else:
+                continue
+            if not self._owner_alive(owner):
+                paths.append(os.path.join(directory, name))
+        return paths
+
+    def _replay_spill(self) -> int:
+        """Re-insert spilled rows; rows that fail again are spilled anew.
+
+        Each file is claimed by an atomic rename before it is read, so a
+        file is replayed by exactly one process.
+        """
+        if not self.spill_path:
+            return 0
+        spilled: Dict[str, List[Dict]] = {}
+        spilled_at: Dict[int, float] = {}
+        claimed = []
+        for path in self._claimable_spill_files():
+            base = path.rsplit('.claimed-', 1)[0]
+            claim = f"{base}.claimed-{self._host}-{os.getpid()}"
+            try:
+                if path != claim:
+                    os.replace(path, claim)
+            except FileNotFoundError:
+                continue  # claimed by another process first
+            with open(claim, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        row = entry['row']
+                        spilled.setdefault(entry['table'], []).append(row)
+                        spilled_at[id(row)] = entry.get('spilled_at') or time.time()
+            claimed.append(claim)
+        if not spilled:
+            for claim in claimed:
+                os.remove(claim)
+            return 0
+        logger.info(f"Replaying {sum(len(r) for r in spilled.values())} spilled audit rows")
+        written = self._write(spilled, spilled_at)
+        # Failed rows are already in our own spill file again
+        for claim in claimed:
+            os.remove(claim)
+        with self._lock:
+            self._stats['replayed'] += written
+        return written
+
+    def close(self) -> None:
+        """Stop the flusher and drain the queue (idempotent)."""
+        if self._closed:
+            return
+        self._closed = True
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval + 5)
+        self.flush()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            pending = sum(len(rows) for rows in self._pending.values())
+            return dict(self._stats, pending=pending)
+
+
+# Process-wide buffers, one per backend, drained at interpreter exit
+_buffers: Dict[str, AuditBuffer] = {}
+_buffers_lock = threading.Lock()
+
+
+def get_audit_buffer(key: str, insert: Callable[[str, List[Dict]], None], **kwargs) -> AuditBuffer:
+    """Get or create the shared audit buffer for a backend."""
+    with _buffers_lock:
+        buffer = _buffers.get(key)
+        if buffer is None:
+            buffer = AuditBuffer(insert, **kwargs)
+            _buffers[key] = buffer
+        return buffer
+
+
+def close_all_audit_buffers() -> None:
+    """Flush and stop every audit buffer (call from shutdown hooks)."""
+    with _buffers_lock:
+        buffers = list(_buffers.values())
+    for buffer in buffers:
+        try:
+            buffer.close()
+        except Exception as e:
+            logger.error(f"Error closing audit buffer: {e}")
+
+
+atexit.register(close_all_audit_buffers)
@@ -0,0 +1,144 @@
+"""
+Vectorised batch billing over NumPy arrays.
+
+``TariffRules.calculate_simple_bill`` prices one flat per call and
+returns a dict. The functions here take columnar inputs (one array per
+field, scalars broadcast) and return columnar results, so a whole
+society month or a what-if preview is a handful of array operations:
+
+    result = calculate_bills_batch(
+        flat_units=[120.5, 80.0, 210.25],
+        motor_units=[90.0, 90.0, 90.0],
+        total_flat_units_for_motor=410.75,
+        rate_per_unit=[12.0, 12.0, 9.0],
+        fixed_charge=[1890.0, 1474.0, 0.0],
+    )
+    result["total_amount"]  # array([...])
+
+Results are bit-for-bit identical to the scalar helpers, including
+their spreadsheet-style ``round(x, 2)`` (see round2);
+``scripts/verify_batch_billing_parity.py`` checks this on random data.
+"""
+from typing import Dict, List, Sequence, Union
+
+import numpy as np
+
+ArrayLike = Union[float, Sequence[float], np.ndarray]
+
+# Output columns, in the order calculate_simple_bill returns them
+BILL_COLUMNS = (
+    "flat_units",
+    "motor_units",
+    "total_block_units",
+    "water_motor_share",
+    "total_units",
+    "rate_per_unit",
+    "fixed_charge",
+    "usage_charge",
+    "previous_outstanding",
+    "total_amount",
+)
+
+
+def _column(values: ArrayLike) -> np.ndarray:
+    """float64 array; ``None`` and NaN become 0 like ``float(x or 0)``."""
+    array = np.asarray(values, dtype=float)
+    return np.nan_to_num(array, nan=0.0, posinf=np.inf, neginf=-np.inf)
+
+
+def round2(values: ArrayLike) -> np.ndarray:
+    """Round to 2 decimals exactly like Python's ``round(x, 2)``.
+
+    ``np.round`` rounds ``x * 100`` in floating point, so when that
+    product lands exactly on a .5 tie it rounds half-to-even even though
+    the true value of ``x * 100`` is slightly above or below the tie
+    (Python rounds the exact binary value). For those elements the
+    rounding error of the product is recovered exactly (Dekker's
+    two-product) and decides the direction.
+    """
+    array = np.asarray(values, dtype=float)
+    scaled = array * 100.0
+    result = np.rint(scaled)
+
+    floor = np.floor(scaled)
+    ties = (scaled - floor) == 0.5
+    if ties.any():
+        # Exact error of the product: array * 100 == scaled + error
+        split = array * 134217729.0
+        high = split - (split - array)
+        low = array - high
+        error = (high * 100.0 - scaled) + low * 100.0
+        round_up = np.where(error == 0.0, np.fmod(floor, 2.0) != 0.0, error > 0.0)
+        result = np.where(ties, floor + round_up, result)
+
+    return result / 100.0
+
+
+def calculate_water_motor_share_batch(
+    motor_units: ArrayLike,
+    total_flat_units_for_motor: ArrayLike,
+    flat_units: ArrayLike
+) -> np.ndarray:
+    """Vectorised ``TariffRules.calculate_water_motor_share``.
+
+    (Motor Units ÷ Total Units of all flats on the motor) × Flat Units,
+    rounded to 2 decimals; 0 where motor or block units are not
+    positive or flat units are negative.
+    """
+    motor, total, flat = np.broadcast_arrays(
+        _column(motor_units), _column(total_flat_units_for_motor), _column(flat_units)
+    )
+    valid = (motor > 0) & (total > 0) & (flat >= 0)
+    share = np.zeros(motor.shape, dtype=float)
+    np.divide(motor, total, out=share, where=valid)
+    share = np.where(valid, share * flat, 0.0)
+    return round2(share)
+
+
+def calculate_bills_batch(
+    flat_units: ArrayLike,
+    motor_units: ArrayLike = 0.0,
+    total_flat_units_for_motor: ArrayLike = 0.0,
+    rate_per_unit: ArrayLike = 12.0,
+    fixed_charge: ArrayLike = 0.0,
+    previous_outstanding: ArrayLike = 0.0
+) -> Dict[str, np.ndarray]:
+    """Vectorised ``TariffRules.calculate_simple_bill``.
+
+    Every argument is an array (one entry per flat) or a scalar that is
+    broadcast. Returns ``{column: array}`` with the same keys and values
+    as the scalar dict (see BILL_COLUMNS).
+    """
+    flat, motor, total_block, rate, fixed, prev_out = np.broadcast_arrays(
+        np.maximum(_column(flat_units), 0.0),
+        np.maximum(_column(motor_units), 0.0),
+        np.maximum(_column(total_flat_units_for_motor), 0.0),
+        _column(rate_per_unit),
+        _column(fixed_charge),
+        _column(previous_outstanding),
+    )
+
+    water_motor_share = calculate_water_motor_share_batch(motor, total_block, flat)
+    total_units = round2(flat + water_motor_share)
+    usage_charge = round2(total_units * rate)
+    total_amount = round2(usage_charge + fixed + prev_out)
+
+    return {
+        "flat_units": round2(flat),
+        "motor_units": round2(motor),
+        "total_block_units": round2(total_block),
+        "water_motor_share": water_motor_share,
+        "total_units": total_units,
+        "rate_per_unit": rate.astype(float, copy=True),
+        "fixed_charge": round2(fixed),
+        "usage_charge": usage_charge,
+        "previous_outstanding": round2(prev_out),
+        "total_amount": total_amount,
+    }
+
+
+def bills_to_records(columns: Dict[str, np.ndarray]) -> List[Dict[str, float]]:
+    """Turn calculate_bills_batch output into per-flat dicts of floats."""
+    names = [name for name in BILL_COLUMNS if name in columns]
+    rows = zip(*(np.atleast_1d(columns[name]).tolist() for name in names))
+    return [dict(zip(names, row)) for row in rows]
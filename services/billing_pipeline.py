@@ -0,0 +1,284 @@
+"""
+Staged, bounded-concurrency pipeline for batch jobs.
+
+Monthly billing does several blocking network calls per meter (history
+read, bill insert, Stripe, notifications). Run in sequence, month-end
+wall-clock is the sum of all of them. StagedPipeline runs each step as
+its own stage with its own worker threads, connected by bounded queues:
+items flow through as soon as a stage is done with them, a full queue
+blocks the stage feeding it (backpressure), and total time tracks the
+slowest stage instead of the sum.
+
+    pipeline = StagedPipeline([
+        Stage('read', load_history, workers=8),
+        Stage('calculate', calculate, workers=1),
+        Stage('write', create_bill, workers=4),
+    ], queue_size=50)
+    results = pipeline.run(meters)
+    pipeline.report()
+
+A stage function returns the item for the next stage, or None to drop
+it (e.g. not enough readings). Exceptions are recorded per stage and the
+item is dropped; the other items keep flowing. The report includes
+latency percentiles per stage and end to end per item (queue waits
+included).
+"""
+import math
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+from utils.logger import setup_logger
+
+logger = setup_logger('billing_pipeline')
+
+# End-of-stream marker passed down each queue once per worker
+_DONE = object()
+
+
+def latency_percentiles(seconds: Sequence[float]) -> Dict[str, Optional[float]]:
+    """p50/p90/p99/max of durations in seconds, reported in milliseconds (nearest rank)"""
+    if not seconds:
+        return {'count': 0, 'p50': None, 'p90': None, 'p99': None, 'max': None}
+    ordered = sorted(seconds)
+
+    def rank(p: float) -> float:
+        return round(ordered[max(math.ceil(p * len(ordered)) - 1, 0)] * 1000, 2)
+
+    return {
+        'count': len(ordered),
+        'p50': rank(0.50),
+        'p90': rank(0.90),
+        'p99': rank(0.99),
+        'max': round(ordered[-1] * 1000, 2),
+    }
+
+
+class _Tracked:
+    """An item in flight, with the time it entered the pipeline"""
+    __slots__ = ('item', 'entered')
+
+    def __init__(self, item: Any, entered: float):
+        self.item = item
+        self.entered = entered
+
+
+class Stage:
+    """One pipeline step: ``func(item) -> next item | None`` on ``workers`` threads"""
+
+    def __init__(self, name: str, func: Callable[[Any], Any], workers: int = 1):
+        self.name = name
+        self.func = func
+        self.workers = max(1, int(workers))
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        self.processed = 0
+        self.dropped = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+        self.blocked_seconds = 0.0
+        self.max_queue_depth = 0
+        self.errors: List[Dict] = []
+        self.latencies: List[float] = []
+
+    def record(self, seconds: float, outcome: str, item: Any = None, error: Optional[Exception] = None) -> None:
+        with self._lock:
+            self.busy_seconds += seconds
+            self.latencies.append(seconds)
+            if outcome == 'failed':
+                self.failed += 1
+                if len(self.errors) < 50:
+                    self.errors.append({'item': _describe(item), 'error': str(error)})
+            elif outcome == 'dropped':
+                self.dropped += 1
+            else:
+                self.processed += 1
+
+    def add_blocked(self, seconds: float) -> None:
+        with self._lock:
+            self.blocked_seconds += seconds
+
+    def observe_depth(self, depth: int) -> None:
+        if depth > self.max_queue_depth:
+            with self._lock:
+                self.max_queue_depth = max(self.max_queue_depth, depth)
+
+
+def _describe(item: Any) -> Any:
+    """Short identifier of an item for logs and error reports"""
+    if isinstance(item, dict):
+        for key in ('meter_id', 'id', 'flat_id'):
+            if key in item:
+                return item[key]
+        if isinstance(item.get('meter'), dict):
+            return _describe(item['meter'])
+    return repr(item)[:80]
+
+
+class StagedPipeline:
+    """Run items through stages connected by bounded queues."""
+
+    def __init__(self, stages: List[Stage], queue_size: int = 50):
+        if not stages:
+            raise ValueError("A pipeline needs at least one stage")
+        self.stages = stages
+        self.queue_size = max(1, int(queue_size))
+        self.wall_seconds = 0.0
+        self.items_in = 0
+        self.item_latencies: List[float] = []
+
+    def run(self, items: Iterable[Any]) -> List[Any]:
+        """Push every item through all stages; returns the last stage's outputs."""
+        for stage in self.stages:
+            stage.reset()
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        results: List[Any] = []
+        results_lock = threading.Lock()
+        self.item_latencies = []
+        started = time.perf_counter()
+
+        def worker(position: int) -> None:
+            stage = self.stages[position]
+            inbox = queues[position]
+            outbox = queues[position + 1] if position + 1 < len(queues) else None
+            while True:
+                tracked = inbox.get()
+                if tracked is _DONE:
+                    return
+                item = tracked.item
+                began = time.perf_counter()
+                try:
+                    output = stage.func(item)
+                except Exception as e:
+                    stage.record(time.perf_counter() - began, 'failed', item, e)
+                    logger.error(f"Pipeline stage '{stage.name}' failed for {_describe(item)}: {e}")
+                    continue
+                finished = time.perf_counter()
+                stage.record(finished - began, 'dropped' if output is None else 'processed')
+                if output is None:
+                    continue
+                if outbox is None:
+                    with results_lock:
+                        results.append(output)
+                        self.item_latencies.append(finished - tracked.entered)
+                else:
+                    waited = time.perf_counter()
+                    outbox.put(_Tracked(output, tracked.entered))  # blocks while the next stage is saturated
+                    stage.add_blocked(time.perf_counter() - waited)
+                    self.stages[position + 1].observe_depth(outbox.qsize())
+
+        threads: List[List[threading.Thread]] = []
+        for position, stage in enumerate(self.stages):
+            stage_threads = [
+                threading.Thread(target=worker, args=(position,), name=f"pipeline-{stage.name}-{i}", daemon=True)
+                for i in range(stage.workers)
+            ]
+            for thread in stage_threads:
+                thread.start()
+            threads.append(stage_threads)
+
+        self.items_in = 0
+        try:
+            for item in items:
+                queues[0].put(_Tracked(item, time.perf_counter()))
+                self.items_in += 1
+                self.stages[0].observe_depth(queues[0].qsize())
+        finally:
+            # Drain stage by stage: once every worker of a stage has seen
+            # its end marker, nothing more can reach the next queue.
+            for position, stage in enumerate(self.stages):
+                for _ in range(stage.workers):
+                    queues[position].put(_DONE)
+                for thread in threads[position]:
+                    thread.join()
+
+        self.wall_seconds = time.perf_counter() - started
+        return results
+
+    def report(self, samples: bool = False) -> Dict:
+        """Per-stage throughput, utilisation and errors for the last run.
+
+        ``samples`` adds the raw latencies so reports of pipelines that
+        ran side by side can be combined with merge_reports.
+        """
+        stages = []
+        for stage in self.stages:
+            handled = stage.processed + stage.dropped + stage.failed
+            capacity = stage.workers * self.wall_seconds
+            stages.append({
+                'stage': stage.name,
+                'workers': stage.workers,
+                'processed': stage.processed,
+                'dropped': stage.dropped,
+                'failed': stage.failed,
+                'busy_seconds': round(stage.busy_seconds, 3),
+                'avg_ms': round(stage.busy_seconds / handled * 1000, 2) if handled else 0.0,
+                # Items per second this stage could sustain with its workers
+                'throughput_per_sec': round(handled / stage.busy_seconds * stage.workers, 2) if stage.busy_seconds else None,
+                'utilisation': round(stage.busy_seconds / capacity, 3) if capacity else 0.0,
+                'blocked_seconds': round(stage.blocked_seconds, 3),
+                'max_queue_depth': stage.max_queue_depth,
+                'latency_ms': latency_percentiles(stage.latencies),
+                'errors': list(stage.errors),
+            })
+            if samples:
+                stages[-1]['latency_samples'] = list(stage.latencies)
+        bottleneck = max(stages, key=lambda s: s['utilisation'])['stage'] if stages else None
+        report = {
+            'items': self.items_in,
+            'wall_seconds': round(self.wall_seconds, 3),
+            'queue_size': self.queue_size,
+            'bottleneck': bottleneck,
+            # Entry to exit of the last stage, for items that completed
+            'item_latency_ms': latency_percentiles(self.item_latencies),
+            'stages': stages,
+        }
+        if samples:
+            report['item_latency_samples'] = list(self.item_latencies)
+        return report
+
+
+def merge_reports(reports: List[Dict], wall_seconds: float) -> Dict:
+    """Combine ``report(samples=True)`` outputs of pipelines that ran in
+    parallel (e.g. one per shard process) into one report.
+
+    Counts and busy time add up, workers add up (utilisation is against
+    their combined capacity over ``wall_seconds``) and percentiles are
+    recomputed from the pooled samples.
+    """
+    merged_stages: List[Dict] = []
+    for position, first in enumerate(reports[0]['stages'] if reports else []):
+        parts = [report['stages'][position] for report in reports]
+        workers = sum(p['workers'] for p in parts)
+        busy = sum(p['busy_seconds'] for p in parts)
+        handled = sum(p['processed'] + p['dropped'] + p['failed'] for p in parts)
+        capacity = workers * wall_seconds
+        merged_stages.append({
+            'stage': first['stage'],
+            'workers': workers,
+            'processed': sum(p['processed'] for p in parts),
+            'dropped': sum(p['dropped'] for p in parts),
+            'failed': sum(p['failed'] for p in parts),
+            'busy_seconds': round(busy, 3),
+            'avg_ms': round(busy / handled * 1000, 2) if handled else 0.0,
+            'throughput_per_sec': round(sum(p['throughput_per_sec'] or 0 for p in parts), 2) or None,
+            'utilisation': round(busy / capacity, 3) if capacity else 0.0,
+            'blocked_seconds': round(sum(p['blocked_seconds'] for p in parts), 3),
+            'max_queue_depth': max(p['max_queue_depth'] for p in parts),
+            'latency_ms': latency_percentiles([x for p in parts for x in p.get('latency_samples', [])]),
+            'errors': [e for p in parts for e in p['errors']][:50],
+        })
+    bottleneck = max(merged_stages, key=lambda s: s['utilisation'])['stage'] if merged_stages else None
+    return {
+        'items': sum(report['items'] for report in reports),
+        'wall_seconds': round(wall_seconds, 3),
+        'queue_size': reports[0]['queue_size'] if reports else 0,
+        'bottleneck': bottleneck,
+        'item_latency_ms': latency_percentiles(
+            [x for report in reports for x in report.get('item_latency_samples', [])]
+        ),
+        'stages': merged_stages,
+    }
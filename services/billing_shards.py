@@ -0,0 +1,56 @@
+"""
+Block-based sharding of the monthly billing population.
+
+Flats are coded ``<block>-<floor>`` (``B17-FF``, ``C8-GF``); unit IDs add
+a type prefix (``5BHK-B17-FF``). A block's flats share a water motor and
+their bills are computed together, so sharding keeps every block whole
+and spreads blocks across worker processes, largest first, onto the
+least-loaded shard:
+
+    shards = shard_by_block(jobs, shards=4)
+    # [(['B1', 'B9', ...], [job, ...]), ...]
+"""
+import heapq
+from typing import Dict, List, Tuple
+
+from services.identity_registry import get_default_registry, normalize_flat_code
+
+UNASSIGNED_BLOCK = 'unassigned'
+
+
+def block_of(meter: Dict) -> str:
+    """Block prefix of a meter's flat (``B17`` for ``5BHK-B17-FF``)"""
+    for key in ('unit_id', 'flat_code', 'customer_id'):
+        code = normalize_flat_code(meter.get(key))
+        if code and '-' in code:
+            return code.split('-', 1)[0]
+
+    # Meter numbers resolve through the identity registry when loaded
+    registry = get_default_registry()
+    code = registry.canonical_flat_code(meter.get('meter_id')) if registry is not None else None
+    if code and '-' in code:
+        return code.split('-', 1)[0].upper()
+    return UNASSIGNED_BLOCK
+
+
+def shard_by_block(jobs: List[Dict], shards: int) -> List[Tuple[List[str], List[Dict]]]:
+    """Split billing jobs (``{"meter": ...}``) into at most ``shards`` groups
+    of whole blocks with roughly equal meter counts.
+
+    Returns ``(blocks, jobs)`` per non-empty shard.
+    """
+    by_block: Dict[str, List[Dict]] = {}
+    for job in jobs:
+        by_block.setdefault(block_of(job['meter']), []).append(job)
+
+    shards = max(1, min(int(shards), len(by_block) or 1))
+    # (meters so far, shard index) min-heap: next block goes to the lightest shard
+    load = [(0, index) for index in range(shards)]
+    assigned: List[Tuple[List[str], List[Dict]]] = [([], []) for _ in range(shards)]
+    for block in sorted(by_block, key=lambda b: (-len(by_block[b]), b)):
+        size, index = heapq.heappop(load)
+        assigned[index][0].append(block)
+        assigned[index][1].extend(by_block[block])
+        heapq.heappush(load, (size + len(by_block[block]), index))
+
+    return [(sorted(blocks), shard_jobs) for blocks, shard_jobs in assigned if shard_jobs]
@@ -0,0 +1,271 @@
+"""
+Thread-safe connection pool for the legacy psycopg2 path.
+
+DatabaseService used to open a fresh SSL connection for every method
+call, so one webhook request paid five or six TLS handshakes. The pool
+keeps between ``min_size`` and ``max_size`` connections open, health
+checks connections that sat idle, retires them after ``max_lifetime``
+seconds and records how long callers waited for a free connection.
+
+The pool only needs a zero-argument ``connect`` callable, so it has no
+hard dependency on psycopg2 itself. Given a QueryMetrics, it hands out
+connections whose cursors record every query (see query_metrics).
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+from services.query_metrics import InstrumentedConnection, QueryMetrics
+from utils.logger import setup_logger
+
+logger = setup_logger('connection_pool')
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no connection becomes free within ``acquire_timeout``."""
+
+
+class _PooledConnection:
+    __slots__ = ('conn', 'created_at', 'last_used_at')
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.created_at = time.monotonic()
+        self.last_used_at = self.created_at
+
+
+class ConnectionPool:
+    """Bounded pool of DB-API connections.
+
+    ``connection()`` is a context manager that hands out a connection,
+    commits when the block succeeds, rolls back when it raises and then
+    returns the connection to the pool. Connections that are closed or
+    fail a health check are discarded and replaced on demand.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], object],
+        min_size: int = 1,
+        max_size: int = 10,
+        max_lifetime: float = 1800.0,
+        health_check_interval: float = 30.0,
+        acquire_timeout: float = 30.0,
+        metrics: Optional[QueryMetrics] = None
+    ):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self._connect = connect
+        self.min_size = max(0, min(min_size, max_size))
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.health_check_interval = health_check_interval
+        self.acquire_timeout = acquire_timeout
+        self.metrics = metrics
+
+        self._cond = threading.Condition(threading.Lock())
+        self._idle: List[_PooledConnection] = []
+        self._size = 0
+        self._closed = False
+
+        self._stats = {
+            'acquired': 0,
+            'waited': 0,
+            'wait_seconds_total': 0.0,
+            'wait_seconds_max': 0.0,
+            'timeouts': 0,
+            'created': 0,
+            'discarded': 0,
+            'health_check_failures': 0,
+        }
+
+        for _ in range(self.min_size):
+            try:
+                self._idle.append(self._open())
+                self._size += 1
+            except Exception as e:
+                logger.warning(f"Could not pre-open pooled connection: {e}")
+                break
+
+    # ------------------------------------------------------------------
+    # Connection lifecycle
+    # ------------------------------------------------------------------
+
+    def _open(self) -> _PooledConnection:
+        conn = self._connect()
+        self._stats['created'] += 1
+        return _PooledConnection(conn)
+
+    def _close_quietly(self, pooled: _PooledConnection) -> None:
+        try:
+            pooled.conn.close()
+        except Exception:
+            pass
+
+    def _is_expired(self, pooled: _PooledConnection, now: float) -> bool:
+        return self.max_lifetime > 0 and now - pooled.created_at >= self.max_lifetime
+
+    def _is_healthy(self, pooled: _PooledConnection, now: float) -> bool:
+        if getattr(pooled.conn, 'closed', False):
+            return False
+        if now - pooled.last_used_at < self.health_check_interval:
+            return True
+        try:
+            with pooled.conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            pooled.conn.rollback()
+            return True
+        except Exception as e:
+            logger.warning(f"Pooled connection failed health check: {e}")
+            with self._cond:
+                self._stats['health_check_failures'] += 1
+            return False
+
+    def _acquire(self) -> _PooledConnection:
+        started = time.monotonic()
+        deadline = started + self.acquire_timeout
+        waited = False
+
+        while True:
+            with self._cond:
+                if self._closed:
+                    raise PoolTimeoutError("Connection pool is closed")
+
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats['timeouts'] += 1
+                        raise PoolTimeoutError(
+                            f"No database connection available after {self.acquire_timeout}s "
+                            f"(max_size={self.max_size})"
+                        )
+                    waited = True
+                    self._cond.wait(remaining)
+
+                pooled = self._idle.pop() if self._idle else None
+                if pooled is None:
+                    # Reserve a slot before connecting outside the lock
+                    self._size += 1
+
+            if pooled is None:
+                try:
+                    pooled = self._open()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+            else:
+                now = time.monotonic()
+                if self._is_expired(pooled, now) or not self._is_healthy(pooled, now):
+                    self._discard(pooled)
+                    continue
+
+            wait = time.monotonic() - started
+            with self._cond:
+                self._stats['acquired'] += 1
+                if waited:
+                    self._stats['waited'] += 1
+                self._stats['wait_seconds_total'] += wait
+                self._stats['wait_seconds_max'] = max(self._stats['wait_seconds_max'], wait)
+            return pooled
+
+    def _release(self, pooled: _PooledConnection, broken: bool = False) -> None:
+        now = time.monotonic()
+        if broken or getattr(pooled.conn, 'closed', False) or self._is_expired(pooled, now):
+            self._discard(pooled)
+            return
+
+        pooled.last_used_at = now
+        with self._cond:
+            if self._closed:
+                self._size -= 1
+                self._close_quietly(pooled)
+                return
+            self._idle.append(pooled)
+            self._cond.notify()
+
+    def _discard(self, pooled: _PooledConnection) -> None:
+        self._close_quietly(pooled)
+        with self._cond:
+            self._size -= 1
+            self._stats['discarded'] += 1
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for one unit of work (one transaction)."""
+        pooled = self._acquire()
+        try:
+            if self.metrics is not None and self.metrics.enabled:
+                yield InstrumentedConnection(pooled.conn, self.metrics)
+            else:
+                yield pooled.conn
+        except BaseException:
+            broken = False
+            try:
+                pooled.conn.rollback()
+            except Exception:
+                broken = True
+            self._release(pooled, broken=broken)
+            raise
+        else:
+            try:
+                pooled.conn.commit()
+            except Exception:
+                self._release(pooled, broken=True)
+                raise
+            self._release(pooled)
+
+    def close(self) -> None:
+        """Close every idle connection; in-use ones close when returned."""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for pooled in idle:
+            self._close_quietly(pooled)
+
+    def stats(self) -> Dict:
+        """Pool size and wait metrics, e.g. for a status endpoint."""
+        with self._cond:
+            stats = dict(self._stats)
+            stats['size'] = self._size
+            stats['idle'] = len(self._idle)
+            stats['in_use'] = self._size - len(self._idle)
+            stats['max_size'] = self.max_size
+        acquired = stats['acquired']
+        stats['wait_seconds_avg'] = stats['wait_seconds_total'] / acquired if acquired else 0.0
+        return stats
+
+
+# Process-wide pools, one per connection target, shared by every
+# DatabaseService instance.
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_connection_pool(key: str, connect: Callable[[], object], **kwargs) -> ConnectionPool:
+    """Get or create the shared pool for a connection target."""
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = ConnectionPool(connect, **kwargs)
+            _pools[key] = pool
+        return pool
+
+
+def close_all_pools() -> None:
+    """Close every shared pool (called on process shutdown)."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+def get_pool_stats() -> Dict[str, Dict]:
+    with _pools_lock:
+        return {key: pool.stats() for key, pool in _pools.items()}
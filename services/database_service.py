@@ -1,15 +1,27 @@
-from typing import List, Dict, Optional
-from datetime import datetime
+import hashlib
+import json
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Iterator, List, Dict, Optional, Tuple
+from datetime import date, datetime, timedelta
 from config import Config
 from utils.retry_decorator import retry, safe_execute, ErrorContext
 from utils.logger import setup_logger
+from services.connection_pool import get_connection_pool
+from services.identity_registry import IDENTITY_TABLES, get_identity_registry
+from services.query_cache import cached, get_query_cache, invalidates
+from services.audit_buffer import get_audit_buffer
+from services.query_metrics import InstrumentedClient, get_query_metrics
+from services.motor_allocation import active_motor_by_flat, allocate_motor_shares, month_bounds
 
 logger = setup_logger('database_service')
 
 # Import psycopg2 only if needed (for legacy PostgreSQL)
 try:
     import psycopg2
-    from psycopg2.extras import RealDictCursor
+    from psycopg2.extras import Json, RealDictCursor, execute_values
     HAS_PSYCOPG2 = True
 except ImportError:
     HAS_PSYCOPG2 = False
@@ -30,8 +42,15 @@ class DatabaseService:
     # See the implemented method further down in the class.
     
     def __init__(self):
+        backend = Config.DATABASE_BACKEND
+        if backend == 'local':
+            # Embedded SQLite database that implements the Supabase client
+            # contract, so all Supabase code paths below run unchanged.
+            self.use_supabase = True
+            from services.local_backend import create_local_client
+            self.supabase = create_local_client(Config.LOCAL_DATABASE_PATH)
         # Try Supabase REST API first, fallback to PostgreSQL
-        if Config.SUPABASE_URL and Config.SUPABASE_KEY:
+        elif backend != 'postgres' and Config.SUPABASE_URL and Config.SUPABASE_KEY:
             self.use_supabase = True
             from supabase import create_client
             self.supabase = create_client(Config.SUPABASE_URL, Config.SUPABASE_KEY)
@@ -51,18 +70,215 @@ class DatabaseService:
                     'password': Config.POSTGRES_PASSWORD,
                     'sslmode': 'require'  # Required for Supabase
                 }
+
+        # Shared psycopg2 pool, created on the first get_connection()
+        self._pool = None
+
+        # Shared alias index for meter numbers, meter PKs, unit IDs and
+        # flat codes. Loaded lazily on first lookup, then served from
+        # memory so identity resolution costs no round trips.
+        if backend == 'local':
+            registry_key = f"local:{Config.LOCAL_DATABASE_PATH}"
+        elif self.use_supabase:
+            registry_key = f"supabase:{Config.SUPABASE_URL}"
+        else:
+            registry_key = f"postgres:{self.connection_string or self.connection_params}"
+        # Per-query latency/row/byte histograms shared by every
+        # DatabaseService on this backend (see get_query_metrics); the
+        # psycopg2 pool records into the same metrics (get_connection)
+        self.metrics = get_query_metrics(registry_key, enabled=Config.QUERY_METRICS_ENABLED)
+        if self.use_supabase and self.metrics.enabled:
+            self.supabase = InstrumentedClient(self.supabase, self.metrics)
+
+        self.identity = get_identity_registry(
+            registry_key,
+            self._load_identity_tables,
+            ttl_seconds=Config.IDENTITY_REGISTRY_TTL_SECONDS,
+        )
+
+        # Shared read-through cache for bills, meters, readings and
+        # dashboard aggregates. Write methods evict only the entries
+        # they touch (see _bill_cache_tags / _reading_cache_tags).
+        self.cache = get_query_cache(
+            registry_key,
+            ttls={
+                'bill': Config.QUERY_CACHE_BILL_TTL_SECONDS,
+                'bills_by_customer': Config.QUERY_CACHE_BILL_TTL_SECONDS,
+                'meters': Config.QUERY_CACHE_METER_TTL_SECONDS,
+                'readings': Config.QUERY_CACHE_READING_TTL_SECONDS,
+                'aggregate': Config.QUERY_CACHE_AGGREGATE_TTL_SECONDS,
+            },
+            max_entries=Config.QUERY_CACHE_MAX_ENTRIES,
+            enabled=Config.QUERY_CACHE_ENABLED,
+        )
+
+        # Write-behind buffer for notifications/payment_events audit rows
+        # (see log_notification / log_payment_event)
+        spill_name = hashlib.sha1(registry_key.encode('utf-8')).hexdigest()[:12]
+        self.audit = get_audit_buffer(
+            registry_key,
+            self._insert_audit_rows,
+            batch_size=Config.AUDIT_BATCH_SIZE,
+            flush_interval=Config.AUDIT_FLUSH_INTERVAL_SECONDS,
+            spill_path=os.path.join(Config.AUDIT_SPILL_DIR, f"audit_{spill_name}.jsonl"),
+        )
+
+    def _load_identity_tables(self) -> Dict[str, List[Dict]]:
+        """Fetch the identity tables used by the registry (one query per table)"""
+        columns = {
+            'meters': 'id, meter_number, flat_id, motor_id, status',
+            'flats': 'id, code, floor_id, type_id',
+            'floors': 'id, code',
+            'flat_types': 'id, name',
+        }
+        tables = {}
+        if self.use_supabase:
+            page_size = 1000
+
+            def load(table):
+                rows = []
+                offset = 0
+                while True:
+                    response = (
+                        self.supabase
+                        .table(table)
+                        .select(columns[table])
+                        .order('id')
+                        .range(offset, offset + page_size - 1)
+                        .execute()
+                    )
+                    page = response.data or []
+                    rows.extend(page)
+                    if len(page) < page_size:
+                        return rows
+                    offset += page_size
+
+            # The four tables are independent; fetch them concurrently
+            with ThreadPoolExecutor(max_workers=len(IDENTITY_TABLES)) as executor:
+                return dict(zip(IDENTITY_TABLES, executor.map(load, IDENTITY_TABLES)))
+
+        with self.get_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                for table in IDENTITY_TABLES:
+                    cur.execute(f"SELECT {columns[table]} FROM {table}")
+                    tables[table] = [dict(row) for row in cur.fetchall()]
+        return tables
     
+    def _connect(self):
+        """Open one raw psycopg2 connection (used by the pool)"""
+        if self.connection_string:
+            return psycopg2.connect(self.connection_string, sslmode='require')
+        return psycopg2.connect(**self.connection_params)
+
+    def _pool_key(self) -> str:
+        """Identify the connection target without embedding the password"""
+        if self.connection_string:
+            digest = hashlib.sha1(self.connection_string.encode('utf-8')).hexdigest()[:12]
+            return f"dsn:{digest}"
+        params = self.connection_params
+        return f"{params['user']}@{params['host']}:{params['port']}/{params['database']}"
+
     def get_connection(self):
-        """Create a database connection (legacy PostgreSQL only)"""
+        """Borrow a pooled database connection (legacy PostgreSQL only).
+
+        Use as ``with self.get_connection() as conn:``. The block runs as
+        one transaction: committed on success, rolled back on error, and
+        the connection goes back to the shared pool either way.
+        """
         if self.use_supabase:
             raise Exception("Using Supabase REST API - direct connection not needed")
         if not HAS_PSYCOPG2:
             raise Exception("psycopg2 not installed - use Supabase configuration")
-        if self.connection_string:
-            return psycopg2.connect(self.connection_string, sslmode='require')
-        else:
-            return psycopg2.connect(**self.connection_params)
+        if self._pool is None:
+            self._pool = get_connection_pool(
+                self._pool_key(),
+                self._connect,
+                min_size=Config.POSTGRES_POOL_MIN_SIZE,
+                max_size=Config.POSTGRES_POOL_MAX_SIZE,
+                max_lifetime=Config.POSTGRES_POOL_MAX_LIFETIME_SECONDS,
+                health_check_interval=Config.POSTGRES_POOL_HEALTH_CHECK_SECONDS,
+                acquire_timeout=Config.POSTGRES_POOL_ACQUIRE_TIMEOUT_SECONDS,
+                metrics=self.metrics,
+            )
+        return self._pool.connection()
+
+    @staticmethod
+    def _bill_cache_tags(bill_id=None, row=None, new_bill: bool = False) -> List[str]:
+        """Cache tags touched by writing one bill"""
+        tags = ['bills:aggregate']
+        if bill_id is not None:
+            tags.append(f"bill:{bill_id}")
+        flat_id = row.get('flat_id') if isinstance(row, dict) else None
+        tags.append(f"bills:flat:{flat_id}" if flat_id is not None else 'ns:bills_by_customer')
+        if new_bill:
+            # A new bill references readings, so they stop being unbilled
+            tags.append('readings:unbilled')
+        return tags
+
+    @staticmethod
+    def _reading_cache_tags(meter_pk=None) -> List[str]:
+        """Cache tags touched by writing readings (one meter, or any)"""
+        tags = ['readings:aggregate', 'readings:unbilled']
+        tags.append(f"readings:meter:{meter_pk}" if meter_pk is not None else 'ns:readings')
+        return tags
+
+    def _insert_audit_rows(self, table: str, rows: List[Dict]) -> None:
+        """Multi-row insert used by the audit buffer.
+
+        Rows are grouped by their key set so omitted columns keep their
+        database defaults instead of being sent as NULL.
+        """
+        groups: Dict[Tuple[str, ...], List[Dict]] = {}
+        for row in rows:
+            groups.setdefault(tuple(sorted(row)), []).append(row)
+
+        for columns, group in groups.items():
+            if self.use_supabase:
+                self.supabase.table(table).insert(group).execute()
+                continue
+            with self.get_connection() as conn:
+                with conn.cursor() as cur:
+                    execute_values(
+                        cur,
+                        f"INSERT INTO {table} ({', '.join(columns)}) VALUES %s",
+                        [
+                            tuple(Json(row[c]) if isinstance(row[c], (dict, list)) else row[c] for c in columns)
+                            for row in group
+                        ],
+                    )
+        logger.debug(f"Flushed {len(rows)} {table} audit rows")
+
+    def flush_audit_log(self) -> int:
+        """Write queued notification/payment_event rows now"""
+        return self.audit.flush()
+
+    # Cache tags behind each dashboard data area, for "Refresh" buttons
+    CACHE_REFRESH_TAGS = {
+        'bills': ('ns:bill', 'ns:bills_by_customer', 'bills:aggregate'),
+        'readings': ('ns:readings', 'readings:aggregate', 'readings:unbilled'),
+        'meters': ('ns:meters', 'meters', 'flat_motors'),
+    }
+
+    def refresh_cache(self, *areas: str) -> int:
+        """Drop cached reads for the given areas ('bills', 'readings', 'meters')"""
+        tags = [tag for area in areas for tag in self.CACHE_REFRESH_TAGS[area]]
+        return self.cache.invalidate(*tags)
+
+    def get_cache_stats(self) -> Dict:
+        """Read-through cache hit/miss statistics"""
+        return self.cache.stats()
+
+    def get_query_metrics(self) -> Dict:
+        """Per-table/RPC query counts, latency histograms, rows and bytes"""
+        return self.metrics.snapshot()
+
+    def get_pool_stats(self) -> Dict:
+        """Connection pool metrics (empty in Supabase mode)"""
+        return self._pool.stats() if self._pool is not None else {}
     
+    @cached('readings', tags=lambda self, meter_id, *_, **__: (
+        f"readings:meter:{self.identity.resolve_meter_pk(meter_id)}",
+    ))
     @retry(max_attempts=3, delay=1, backoff=2, exceptions=(Exception,))
     def get_historical_readings(self, meter_id: str, limit: int = 10) -> List[Dict]:
         """Retrieve historical meter readings for a specific meter"""
@@ -72,31 +288,9 @@ class DatabaseService:
             if self.use_supabase:
                 # New schema: readings are stored in 'readings' and linked to the
                 # 'meters' table via an integer meter_id. The caller may pass
-                # either a meter_number (e.g. "87923504") or a numeric ID.
-
-                meter_pk = None
-
-                # 1) Try resolving by meter_number first (most common from UI)
-                try:
-                    meters_resp = (
-                        self.supabase
-                        .table('meters')
-                        .select('id')
-                        .eq('meter_number', str(meter_id))
-                        .limit(1)
-                        .execute()
-                    )
-                    if meters_resp.data:
-                        meter_pk = meters_resp.data[0]['id']
-                except Exception as e:
-                    logger.warning(f"Error resolving meter_number for {meter_id}: {e}")
-
-                # 2) If not found, fall back to treating the input as a numeric id
-                if meter_pk is None:
-                    try:
-                        meter_pk = int(str(meter_id))
-                    except (TypeError, ValueError):
-                        meter_pk = None
+                # either a meter_number (e.g. "87923504") or a numeric ID;
+                # the identity registry resolves both from memory.
+                meter_pk = self.identity.resolve_meter_pk(meter_id)
 
                 if meter_pk is None:
                     logger.info(f"No meter found for identifier {meter_id}; returning empty history")
@@ -125,110 +319,368 @@ class DatabaseService:
             LIMIT %s
         """
         
+        meter_pk = self.identity.resolve_meter_pk(meter_id)
+
         with self.get_connection() as conn:
             with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute(query, (meter_id, limit))
+                cur.execute(query, (meter_pk if meter_pk is not None else meter_id, limit))
                 results = cur.fetchall()
                 return [dict(row) for row in results]
     
+    def _iter_keyset(
+        self,
+        table: str,
+        sort_column: str,
+        columns: str = '*',
+        page_size: int = 1000,
+        descending: bool = False,
+        apply_filters=None
+    ) -> Iterator[Dict]:
+        """Walk a table page by page on a ``(sort_column, id)`` keyset cursor.
+
+        Each page is a fresh request filtered to rows strictly after the
+        last row seen, so memory stays flat and results are not capped
+        by PostgREST's max-rows setting.
+        """
+        if columns != '*':
+            selected = [c.strip() for c in columns.split(',')]
+            for required in (sort_column, 'id'):
+                if required not in selected:
+                    selected.append(required)
+            columns = ', '.join(selected)
+
+        op = 'lt' if descending else 'gt'
+        cursor = None
+
+        while True:
+            query = self.supabase.table(table).select(columns)
+            if apply_filters is not None:
+                query = apply_filters(query)
+            if cursor is not None:
+                value, last_id = cursor
+                query = query.or_(
+                    f'{sort_column}.{op}."{value}",'
+                    f'and({sort_column}.eq."{value}",id.{op}.{last_id})'
+                )
+
+            response = (
+                query
+                .order(sort_column, desc=descending)
+                .order('id', desc=descending)
+                .limit(page_size)
+                .execute()
+            )
+            rows = response.data or []
+            yield from rows
+
+            if len(rows) < page_size:
+                return
+            last = rows[-1]
+            cursor = (last.get(sort_column), last.get('id'))
+
+    def _iter_postgres(self, query: str, params: tuple, page_size: int) -> Iterator[Dict]:
+        """Stream a legacy PostgreSQL query through a server-side cursor"""
+        with self.get_connection() as conn:
+            with conn.cursor(name=f"iter_{uuid.uuid4().hex}", cursor_factory=RealDictCursor) as cur:
+                cur.itersize = page_size
+                cur.execute(query, params)
+                for row in cur:
+                    yield dict(row)
+
+    def iter_readings(
+        self,
+        page_size: int = 1000,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        meter_id=None,
+        columns: str = '*',
+        descending: bool = False
+    ) -> Iterator[Dict]:
+        """Stream readings ordered by ``(reading_date, id)``.
+
+        ``start_date``/``end_date`` bound reading_date (end exclusive);
+        ``meter_id`` accepts a meter number or id.
+        """
+        logger.debug(f"Streaming readings (page_size={page_size}, {start_date} to {end_date}, meter={meter_id})")
+
+        meter_pk = self.identity.resolve_meter_pk(meter_id) if meter_id is not None else None
+
+        if self.use_supabase:
+            def apply_filters(query):
+                if start_date:
+                    query = query.gte('reading_date', start_date)
+                if end_date:
+                    query = query.lt('reading_date', end_date)
+                if meter_pk is not None:
+                    query = query.eq('meter_id', meter_pk)
+                return query
+
+            yield from self._iter_keyset(
+                'readings', 'reading_date', columns, page_size, descending, apply_filters
+            )
+            return
+
+        conditions, params = [], []
+        if start_date:
+            conditions.append("reading_date >= %s")
+            params.append(start_date)
+        if end_date:
+            conditions.append("reading_date < %s")
+            params.append(end_date)
+        if meter_pk is not None:
+            conditions.append("meter_id = %s")
+            params.append(meter_pk)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        direction = "DESC" if descending else "ASC"
+
+        yield from self._iter_postgres(
+            f"SELECT {columns} FROM readings{where} ORDER BY reading_date {direction}, id {direction}",
+            tuple(params),
+            page_size,
+        )
+
+    def iter_bills(
+        self,
+        page_size: int = 1000,
+        status: Optional[str] = None,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        columns: str = '*',
+        descending: bool = False
+    ) -> Iterator[Dict]:
+        """Stream bills ordered by ``(created_at, id)``.
+
+        ``start``/``end`` bound created_at (end exclusive).
+        """
+        logger.debug(f"Streaming bills (page_size={page_size}, status={status}, {start} to {end})")
+
+        if self.use_supabase:
+            def apply_filters(query):
+                if status:
+                    query = query.eq('status', status)
+                if start:
+                    query = query.gte('created_at', start)
+                if end:
+                    query = query.lt('created_at', end)
+                return query
+
+            yield from self._iter_keyset(
+                'bills', 'created_at', columns, page_size, descending, apply_filters
+            )
+            return
+
+        conditions, params = [], []
+        if status:
+            conditions.append("status = %s")
+            params.append(status)
+        if start:
+            conditions.append("created_at >= %s")
+            params.append(start)
+        if end:
+            conditions.append("created_at < %s")
+            params.append(end)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        direction = "DESC" if descending else "ASC"
+
+        yield from self._iter_postgres(
+            f"SELECT {columns} FROM bills{where} ORDER BY created_at {direction}, id {direction}",
+            tuple(params),
+            page_size,
+        )
+
     def get_all_readings(self, limit: int = 10000) -> List[Dict]:
-        """Retrieve ALL meter readings from database"""
+        """Retrieve up to ``limit`` meter readings, newest first.
+
+        Pages through the table with iter_readings, so limits above the
+        PostgREST page size are honoured instead of silently capped.
+        """
         logger.debug(f"Fetching all readings (limit: {limit})")
         
         try:
-            if self.use_supabase:
-                # New schema: use the consolidated 'readings' table
-                response = (
-                    self.supabase
-                    .table('readings')
-                    .select('*')
-                    .order('reading_date', desc=True)
-                    .limit(limit)
-                    .execute()
-                )
-                logger.info(f"Retrieved {len(response.data or [])} total readings from 'readings'")
-                return response.data or []
+            readings = list(islice(
+                self.iter_readings(page_size=min(limit, 1000) or 1, descending=True),
+                limit,
+            ))
+            logger.info(f"Retrieved {len(readings)} total readings from 'readings'")
+            return readings
         except Exception as e:
             logger.error(f"Error fetching all readings: {e}")
             raise
-        
-        query = """
-            SELECT * FROM readings 
-            ORDER BY reading_date DESC 
-            LIMIT %s
-        """
-        
+
+    @cached('aggregate', tags=lambda *_, **__: ('readings:aggregate',))
+    def count_readings(
+        self,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        min_value: Optional[float] = None
+    ) -> int:
+        """Count readings with reading_date in [start_date, end_date) and value > min_value"""
+        logger.debug(f"Counting readings ({start_date} to {end_date}, min_value={min_value})")
+
+        try:
+            if self.use_supabase:
+                def apply_filters(query):
+                    if start_date:
+                        query = query.gte('reading_date', start_date)
+                    if end_date:
+                        query = query.lt('reading_date', end_date)
+                    if min_value is not None:
+                        query = query.gt('reading_value', min_value)
+                    return query
+
+                return self._count_rows('readings', apply_filters)
+        except Exception as e:
+            logger.error(f"Error counting readings: {e}")
+            raise
+
+        conditions, params = [], []
+        if start_date:
+            conditions.append("reading_date >= %s")
+            params.append(start_date)
+        if end_date:
+            conditions.append("reading_date < %s")
+            params.append(end_date)
+        if min_value is not None:
+            conditions.append("reading_value > %s")
+            params.append(min_value)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
         with self.get_connection() as conn:
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute(query, (limit,))
-                results = cur.fetchall()
-                return [dict(row) for row in results]
+            with conn.cursor() as cur:
+                cur.execute(f"SELECT COUNT(*) FROM readings{where}", tuple(params))
+                return int(cur.fetchone()[0])
 
     def get_monthly_readings_count(self, year: int, month: int) -> int:
         """Count readings in the new 'readings' table for a given month.
 
         This is used for the Field Engineer dashboard progress counter.
         It only considers rows in the new schema (readings table), not the
-        legacy 'meter_readings' table.
+        legacy 'meter_readings' table. Only actual readings (value > 0)
+        are counted, and the count is computed server-side.
         """
 
         logger.debug(f"Counting readings for {year}-{month:02d} in new schema")
 
-        from datetime import date as _date
+        start = date(year, month, 1)
+        if month == 12:
+            next_month = date(year + 1, 1, 1)
+        else:
+            next_month = date(year, month + 1, 1)
+
+        try:
+            count = self.count_readings(start.isoformat(), next_month.isoformat(), min_value=0)
+            logger.info(f"Monthly readings count for {year}-{month:02d}: {count}")
+            return count
+        except Exception as e:
+            logger.error(f"Error counting monthly readings for {year}-{month:02d}: {e}")
+            return 0
+
+    @cached('aggregate', tags=lambda *_, **__: ('bills:aggregate',))
+    def count_bills(self, statuses: Optional[List[str]] = None) -> int:
+        """Count bills, optionally restricted to the given statuses"""
+        logger.debug(f"Counting bills (statuses={statuses})")
 
         try:
             if self.use_supabase:
-                # Compute month start and start of next month
-                start = _date(year, month, 1)
-                if month == 12:
-                    next_month = _date(year + 1, 1, 1)
-                else:
-                    next_month = _date(year, month + 1, 1)
+                def apply_filters(query):
+                    if statuses:
+                        query = query.in_('status', list(statuses))
+                    return query
 
-                response = (
-                    self.supabase
-                    .table('readings')
-                    .select('id, reading_date, reading_value')
-                    .gte('reading_date', start.isoformat())
-                    .lt('reading_date', next_month.isoformat())
-                    .execute()
-                )
+                return self._count_rows('bills', apply_filters)
+        except Exception as e:
+            logger.error(f"Error counting bills: {e}")
+            raise
 
-                rows = response.data or []
+        query = "SELECT COUNT(*) FROM bills"
+        params: tuple = ()
+        if statuses:
+            query += " WHERE status = ANY(%s)"
+            params = (list(statuses),)
 
-                # Only count actual readings (value > 0), mirroring old logic
-                count = 0
-                for r in rows:
-                    try:
-                        if float(r.get('reading_value', 0) or 0) > 0:
-                            count += 1
-                    except Exception:
-                        continue
+        with self.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(query, params)
+                return int(cur.fetchone()[0])
+
+    @cached('aggregate', tags=lambda *_, **__: ('bills:aggregate',))
+    def get_bill_status_summary(self, start: Optional[str] = None, end: Optional[str] = None) -> Dict[str, Dict]:
+        """Bill count and total_amount per status, aggregated in the database.
+
+        ``start``/``end`` optionally bound ``created_at`` (end exclusive).
+        Returns ``{status: {"count": int, "total_amount": float}}``.
+        """
+        logger.debug(f"Fetching bill status summary ({start} to {end})")
+
+        summary: Dict[str, Dict] = {}
 
-                logger.info(f"Monthly readings count for {year}-{month:02d}: {count}")
-                return count
+        def add(status, count, amount):
+            entry = summary.setdefault(status, {"count": 0, "total_amount": 0.0})
+            entry["count"] += int(count or 0)
+            entry["total_amount"] += float(amount or 0)
+
+        try:
+            if self.use_supabase:
+                try:
+                    response = self.supabase.rpc(
+                        'bill_status_summary', {'p_from': start, 'p_to': end}
+                    ).execute()
+                    for row in response.data or []:
+                        add(row.get('status'), row.get('bill_count'), row.get('total_amount'))
+                except PostgrestAPIError as e:
+                    if not self._is_missing_relation_error(e) and 'PGRST202' not in str(e):
+                        raise
+                    # RPC not deployed yet: aggregate a two-column projection
+                    logger.warning("bill_status_summary RPC missing; aggregating client-side")
+                    page_size = 1000
+                    offset = 0
+                    while True:
+                        query = self.supabase.table('bills').select('status, total_amount')
+                        if start:
+                            query = query.gte('created_at', start)
+                        if end:
+                            query = query.lt('created_at', end)
+                        rows = query.order('id').range(offset, offset + page_size - 1).execute().data or []
+                        for row in rows:
+                            add(row.get('status'), 1, row.get('total_amount'))
+                        if len(rows) < page_size:
+                            break
+                        offset += page_size
+
+                logger.info(f"Bill status summary: {summary}")
+                return summary
         except Exception as e:
-            logger.error(f"Error counting monthly readings for {year}-{month:02d}: {e}")
-            return 0
+            logger.error(f"Error fetching bill status summary: {e}")
+            raise
 
-        # Legacy non-Supabase path is no-op for the new schema
-        return 0
-    
-    @retry(max_attempts=3, delay=1, backoff=2, exceptions=(Exception,))
-    def create_bill(self, bill_data: Dict) -> Dict:
-        """Create a single bill record.
+        conditions, params = [], []
+        if start:
+            conditions.append("created_at >= %s")
+            params.append(start)
+        if end:
+            conditions.append("created_at < %s")
+            params.append(end)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
 
-        This is used by the Streamlit dashboards, API, and scheduler
-        when generating an individual bill from a calculated amount.
+        with self.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    f"SELECT status, COUNT(*), COALESCE(SUM(amount), 0) FROM bills{where} GROUP BY status",
+                    tuple(params),
+                )
+                for status, count, amount in cur.fetchall():
+                    add(status, count, amount)
+        return summary
+
+    @staticmethod
+    def _is_november_locked(bill_data: Dict) -> bool:
+        """Return True when a new bill would land in locked November 2025.
+
+        We still allow future bills whose period STARTS in November
+        2025 but ENDS in a later month (e.g. 2025‑11‑30 → 2026‑01‑03)
+        so that newer bills can depend on the final November
+        readings without altering any existing November bills.
         """
-        logger.debug(f"Creating bill for customer {bill_data.get('customer_id')} meter {bill_data.get('meter_id')}")
-
-        # Hard safety: never create *new* November 2025 bills.
-        #
-        # We still allow future bills whose period STARTS in November
-        # 2025 but ENDS in a later month (e.g. 2025‑11‑30 → 2026‑01‑03)
-        # so that newer bills can depend on the final November
-        # readings without altering any existing November bills.
         try:
             end_raw = bill_data.get('billing_period_end')
             end_dt = datetime.fromisoformat(str(end_raw)).date() if end_raw else None
@@ -236,180 +688,141 @@ class DatabaseService:
             # Block only when the bill's END date is in November 2025,
             # which corresponds to the historical November bills we
             # want to keep frozen.
-            if end_dt and end_dt.year == 2025 and end_dt.month == 11:
-                logger.warning("Single-bill creation for November 2025 is locked (end date in 2025-11); skipping insert.")
-                return {
-                    "status": "error",
-                    "message": "Billing for November 2025 is locked and cannot be modified.",
-                }
+            return bool(end_dt and end_dt.year == 2025 and end_dt.month == 11)
         except Exception:
             # If date parsing fails, fall through and let DB/validation handle it
-            pass
+            return False
+
+    def _build_bill_payload(self, bill_data: Dict) -> Tuple[Optional[Dict], Optional[Dict]]:
+        """Map legacy bill_data into the new Supabase "bills" schema.
+
+        Returns ``(payload, None)`` on success or ``(None, error)`` where
+        ``error`` is the ``{"status": "error", "message": ...}`` dict the
+        callers already surface to the UI.
+        """
+        flat_units = bill_data.get('consumption_kwh') or bill_data.get('flat_units') or 0.0
+        motor_units = bill_data.get('motor_units', 0.0)
+        total_units = bill_data.get('total_units') or (flat_units + motor_units)
+
+        # Resolve flat_id via the identity registry, in order:
+        # 1) explicit bill_data["flat_id"];
+        # 2) the meter identifier (meter number, then meter id),
+        #    since the workflow treats the meter number as the
+        #    primary identifier;
+        # 3) bill_data["customer_id"] as either a numeric flat_id
+        #    or a unit/flat code such as "5BHK-B17-FF".
+        resolved_flat_id = self.identity.resolve_flat_id(
+            flat_id=bill_data.get('flat_id'),
+            meter_id=bill_data.get('meter_id'),
+            customer_id=bill_data.get('customer_id'),
+        )
+
+        if resolved_flat_id is None:
+            # We can't safely insert a bill without a valid flat_id
+            # in the new normalized schema.
+            logger.error(
+                "Aborting bill creation: flat_id could not be resolved from bill_data=%s",
+                bill_data,
+            )
+            return None, {
+                "status": "error",
+                "message": "Could not resolve flat for this bill; please check the unit ID/flat mapping.",
+            }
+
+        # Determine the total amount carefully. We must not use the
+        # Python ``or`` operator here because ``0.0`` is falsy and
+        # would cause us to fall back to a missing ``total_amount``
+        # key, resulting in ``NULL`` being sent to a NOT NULL column.
+        amount_value = bill_data.get('amount')
+        if amount_value is None:
+            amount_value = bill_data.get('total_amount')
+
+        if amount_value is None:
+            logger.error(
+                "Aborting bill creation: total_amount is missing in bill_data=%s",
+                bill_data,
+            )
+            return None, {
+                "status": "error",
+                "message": "Bill total amount is missing; cannot create bill.",
+            }
 
+        # Derive a due_date for the normalized Supabase schema.
+        # The live "bills" table treats due_date as NOT NULL,
+        # and the existing flows use the billing_period_end as
+        # the logical due date (see scheduler_service and
+        # Discord notifications). To stay consistent and avoid
+        # constraint violations, we mirror that behaviour here.
+        billing_period_end = bill_data.get('billing_period_end')
+        due_date = bill_data.get('due_date') or billing_period_end
+
+        created_at = bill_data.get('created_at', datetime.now().isoformat())
+        if isinstance(created_at, datetime):
+            created_at = created_at.isoformat()
+
+        return {
+            'flat_id': resolved_flat_id,
+            'billing_period_start': bill_data.get('billing_period_start'),
+            'billing_period_end': billing_period_end,
+            'due_date': due_date,
+            'flat_units': flat_units,
+            'motor_units': motor_units,
+            'total_units': total_units,
+            'total_amount': amount_value,
+            'status': bill_data.get('status', 'pending'),
+            'created_at': created_at,
+        }, None
+
+    @staticmethod
+    def _alternate_period_start(billing_period_end, latest_start: Optional[date]) -> str:
+        """Pick a non-colliding billing_period_start for a duplicate bill.
+
+        Use the bill's END date as the natural lower bound for the
+        alternate start, but if there are already later starts, move
+        one day beyond the latest to keep it unique.
+        """
         try:
-            if self.use_supabase:
-                # Map legacy bill_data into the new Supabase "bills" schema.
-                flat_units = bill_data.get('consumption_kwh') or bill_data.get('flat_units') or 0.0
-                motor_units = bill_data.get('motor_units', 0.0)
-                total_units = bill_data.get('total_units') or (flat_units + motor_units)
-
-                # Resolve flat_id safely for Supabase:
-                # 1) Prefer explicit bill_data["flat_id"] when provided.
-                # 2) Next, resolve via the meter identifier (meter number or id)
-                #    from the `meters` table, since the workflow now treats
-                #    the meter number as the primary identifier.
-                # 3) Finally, fall back to interpreting bill_data["customer_id"]
-                #    as either a numeric flat_id or a flat code.
-                resolved_flat_id = bill_data.get('flat_id')
-
-                # Step 2: Try resolving from meter identifier
-                if resolved_flat_id is None:
-                    meter_identifier = bill_data.get('meter_id')
-                    if meter_identifier is not None:
-                        meter_flat_id = None
-
-                        # 2a) Resolve by meter_number (string, e.g. "19152159")
-                        try:
-                            meters_resp = (
-                                self.supabase
-                                .table('meters')
-                                .select('id, flat_id')
-                                .eq('meter_number', str(meter_identifier))
-                                .limit(1)
-                                .execute()
-                            )
-                            if meters_resp.data:
-                                meter_flat_id = meters_resp.data[0].get('flat_id')
-                        except Exception as meter_lookup_err:
-                            logger.warning(
-                                "Error resolving flat_id from meter_number %s: %s",
-                                meter_identifier,
-                                meter_lookup_err,
-                            )
-
-                        # 2b) If not found, treat meter_identifier as a numeric meter id
-                        if meter_flat_id is None:
-                            try:
-                                meter_pk = int(str(meter_identifier))
-                                meters_resp = (
-                                    self.supabase
-                                    .table('meters')
-                                    .select('id, flat_id')
-                                    .eq('id', meter_pk)
-                                    .limit(1)
-                                    .execute()
-                                )
-                                if meters_resp.data:
-                                    meter_flat_id = meters_resp.data[0].get('flat_id')
-                            except (TypeError, ValueError):
-                                meter_flat_id = None
-                            except Exception as meter_id_lookup_err:
-                                logger.warning(
-                                    "Error resolving flat_id from meter id %s: %s",
-                                    meter_identifier,
-                                    meter_id_lookup_err,
-                                )
-
-                        if meter_flat_id is not None:
-                            resolved_flat_id = meter_flat_id
-
-                # Step 3: Fall back to customer identifier (unit/flat code or numeric flat id)
-                if resolved_flat_id is None:
-                    customer_identifier = bill_data.get('customer_id')
-                    if customer_identifier is not None:
-                        try:
-                            # If the customer identifier is already a numeric
-                            # flat ID (e.g. from another flow), use it.
-                            resolved_flat_id = int(customer_identifier)
-                        except (TypeError, ValueError):
-                            # Treat it as a unit/flat code, e.g. "5BHK-B17-FF",
-                            # and resolve via the `flats.code` column. The
-                            # production schema stores codes like "B17-FF",
-                            # so we normalise the identifier by stripping any
-                            # leading type prefix and keeping only the last two
-                            # segments.
-                            try:
-                                raw = str(customer_identifier).strip().upper()
-                                parts = [p for p in raw.split('-') if p]
-                                if len(parts) >= 2:
-                                    norm_code = '-'.join(parts[-2:])
-                                else:
-                                    norm_code = raw
-
-                                flat_resp = (
-                                    self.supabase
-                                    .table('flats')
-                                    .select('id')
-                                    .eq('code', norm_code)
-                                    .limit(1)
-                                    .execute()
-                                )
-                                if flat_resp.data:
-                                    resolved_flat_id = flat_resp.data[0]['id']
-                                else:
-                                    logger.warning(
-                                        "Could not resolve flat_id for customer identifier %s (normalised to %s)",
-                                        customer_identifier,
-                                        norm_code,
-                                    )
-                            except Exception as lookup_err:
-                                logger.error(
-                                    "Error looking up flat_id for customer identifier %s: %s",
-                                    customer_identifier,
-                                    lookup_err,
-                                )
-
-                if resolved_flat_id is None:
-                    # We can't safely insert a bill without a valid flat_id
-                    # in the new normalized schema.
-                    logger.error(
-                        "Aborting bill creation: flat_id could not be resolved from bill_data=%s",
-                        bill_data,
-                    )
-                    return {
-                        "status": "error",
-                        "message": "Could not resolve flat for this bill; please check the unit ID/flat mapping.",
-                    }
+            end_dt = datetime.fromisoformat(str(billing_period_end)).date() if billing_period_end else None
+        except Exception:
+            end_dt = None
 
-                # Determine the total amount carefully. We must not use the
-                # Python ``or`` operator here because ``0.0`` is falsy and
-                # would cause us to fall back to a missing ``total_amount``
-                # key, resulting in ``NULL`` being sent to a NOT NULL column.
-                amount_value = bill_data.get('amount')
-                if amount_value is None:
-                    amount_value = bill_data.get('total_amount')
+        candidate = end_dt or (latest_start or datetime.now().date())
+        if latest_start and latest_start >= candidate:
+            candidate = latest_start + timedelta(days=1)
+        return candidate.isoformat()
 
-                if amount_value is None:
-                    logger.error(
-                        "Aborting bill creation: total_amount is missing in bill_data=%s",
-                        bill_data,
-                    )
-                    return {
-                        "status": "error",
-                        "message": "Bill total amount is missing; cannot create bill.",
-                    }
+    @staticmethod
+    def _is_duplicate_bill_error(error: Exception) -> bool:
+        msg = str(error)
+        return 'bills_flat_id_billing_period_start_key' in msg or '23505' in msg
 
-                # Derive a due_date for the normalized Supabase schema.
-                # The live "bills" table treats due_date as NOT NULL,
-                # and the existing flows use the billing_period_end as
-                # the logical due date (see scheduler_service and
-                # Discord notifications). To stay consistent and avoid
-                # constraint violations, we mirror that behaviour here.
-                billing_period_end = bill_data.get('billing_period_end')
-                due_date = bill_data.get('due_date') or billing_period_end
-
-                supabase_payload = {
-                    'flat_id': resolved_flat_id,
-                    'billing_period_start': bill_data.get('billing_period_start'),
-                    'billing_period_end': billing_period_end,
-                    'due_date': due_date,
-                    'flat_units': flat_units,
-                    'motor_units': motor_units,
-                    'total_units': total_units,
-                    'total_amount': amount_value,
-                    'status': bill_data.get('status', 'pending'),
-                    'created_at': bill_data.get('created_at', datetime.now().isoformat()),
-                }
+    @invalidates(lambda self, result, *_, **__: self._bill_cache_tags(
+        (result or {}).get('id'), result, new_bill=True
+    ))
+    @retry(max_attempts=3, delay=1, backoff=2, exceptions=(Exception,))
+    def create_bill(self, bill_data: Dict) -> Dict:
+        """Create a single bill record.
+
+        This is used by the Streamlit dashboards, API, and scheduler
+        when generating an individual bill from a calculated amount.
+        """
+        logger.debug(f"Creating bill for customer {bill_data.get('customer_id')} meter {bill_data.get('meter_id')}")
+
+        # Hard safety: never create *new* November 2025 bills.
+        if self._is_november_locked(bill_data):
+            logger.warning("Single-bill creation for November 2025 is locked (end date in 2025-11); skipping insert.")
+            return {
+                "status": "error",
+                "message": "Billing for November 2025 is locked and cannot be modified.",
+            }
+
+        resolved_flat_id = None
+        try:
+            if self.use_supabase:
+                supabase_payload, error = self._build_bill_payload(bill_data)
+                if error:
+                    return error
+                resolved_flat_id = supabase_payload['flat_id']
 
                 response = self.supabase.table('bills').insert(supabase_payload).execute()
                 logger.info("Created bill via Supabase")
@@ -419,8 +832,7 @@ class DatabaseService:
             # (flat_id, billing_period_start) gracefully so the
             # workflow can show a friendly message instead of a
             # low-level traceback.
-            msg = str(e)
-            if 'bills_flat_id_billing_period_start_key' in msg or '23505' in msg:
+            if self._is_duplicate_bill_error(e):
                 logger.warning(
                     "Duplicate bill detected for flat_id=%s and billing_period_start=%s; attempting alternate start date.",
                     resolved_flat_id,
@@ -461,22 +873,8 @@ class DatabaseService:
                             lookup_err,
                         )
 
-                    # 2) Use the bill's END date as the natural
-                    # lower bound for the alternate start, but if
-                    # there are already later starts, move one day
-                    # beyond the latest to keep it unique.
-                    end_raw = bill_data.get('billing_period_end')
-                    try:
-                        end_dt = datetime.fromisoformat(str(end_raw)).date() if end_raw else None
-                    except Exception:
-                        end_dt = None
-
-                    candidate = end_dt or (latest_start or datetime.now().date())
-                    if latest_start and latest_start >= candidate:
-                        from datetime import timedelta as _timedelta
-                        candidate = latest_start + _timedelta(days=1)
-
-                    alt_start = candidate.isoformat()
+                    # 2) Move past the end date / latest start.
+                    alt_start = self._alternate_period_start(bill_data.get('billing_period_end'), latest_start)
 
                     alt_payload = dict(supabase_payload)
                     alt_payload['billing_period_start'] = alt_start
@@ -538,6 +936,251 @@ class DatabaseService:
                 logger.info("Created bill via PostgreSQL")
                 return dict(result)
 
+    def _existing_bill_starts(self, flat_ids: List[int], from_start: Optional[str] = None) -> Dict[int, set]:
+        """Fetch the billing_period_start values already stored for ``flat_ids``.
+
+        Only starts on or after ``from_start`` (the batch's earliest
+        start) are fetched: older bills can neither collide with the
+        batch nor move an alternate start, so a monthly run reads one
+        period per flat instead of the whole history.
+        """
+        existing: Dict[int, set] = {}
+        page_size = 1000
+        id_chunk = 200
+
+        for i in range(0, len(flat_ids), id_chunk):
+            chunk = flat_ids[i:i + id_chunk]
+            offset = 0
+            while True:
+                query = (
+                    self.supabase
+                    .table('bills')
+                    .select('flat_id, billing_period_start')
+                    .in_('flat_id', chunk)
+                )
+                if from_start:
+                    query = query.gte('billing_period_start', from_start)
+                response = query.order('id').range(offset, offset + page_size - 1).execute()
+                rows = response.data or []
+                for row in rows:
+                    start_raw = row.get('billing_period_start')
+                    if start_raw:
+                        existing.setdefault(row['flat_id'], set()).add(str(start_raw)[:10])
+                if len(rows) < page_size:
+                    break
+                offset += page_size
+
+        return existing
+
+    def _insert_bill_row(self, index: int, payload: Dict) -> Dict:
+        """Insert one planned bill, moving its start past a concurrent duplicate.
+
+        Used when a bulk chunk collides; unlike create_bill it does not
+        retry with sleeps, and an alternate start is reported as such.
+        """
+        try:
+            response = self.supabase.table('bills').insert(payload).execute()
+            return {"index": index, "status": "created", "bill": (response.data or [{}])[0]}
+        except PostgrestAPIError as e:
+            if not self._is_duplicate_bill_error(e):
+                return {"index": index, "status": "error", "message": str(e)}
+
+        try:
+            latest_resp = (
+                self.supabase
+                .table('bills')
+                .select('billing_period_start')
+                .eq('flat_id', payload['flat_id'])
+                .order('billing_period_start', desc=True)
+                .limit(1)
+                .execute()
+            )
+            latest_raw = latest_resp.data[0].get('billing_period_start') if latest_resp.data else None
+            latest_start = datetime.fromisoformat(str(latest_raw)[:10]).date() if latest_raw else None
+
+            alt_payload = dict(payload)
+            alt_payload['billing_period_start'] = self._alternate_period_start(
+                payload.get('billing_period_end'), latest_start
+            )
+            response = self.supabase.table('bills').insert(alt_payload).execute()
+            return {"index": index, "status": "created_alternate", "bill": (response.data or [{}])[0]}
+        except Exception as e:
+            return {"index": index, "status": "error", "message": str(e)}
+
+    @invalidates(lambda *_, **__: ['bills:aggregate', 'readings:unbilled', 'ns:bills_by_customer'])
+    def create_bills_bulk(self, bills: List[Dict], chunk_size: int = 500) -> List[Dict]:
+        """Create many bills with chunked multi-row inserts.
+
+        Flats are resolved from the identity registry, existing
+        ``(flat_id, billing_period_start)`` pairs for the whole batch
+        are fetched once, and collisions get the same alternate start
+        date create_bill would pick, so the batch is written without
+        any per-bill duplicate round trips.
+
+        Returns one outcome per input row, in input order::
+
+            {"index": i, "status": "created" | "created_alternate" | "error",
+             "bill": {...}, "message": "..."}
+        """
+        logger.debug(f"Creating {len(bills)} bills in bulk (chunk_size={chunk_size})")
+
+        outcomes: List[Optional[Dict]] = [None] * len(bills)
+        planned: List[Tuple[int, Dict]] = []
+
+        for index, bill_data in enumerate(bills):
+            if self._is_november_locked(bill_data):
+                outcomes[index] = {
+                    "index": index,
+                    "status": "error",
+                    "message": "Billing for November 2025 is locked and cannot be modified.",
+                }
+                continue
+
+            if not self.use_supabase:
+                planned.append((index, bill_data))
+                continue
+
+            payload, error = self._build_bill_payload(bill_data)
+            if error:
+                outcomes[index] = {"index": index, **error}
+                continue
+            planned.append((index, payload))
+
+        if not planned:
+            return outcomes
+
+        if not self.use_supabase:
+            return self._create_bills_bulk_postgres(planned, outcomes, chunk_size)
+
+        # Plan alternate starts for the whole batch in one pass, including
+        # collisions between rows of the same batch.
+        starts = [str(p['billing_period_start'])[:10] for _, p in planned if p.get('billing_period_start')]
+        existing = self._existing_bill_starts(
+            sorted({p['flat_id'] for _, p in planned}),
+            from_start=min(starts) if starts else None,
+        )
+        alternates = set()
+        for index, payload in planned:
+            taken = existing.setdefault(payload['flat_id'], set())
+            start = str(payload.get('billing_period_start') or '')[:10]
+            if start and start in taken:
+                latest_start = max(datetime.fromisoformat(s).date() for s in taken)
+                payload['billing_period_start'] = self._alternate_period_start(
+                    payload.get('billing_period_end'), latest_start
+                )
+                alternates.add(index)
+                logger.warning(
+                    "Duplicate bill planned for flat_id=%s start=%s; using alternate start %s",
+                    payload['flat_id'],
+                    start,
+                    payload['billing_period_start'],
+                )
+            if payload.get('billing_period_start'):
+                taken.add(str(payload['billing_period_start'])[:10])
+
+        for i in range(0, len(planned), chunk_size):
+            chunk = planned[i:i + chunk_size]
+            try:
+                response = self.supabase.table('bills').insert([p for _, p in chunk]).execute()
+                rows = response.data or []
+                for position, (index, _) in enumerate(chunk):
+                    outcomes[index] = {
+                        "index": index,
+                        "status": "created_alternate" if index in alternates else "created",
+                        "bill": rows[position] if position < len(rows) else {},
+                    }
+            except PostgrestAPIError as e:
+                if not self._is_duplicate_bill_error(e):
+                    logger.error(f"Error inserting bill chunk via Supabase: {e}")
+                    for index, _ in chunk:
+                        outcomes[index] = {"index": index, "status": "error", "message": str(e)}
+                    continue
+
+                # A concurrent writer inserted a colliding row after we
+                # planned the batch; settle just this chunk row by row.
+                logger.warning(
+                    "Bill chunk of %s rows collided with concurrent inserts; falling back to per-row creation.",
+                    len(chunk),
+                )
+                for index, payload in chunk:
+                    outcomes[index] = self._insert_bill_row(index, payload)
+            except Exception as e:
+                # e.g. a transport timeout: earlier chunks are already
+                # committed, so report this chunk and carry on
+                logger.error(f"Error inserting bill chunk via Supabase: {e}")
+                for index, _ in chunk:
+                    outcomes[index] = {"index": index, "status": "error", "message": str(e)}
+
+        created = sum(1 for o in outcomes if o and o['status'] != 'error')
+        moved = sum(1 for o in outcomes if o and o['status'] == 'created_alternate')
+        logger.info(
+            f"Bulk bill creation: {created} created ({moved} with alternate start), "
+            f"{len(bills) - created} failed/skipped"
+        )
+        return outcomes
+
+    def _create_bills_bulk_postgres(
+        self,
+        planned: List[Tuple[int, Dict]],
+        outcomes: List[Optional[Dict]],
+        chunk_size: int
+    ) -> List[Dict]:
+        """Legacy PostgreSQL bulk insert using execute_values"""
+        from psycopg2.extras import execute_values
+
+        query = """
+            INSERT INTO bills (
+                customer_id, meter_id, billing_period_start, billing_period_end,
+                consumption_kwh, amount, status, created_at
+            ) VALUES %s RETURNING *
+        """
+        template = (
+            "(%(customer_id)s, %(meter_id)s, %(billing_period_start)s, %(billing_period_end)s, "
+            "%(consumption_kwh)s, %(amount)s, %(status)s, %(created_at)s)"
+        )
+
+        now = datetime.now().isoformat()
+        with self.get_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                for i in range(0, len(planned), chunk_size):
+                    chunk = [
+                        (index, {'status': 'pending', 'created_at': now, **bill_data})
+                        for index, bill_data in planned[i:i + chunk_size]
+                    ]
+                    # Savepoints keep one bad row from aborting the transaction
+                    cur.execute("SAVEPOINT bills_chunk")
+                    try:
+                        rows = execute_values(
+                            cur, query, [p for _, p in chunk], template=template, fetch=True
+                        )
+                    except psycopg2.Error as e:
+                        cur.execute("ROLLBACK TO SAVEPOINT bills_chunk")
+                        logger.warning(f"Bill chunk of {len(chunk)} rows failed ({e}); inserting row by row")
+                        for index, payload in chunk:
+                            cur.execute("SAVEPOINT bills_row")
+                            try:
+                                rows = execute_values(cur, query, [payload], template=template, fetch=True)
+                                outcomes[index] = {
+                                    "index": index,
+                                    "status": "created",
+                                    "bill": dict(rows[0]) if rows else {},
+                                }
+                            except psycopg2.Error as row_err:
+                                cur.execute("ROLLBACK TO SAVEPOINT bills_row")
+                                outcomes[index] = {"index": index, "status": "error", "message": str(row_err)}
+                        continue
+                    for position, (index, _) in enumerate(chunk):
+                        outcomes[index] = {
+                            "index": index,
+                            "status": "created",
+                            "bill": dict(rows[position]) if position < len(rows) else {},
+                        }
+
+        created = sum(1 for o in outcomes if o and o['status'] != 'error')
+        logger.info(f"Bulk bill creation (PostgreSQL): {created} created, {len(outcomes) - created} failed/skipped")
+        return outcomes
+
+    @invalidates(lambda *_, **__: ['bills:aggregate', 'readings:unbilled', 'ns:bills_by_customer'])
     @retry(max_attempts=3, delay=1, backoff=2, exceptions=(Exception,))
     def generate_bills_for_month(self, billing_period_start: str, billing_period_end: str, due_date: str) -> Dict:
         """Trigger bulk bill generation via database RPC.
@@ -581,6 +1224,7 @@ class DatabaseService:
 
         return {"status": "error", "message": "Legacy mode not supported for RPC billing"}
     
+    @invalidates(lambda self, result, bill_id, *_, **__: self._bill_cache_tags(bill_id, result))
     @retry(max_attempts=3, delay=1, backoff=2, exceptions=(Exception,))
     def update_bill_payment_info(self, bill_id: int, payment_link: str, payment_link_id: str) -> Dict:
         """Update bill with payment link information"""
@@ -617,38 +1261,55 @@ class DatabaseService:
                 conn.commit()
                 return dict(result)
     
-    @retry(max_attempts=3, delay=1, backoff=2, exceptions=(Exception,))
     def log_notification(self, notification_data: Dict) -> Dict:
-        """Log a notification sent to customer"""
+        """Log a notification sent to customer.
+
+        With AUDIT_WRITE_BEHIND_ENABLED the row is queued on the audit
+        buffer and the queued payload is returned; it is inserted in a
+        batch shortly after (or at shutdown). Otherwise it is inserted
+        now, with retries.
+        """
         logger.debug(f"Logging notification for customer {notification_data.get('customer_id')}")
         
+        payload = dict(notification_data)
+        if self.use_supabase:
+            # Supabase `notifications.bill_id` is an integer FK. The
+            # UI sometimes uses a string fallback ID like
+            # "BILL_20260101033825" purely for display. Before
+            # inserting, coerce bill_id to an int when possible;
+            # otherwise, omit it so the column is NULL and we avoid
+            # integer cast errors (22P02).
+            bill_id_val = payload.get('bill_id')
+            if bill_id_val is not None:
+                try:
+                    payload['bill_id'] = int(bill_id_val)
+                except (TypeError, ValueError):
+                    logger.warning(
+                        "Skipping non-numeric bill_id %s in notification payload; setting to NULL.",
+                        bill_id_val,
+                    )
+                    payload['bill_id'] = None
+
+        if Config.AUDIT_WRITE_BEHIND_ENABLED:
+            # Stamp the time now, not when the batch is flushed
+            payload.setdefault('sent_at', datetime.now().isoformat())
+            self.audit.add('notifications', payload)
+            return payload
+
+        return self._insert_notification(payload)
+
+    @retry(max_attempts=3, delay=1, backoff=2, exceptions=(Exception,))
+    def _insert_notification(self, notification_data: Dict) -> Dict:
+        """Synchronous notifications insert (write-behind disabled)"""
         try:
             if self.use_supabase:
-                # Supabase `notifications.bill_id` is an integer FK. The
-                # UI sometimes uses a string fallback ID like
-                # "BILL_20260101033825" purely for display. Before
-                # inserting, coerce bill_id to an int when possible;
-                # otherwise, omit it so the column is NULL and we avoid
-                # integer cast errors (22P02).
-                payload = dict(notification_data)
-                bill_id_val = payload.get('bill_id')
-                if bill_id_val is not None:
-                    try:
-                        payload['bill_id'] = int(bill_id_val)
-                    except (TypeError, ValueError):
-                        logger.warning(
-                            "Skipping non-numeric bill_id %s in notification payload; setting to NULL.",
-                            bill_id_val,
-                        )
-                        payload['bill_id'] = None
-
-                response = self.supabase.table('notifications').insert(payload).execute()
+                response = self.supabase.table('notifications').insert(notification_data).execute()
                 logger.info(f"Logged notification via {notification_data.get('channel')}")
                 return response.data[0] if response.data else {}
         except Exception as e:
             logger.error(f"Error logging notification: {e}")
             raise
-        
+
         query = """
             INSERT INTO notifications (
                 bill_id, customer_id, channel, message, 
@@ -666,6 +1327,7 @@ class DatabaseService:
                 conn.commit()
                 return dict(result)
     
+    @invalidates(lambda self, result, bill_id, *_, **__: self._bill_cache_tags(bill_id, result))
     @retry(max_attempts=3, delay=1, backoff=2, exceptions=(Exception,))
     def update_bill_status(self, bill_id: int, status: str, payment_date: str = None) -> Dict:
         """Update bill payment status"""
@@ -714,7 +1376,389 @@ class DatabaseService:
                 result = cur.fetchone()
                 conn.commit()
                 return dict(result)
-    
+
+    @staticmethod
+    def _overdue_cache_tags(rows: List[Dict]) -> List[str]:
+        tags = {'bills:aggregate'}
+        for row in rows or []:
+            tags.update(DatabaseService._bill_cache_tags(row.get('id'), row))
+        return sorted(tags)
+
+    @invalidates(lambda self, result, *_, **__: self._overdue_cache_tags(result))
+    def mark_overdue_bills(self, as_of: Optional[date] = None) -> List[Dict]:
+        """Move every pending bill with ``due_date`` before ``as_of`` to overdue.
+
+        One set-based UPDATE instead of one update_bill_status call per
+        bill. Every attempt stamps the same ``updated_at``, so if an
+        UPDATE commits but its response is lost, the retry (which then
+        matches nothing) re-selects the bills carrying that stamp and the
+        overdue notices still go out. Returns the updated bill rows
+        (empty when nothing was overdue).
+        """
+        as_of = (as_of or date.today()).isoformat()
+        stamp = datetime.now().isoformat()
+        logger.debug(f"Marking pending bills due before {as_of} as overdue")
+        rows = self._mark_overdue_bills(as_of, stamp)
+        logger.info(f"Marked {len(rows)} bills overdue (due before {as_of})")
+        return rows
+
+    @retry(max_attempts=3, delay=1, backoff=2, exceptions=(Exception,))
+    def _mark_overdue_bills(self, as_of: str, stamp: str) -> List[Dict]:
+        try:
+            if self.use_supabase:
+                rows = self.supabase.table('bills')\
+                    .update({'status': 'overdue', 'updated_at': stamp})\
+                    .eq('status', 'pending')\
+                    .lt('due_date', as_of)\
+                    .execute().data or []
+                if not rows:
+                    # Nothing left to update: an earlier attempt may have
+                    # committed without us seeing its rows
+                    rows = self.supabase.table('bills')\
+                        .select('*')\
+                        .eq('status', 'overdue')\
+                        .eq('updated_at', stamp)\
+                        .execute().data or []
+                return rows
+        except Exception as e:
+            logger.error(f"Error marking overdue bills: {e}")
+            raise
+
+        # The legacy bills table has no due_date; billing_period_end is
+        # the due date there (as in create_bill's Supabase mapping)
+        with self.get_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute(
+                    """
+                    UPDATE bills
+                    SET status = 'overdue', updated_at = %s
+                    WHERE status = 'pending' AND billing_period_end < %s
+                    RETURNING *
+                    """,
+                    (stamp, as_of)
+                )
+                rows = [dict(row) for row in cur.fetchall()]
+                if not rows:
+                    cur.execute(
+                        "SELECT * FROM bills WHERE status = 'overdue' AND updated_at = %s",
+                        (stamp,)
+                    )
+                    rows = [dict(row) for row in cur.fetchall()]
+                conn.commit()
+        return rows
+
+    # Columns the reminder job needs; the Supabase schema has
+    # no customer/payment-link fields on bills (see update_bill_payment_info)
+    DUE_BILL_COLUMNS = 'id, flat_id, due_date, billing_period_end, total_amount, total_units, status'
+    LEGACY_DUE_BILL_COLUMNS = (
+        'id, customer_id, meter_id, billing_period_end AS due_date, billing_period_end, '
+        'amount, consumption_kwh, payment_link, status'
+    )
+
+    @cached('aggregate', tags=lambda *_, **__: ('bills:aggregate',))
+    @retry(max_attempts=3, delay=1, backoff=2, exceptions=(Exception,))
+    def get_bills_due(
+        self,
+        due_to: Optional[str] = None,
+        due_from: Optional[str] = None,
+        status: str = 'pending'
+    ) -> List[Dict]:
+        """Bills in ``status`` with ``due_date`` between ``due_from`` and
+        ``due_to`` (both inclusive, either optional), oldest due first.
+
+        A range scan on idx_bills_status_due_date returning only
+        DUE_BILL_COLUMNS. Cached like the other aggregates (short TTL,
+        evicted by any bill write).
+        """
+        logger.debug(f"Fetching {status} bills due {due_from or '-'} to {due_to or '-'}")
+
+        if self.use_supabase:
+            def apply_filters(query):
+                query = query.eq('status', status)
+                if due_from:
+                    query = query.gte('due_date', due_from)
+                if due_to:
+                    query = query.lte('due_date', due_to)
+                return query
+
+            bills = list(self._iter_keyset(
+                'bills', 'due_date', self.DUE_BILL_COLUMNS, 1000, False, apply_filters
+            ))
+        else:
+            conditions, params = ["status = %s"], [status]
+            if due_from:
+                conditions.append("billing_period_end >= %s")
+                params.append(due_from)
+            if due_to:
+                conditions.append("billing_period_end <= %s")
+                params.append(due_to)
+            with self.get_connection() as conn:
+                with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                    cur.execute(
+                        f"SELECT {self.LEGACY_DUE_BILL_COLUMNS} FROM bills "
+                        f"WHERE {' AND '.join(conditions)} ORDER BY billing_period_end, id",
+                        tuple(params)
+                    )
+                    bills = [dict(row) for row in cur.fetchall()]
+
+        logger.info(f"Retrieved {len(bills)} {status} bills due {due_from or '-'} to {due_to or '-'}")
+        return bills
+
+    # ------------------------------------------------------------------
+    # Checkpointed scheduler runs (billing_runs / billing_run_items)
+    # ------------------------------------------------------------------
+
+    @retry(max_attempts=3, delay=1, backoff=2, exceptions=(Exception,))
+    def get_latest_billing_run(self, job_id: str, period: str) -> Optional[Dict]:
+        """Most recent run of a job for a period, or None"""
+        if self.use_supabase:
+            response = self.supabase.table('billing_runs')\
+                .select('*')\
+                .eq('job_id', job_id)\
+                .eq('period', period)\
+                .order('id', desc=True)\
+                .limit(1)\
+                .execute()
+            return response.data[0] if response.data else None
+
+        with self.get_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute(
+                    "SELECT * FROM billing_runs WHERE job_id = %s AND period = %s ORDER BY id DESC LIMIT 1",
+                    (job_id, period)
+                )
+                row = cur.fetchone()
+                return dict(row) if row else None
+
+    @retry(max_attempts=3, delay=1, backoff=2, exceptions=(Exception,))
+    def create_billing_run(self, job_id: str, period: str) -> Dict:
+        """Open a new run record (status 'running')"""
+        if self.use_supabase:
+            response = self.supabase.table('billing_runs')\
+                .insert({'job_id': job_id, 'period': period, 'status': 'running'})\
+                .execute()
+            return response.data[0]
+
+        with self.get_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute(
+                    "INSERT INTO billing_runs (job_id, period, status) VALUES (%s, %s, 'running') RETURNING *",
+                    (job_id, period)
+                )
+                row = dict(cur.fetchone())
+                conn.commit()
+                return row
+
+    @retry(max_attempts=3, delay=1, backoff=2, exceptions=(Exception,))
+    def update_billing_run(self, run_id: int, fields: Dict) -> Dict:
+        """Update a run record (status, attempts, summary, finished_at)"""
+        fields = dict(fields, updated_at=datetime.now().isoformat())
+        if self.use_supabase:
+            response = self.supabase.table('billing_runs')\
+                .update(fields)\
+                .eq('id', run_id)\
+                .execute()
+            return response.data[0] if response.data else None
+
+        columns = list(fields)
+        values = [Json(v) if isinstance(v, (dict, list)) else v for v in fields.values()]
+        with self.get_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute(
+                    f"UPDATE billing_runs SET {', '.join(f'{c} = %s' for c in columns)} WHERE id = %s RETURNING *",
+                    (*values, run_id)
+                )
+                row = cur.fetchone()
+                conn.commit()
+                return dict(row) if row else None
+
+    @retry(max_attempts=3, delay=1, backoff=2, exceptions=(Exception,))
+    def get_billing_run_items(self, run_id: int) -> List[Dict]:
+        """Every per-meter checkpoint row of a run"""
+        if self.use_supabase:
+            return list(self._iter_keyset(
+                'billing_run_items', 'id', '*', 1000, False,
+                lambda query: query.eq('run_id', run_id)
+            ))
+
+        with self.get_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute("SELECT * FROM billing_run_items WHERE run_id = %s ORDER BY id", (run_id,))
+                return [dict(row) for row in cur.fetchall()]
+
+    @retry(max_attempts=3, delay=1, backoff=2, exceptions=(Exception,))
+    def add_billing_run_items(self, run_id: int, items: List[Dict], chunk_size: int = 500) -> List[Dict]:
+        """Insert pending checkpoint rows (meter_id, idempotency_key) for a run"""
+        rows = [
+            {'run_id': run_id, 'meter_id': str(item['meter_id']),
+             'idempotency_key': item['idempotency_key'], 'state': 'pending'}
+            for item in items
+        ]
+        if not rows:
+            return []
+
+        created = []
+        if self.use_supabase:
+            for i in range(0, len(rows), chunk_size):
+                response = self.supabase.table('billing_run_items').insert(rows[i:i + chunk_size]).execute()
+                created.extend(response.data or [])
+            return created
+
+        with self.get_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                created = execute_values(
+                    cur,
+                    "INSERT INTO billing_run_items (run_id, meter_id, idempotency_key, state) VALUES %s RETURNING *",
+                    [(r['run_id'], r['meter_id'], r['idempotency_key'], r['state']) for r in rows],
+                    page_size=chunk_size,
+                    fetch=True
+                )
+                conn.commit()
+                return [dict(row) for row in created]
+
+    @retry(max_attempts=3, delay=1, backoff=2, exceptions=(Exception,))
+    def update_billing_run_item(self, item_id: int, fields: Dict) -> Dict:
+        """Checkpoint one meter (state, bill_id, amount, payment link, error)"""
+        fields = dict(fields, updated_at=datetime.now().isoformat())
+        if self.use_supabase:
+            response = self.supabase.table('billing_run_items')\
+                .update(fields)\
+                .eq('id', item_id)\
+                .execute()
+            return response.data[0] if response.data else None
+
+        columns = list(fields)
+        with self.get_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute(
+                    f"UPDATE billing_run_items SET {', '.join(f'{c} = %s' for c in columns)} WHERE id = %s RETURNING *",
+                    (*fields.values(), item_id)
+                )
+                row = cur.fetchone()
+                conn.commit()
+                return dict(row) if row else None
+
+    @retry(max_attempts=3, delay=1, backoff=2, exceptions=(Exception,))
+    def find_billed_run_item(self, idempotency_key: str) -> Optional[Dict]:
+        """Latest checkpoint with a bill for an idempotency key (any run)"""
+        if self.use_supabase:
+            response = self.supabase.table('billing_run_items')\
+                .select('*')\
+                .eq('idempotency_key', idempotency_key)\
+                .not_.is_('bill_id', 'null')\
+                .order('id', desc=True)\
+                .limit(1)\
+                .execute()
+            return response.data[0] if response.data else None
+
+        with self.get_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute(
+                    """
+                    SELECT * FROM billing_run_items
+                    WHERE idempotency_key = %s AND bill_id IS NOT NULL
+                    ORDER BY id DESC LIMIT 1
+                    """,
+                    (idempotency_key,)
+                )
+                row = cur.fetchone()
+                return dict(row) if row else None
+
+    @retry(max_attempts=3, delay=1, backoff=2, exceptions=(Exception,))
+    def find_bill_for_period(
+        self,
+        meter_id,
+        customer_id,
+        billing_period_start: str,
+        billing_period_end: str
+    ) -> Optional[Dict]:
+        """Bill already stored for a meter's flat and exact billing period.
+
+        Lets a resumed billing run pick up a bill that was inserted just
+        before a crash, ahead of its checkpoint.
+        """
+        start, end = str(billing_period_start)[:10], str(billing_period_end)[:10]
+        if self.use_supabase:
+            flat_id = self.identity.resolve_flat_id(meter_id=meter_id, customer_id=customer_id)
+            if flat_id is None:
+                return None
+            response = self.supabase.table('bills')\
+                .select('*')\
+                .eq('flat_id', flat_id)\
+                .eq('billing_period_start', start)\
+                .eq('billing_period_end', end)\
+                .order('id', desc=True)\
+                .limit(1)\
+                .execute()
+            return response.data[0] if response.data else None
+
+        with self.get_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute(
+                    """
+                    SELECT * FROM bills
+                    WHERE meter_id = %s AND billing_period_start = %s AND billing_period_end = %s
+                    ORDER BY id DESC LIMIT 1
+                    """,
+                    (str(meter_id), start, end)
+                )
+                row = cur.fetchone()
+                return dict(row) if row else None
+
+    @retry(max_attempts=3, delay=1, backoff=2, exceptions=(Exception,))
+    def record_job_run(self, run: Dict) -> Dict:
+        """Store one scheduler job execution (see services.job_history)"""
+        if self.use_supabase:
+            response = self.supabase.table('scheduler_job_runs').insert(run).execute()
+            return response.data[0] if response.data else run
+
+        columns = list(run)
+        values = [Json(v) if isinstance(v, (dict, list)) else v for v in run.values()]
+        with self.get_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute(
+                    f"INSERT INTO scheduler_job_runs ({', '.join(columns)}) "
+                    f"VALUES ({', '.join(['%s'] * len(columns))}) RETURNING *",
+                    values
+                )
+                row = dict(cur.fetchone())
+                conn.commit()
+                return row
+
+    def get_job_runs(self, job_id: Optional[str] = None, limit: int = 10) -> List[Dict]:
+        """Most recent scheduler job runs, newest first.
+
+        Not retried: the status endpoint reads this for every job, and
+        run history is not worth stalling it. Returns [] on failure
+        (e.g. scheduler_job_runs not created yet).
+        """
+        try:
+            if self.use_supabase:
+                query = self.supabase.table('scheduler_job_runs').select('*')
+                if job_id:
+                    query = query.eq('job_id', job_id)
+                response = query.order('started_at', desc=True).limit(limit).execute()
+                runs = response.data or []
+                # The local backend keeps jsonb columns as text
+                for run in runs:
+                    for key in ('stages', 'summary'):
+                        if isinstance(run.get(key), str):
+                            run[key] = json.loads(run[key])
+                return runs
+
+            where, params = ("WHERE job_id = %s", [job_id]) if job_id else ("", [])
+            with self.get_connection() as conn:
+                with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                    cur.execute(
+                        f"SELECT * FROM scheduler_job_runs {where} ORDER BY started_at DESC LIMIT %s",
+                        (*params, limit)
+                    )
+                    return [dict(row) for row in cur.fetchall()]
+        except Exception as e:
+            logger.error(f"Error fetching run history for {job_id or 'all jobs'}: {e}")
+            return []
+
+    @cached('bill', tags=lambda self, bill_id, *_, **__: (f"bill:{bill_id}",))
     @retry(max_attempts=3, delay=1, backoff=2, exceptions=(Exception,))
     def get_bill_by_id(self, bill_id: int) -> Dict:
         """Get bill details by ID"""
@@ -744,6 +1788,9 @@ class DatabaseService:
                 result = cur.fetchone()
                 return dict(result) if result else None
     
+    @cached('bills_by_customer', tags=lambda self, customer_id, *_, **__: (
+        f"bills:flat:{self.identity.resolve_flat_id(customer_id=customer_id)}",
+    ))
     @retry(max_attempts=3, delay=1, backoff=2, exceptions=(Exception,))
     def get_bills_by_customer(self, customer_id: str, limit: int = 10) -> List[Dict]:
         """Get all bills for a customer"""
@@ -751,9 +1798,18 @@ class DatabaseService:
         
         try:
             if self.use_supabase:
+                # The normalized bills table has no customer_id column;
+                # resolve the customer identifier (unit ID, flat code or
+                # flat id) to a flat_id when the registry knows it.
+                flat_id = self.identity.resolve_flat_id(customer_id=customer_id)
+                if flat_id is not None:
+                    column, value = 'flat_id', flat_id
+                else:
+                    column, value = 'customer_id', customer_id
+
                 response = self.supabase.table('bills')\
                     .select('*')\
-                    .eq('customer_id', customer_id)\
+                    .eq(column, value)\
                     .order('created_at', desc=True)\
                     .limit(limit)\
                     .execute()
@@ -777,50 +1833,40 @@ class DatabaseService:
     
     @retry(max_attempts=3, delay=1, backoff=2, exceptions=(Exception,))
     def get_all_bills(self, status: Optional[str] = None, limit: Optional[int] = None) -> List[Dict]:
-        """Get all bills with optional status filter"""
+        """Get all bills with optional status filter, newest first.
+
+        Built on iter_bills, so results are no longer capped at one
+        PostgREST page when no ``limit`` is given.
+        """
         logger.debug(f"Fetching all bills (status={status}, limit={limit})")
         
         try:
-            if self.use_supabase:
-                query = self.supabase.table('bills').select('*')
-                
-                if status:
-                    query = query.eq('status', status)
-                
-                query = query.order('created_at', desc=True)
-                
-                if limit:
-                    query = query.limit(limit)
-                
-                response = query.execute()
-                logger.info(f"Retrieved {len(response.data)} bills (status={status})")
-                return response.data
+            page_size = min(limit, 1000) if limit else 1000
+            bills = self.iter_bills(page_size=page_size, status=status, descending=True)
+            if limit:
+                bills = islice(bills, limit)
+            bills = list(bills)
+            logger.info(f"Retrieved {len(bills)} bills (status={status})")
+            return bills
         except Exception as e:
             logger.error(f"Error fetching bills: {e}")
             raise
-        
-        # Legacy PostgreSQL
-        if status:
-            query = "SELECT * FROM bills WHERE status = %s ORDER BY created_at DESC"
-            params = (status,)
-        else:
-            query = "SELECT * FROM bills ORDER BY created_at DESC"
-            params = ()
-        
-        if limit:
-            query += " LIMIT %s"
-            params = params + (limit,)
-        
-        with self.get_connection() as conn:
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute(query, params)
-                return [dict(row) for row in cur.fetchall()]
     
-    @retry(max_attempts=3, delay=1, backoff=2, exceptions=(Exception,))
     def log_payment_event(self, event_data: Dict) -> Dict:
-        """Log a payment webhook event"""
+        """Log a payment webhook event (write-behind, like log_notification)"""
         logger.debug(f"Logging payment event: {event_data.get('event_type')}")
         
+        if Config.AUDIT_WRITE_BEHIND_ENABLED:
+            payload = dict(event_data)
+            payload.setdefault('received_at', datetime.now().isoformat())
+            self.audit.add('payment_events', payload)
+            return payload
+
+        return self._insert_payment_event(event_data)
+
+    @retry(max_attempts=3, delay=1, backoff=2, exceptions=(Exception,))
+    def _insert_payment_event(self, event_data: Dict) -> Dict:
+        """Synchronous payment_events insert (write-behind disabled)"""
         try:
             if self.use_supabase:
                 response = self.supabase.table('payment_events').insert(event_data).execute()
@@ -847,12 +1893,14 @@ class DatabaseService:
                 conn.commit()
                 return dict(result)
     
+    @invalidates(lambda self, result, *_, **__: self._reading_cache_tags((result or {}).get('meter_id')))
     def insert_meter_reading(self, reading_data: Dict) -> Dict:
         """
         Insert a new meter reading into 'readings' table.
         Calculates consumption based on the previous reading (e.g. November reading).
         """
-        meter_id = reading_data.get('meter_id')
+        # Callers pass the integer meters.id; meter numbers are accepted too.
+        meter_id = self.identity.resolve_meter_pk(reading_data.get('meter_id'), prefer_pk=True)
         current_val = float(reading_data.get('reading_value', 0))
         reading_date = reading_data.get('reading_date')
         
@@ -911,53 +1959,341 @@ class DatabaseService:
         logger.warning("Legacy PostgreSQL insertion attempting...")
         return {} # Placeholder to prevent usage
     
+    def _prior_readings(
+        self,
+        meter_pks: List[int],
+        first_date: str,
+        last_date: str
+    ) -> Dict[int, List[Tuple[str, int, float]]]:
+        """Readings that can precede a batch spanning ``first_date``..``last_date``.
+
+        For each meter: the latest stored reading before ``first_date``
+        plus every stored reading inside the batch window. Returned as
+        ``{meter_pk: [(reading_date, id, reading_value), ...]}``.
+        """
+        history: Dict[int, List[Tuple[str, int, float]]] = {}
+
+        def add(row):
+            history.setdefault(int(row['meter_id']), []).append((
+                str(row['reading_date'])[:10],
+                int(row.get('id') or 0),
+                float(row.get('reading_value') or 0),
+            ))
+
+        if not self.use_supabase:
+            query = """
+                SELECT * FROM (
+                    SELECT DISTINCT ON (meter_id) id, meter_id, reading_date, reading_value
+                    FROM readings
+                    WHERE meter_id = ANY(%s) AND reading_date < %s
+                    ORDER BY meter_id, reading_date DESC, id DESC
+                ) latest
+                UNION ALL
+                SELECT id, meter_id, reading_date, reading_value
+                FROM readings
+                WHERE meter_id = ANY(%s) AND reading_date >= %s AND reading_date < %s
+            """
+            with self.get_connection() as conn:
+                with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                    cur.execute(query, (meter_pks, first_date, meter_pks, first_date, last_date))
+                    for row in cur.fetchall():
+                        add(row)
+            return history
+
+        id_chunk = 200
+        for i in range(0, len(meter_pks), id_chunk):
+            chunk = meter_pks[i:i + id_chunk]
+            try:
+                response = self.supabase.rpc(
+                    'readings_before_batch',
+                    {'p_meter_ids': chunk, 'p_from': first_date, 'p_to': last_date}
+                ).execute()
+                for row in response.data or []:
+                    add(row)
+                continue
+            except PostgrestAPIError as e:
+                if not self._is_missing_relation_error(e) and 'PGRST202' not in str(e):
+                    raise
+                logger.warning("readings_before_batch RPC missing; scanning reading history instead")
+
+            # RPC not deployed yet: page through the (narrow) history of
+            # these meters up to the end of the batch window.
+            offset = 0
+            page_size = 1000
+            while True:
+                rows = (
+                    self.supabase
+                    .table('readings')
+                    .select('id, meter_id, reading_date, reading_value')
+                    .in_('meter_id', chunk)
+                    .lt('reading_date', last_date)
+                    .order('id')
+                    .range(offset, offset + page_size - 1)
+                    .execute()
+                ).data or []
+                for row in rows:
+                    add(row)
+                if len(rows) < page_size:
+                    break
+                offset += page_size
+
+        return history
+
+    @invalidates(lambda self, *_, **__: self._reading_cache_tags())
+    def insert_meter_readings_bulk(self, readings: List[Dict], chunk_size: int = 500) -> List[Dict]:
+        """Insert many meter readings with chunked multi-row inserts.
+
+        Produces the same consumption values as calling
+        insert_meter_reading for each reading in date order: each
+        reading's consumption is measured against the latest earlier
+        reading of the same meter, whether that one is already stored
+        or is another row of this batch. Prior readings for every meter
+        in the batch are fetched in a single query.
+
+        Returns one outcome per input row, in input order::
+
+            {"index": i, "status": "created" | "error",
+             "reading": {...}, "message": "..."}
+        """
+        logger.debug(f"Inserting {len(readings)} readings in bulk (chunk_size={chunk_size})")
+
+        outcomes: List[Optional[Dict]] = [None] * len(readings)
+        planned: List[Tuple[int, Dict]] = []
+
+        for index, reading_data in enumerate(readings):
+            # Only meters the registry knows: an unknown id would fail the
+            # whole chunk on the readings.meter_id foreign key
+            meter = self.identity.get_meter(reading_data.get('meter_id'), prefer_pk=True)
+            meter_pk = int(meter['id']) if meter is not None else None
+            reading_date = reading_data.get('reading_date')
+            if meter_pk is None or not reading_date:
+                outcomes[index] = {
+                    "index": index,
+                    "status": "error",
+                    "message": f"Unknown meter {reading_data.get('meter_id')!r} or missing reading_date",
+                }
+                continue
+            planned.append((index, {
+                "meter_id": meter_pk,
+                "reading_date": reading_date,
+                "reading_value": float(reading_data.get('reading_value', 0)),
+            }))
+
+        if not planned:
+            return outcomes
+
+        dates = [str(p['reading_date'])[:10] for _, p in planned]
+        history = self._prior_readings(
+            sorted({p['meter_id'] for _, p in planned}), min(dates), max(dates)
+        )
+
+        # Walk each meter's combined timeline (stored rows first within
+        # a day, then batch rows in input order, matching insertion
+        # order). A reading's previous value is the last one seen on an
+        # earlier day.
+        timelines: Dict[int, List[Tuple[str, int, int, float, Optional[Dict]]]] = {}
+        for meter_pk, rows in history.items():
+            timelines[meter_pk] = [(day, 0, row_id, value, None) for day, row_id, value in rows]
+        for position, (_, payload) in enumerate(planned):
+            timelines.setdefault(payload['meter_id'], []).append(
+                (dates[position], 1, position, payload['reading_value'], payload)
+            )
+
+        negative = 0
+        for events in timelines.values():
+            events.sort(key=lambda e: (e[0], e[1], e[2]))
+            previous_val = 0.0
+            current_day, day_last = None, None
+            for day, _, _, value, payload in events:
+                if day != current_day:
+                    if day_last is not None:
+                        previous_val = day_last
+                    current_day = day
+                if payload is not None:
+                    payload['consumption'] = value - previous_val
+                    if payload['consumption'] < 0:
+                        negative += 1
+                day_last = value
+
+        if negative:
+            logger.warning(f"Negative consumption detected for {negative} readings in batch")
+
+        if not self.use_supabase:
+            return self._insert_meter_readings_bulk_postgres(planned, outcomes, chunk_size)
+
+        for i in range(0, len(planned), chunk_size):
+            chunk = planned[i:i + chunk_size]
+            try:
+                response = self.supabase.table('readings').insert([p for _, p in chunk]).execute()
+                rows = response.data or []
+                for position, (index, _) in enumerate(chunk):
+                    outcomes[index] = {
+                        "index": index,
+                        "status": "created",
+                        "reading": rows[position] if position < len(rows) else {},
+                    }
+            except Exception as e:
+                # Isolate the failing rows instead of losing the whole chunk
+                logger.warning(f"Reading chunk of {len(chunk)} rows failed ({e}); inserting row by row")
+                for index, payload in chunk:
+                    try:
+                        response = self.supabase.table('readings').insert(payload).execute()
+                        outcomes[index] = {
+                            "index": index,
+                            "status": "created",
+                            "reading": (response.data or [{}])[0],
+                        }
+                    except Exception as row_err:
+                        logger.error(f"Error inserting reading for meter {payload['meter_id']} on {payload['reading_date']}: {row_err}")
+                        outcomes[index] = {"index": index, "status": "error", "message": str(row_err)}
+
+        created = sum(1 for o in outcomes if o and o['status'] != 'error')
+        logger.info(f"Bulk reading insert: {created} created, {len(readings) - created} failed/skipped")
+        return outcomes
+
+    def _insert_meter_readings_bulk_postgres(
+        self,
+        planned: List[Tuple[int, Dict]],
+        outcomes: List[Optional[Dict]],
+        chunk_size: int
+    ) -> List[Dict]:
+        """Legacy PostgreSQL bulk insert using execute_values"""
+        from psycopg2.extras import execute_values
+
+        query = """
+            INSERT INTO readings (meter_id, reading_date, reading_value, consumption)
+            VALUES %s RETURNING *
+        """
+        template = "(%(meter_id)s, %(reading_date)s, %(reading_value)s, %(consumption)s)"
+
+        with self.get_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                for i in range(0, len(planned), chunk_size):
+                    chunk = planned[i:i + chunk_size]
+                    # Savepoints keep one bad row from aborting the transaction
+                    cur.execute("SAVEPOINT readings_chunk")
+                    try:
+                        rows = execute_values(
+                            cur, query, [p for _, p in chunk], template=template, fetch=True
+                        )
+                    except psycopg2.Error as e:
+                        cur.execute("ROLLBACK TO SAVEPOINT readings_chunk")
+                        logger.warning(f"Reading chunk of {len(chunk)} rows failed ({e}); inserting row by row")
+                        for index, payload in chunk:
+                            cur.execute("SAVEPOINT readings_row")
+                            try:
+                                rows = execute_values(cur, query, [payload], template=template, fetch=True)
+                                outcomes[index] = {
+                                    "index": index,
+                                    "status": "created",
+                                    "reading": dict(rows[0]) if rows else {},
+                                }
+                            except psycopg2.Error as row_err:
+                                cur.execute("ROLLBACK TO SAVEPOINT readings_row")
+                                outcomes[index] = {"index": index, "status": "error", "message": str(row_err)}
+                        continue
+                    for position, (index, _) in enumerate(chunk):
+                        outcomes[index] = {
+                            "index": index,
+                            "status": "created",
+                            "reading": dict(rows[position]) if position < len(rows) else {},
+                        }
+
+        created = sum(1 for o in outcomes if o and o['status'] != 'error')
+        logger.info(f"Bulk reading insert (PostgreSQL): {created} created, {len(outcomes) - created} failed/skipped")
+        return outcomes
+    
+    def _count_rows(self, table: str, apply_filters=None) -> int:
+        """Exact row count from PostgREST's count header.
+
+        Transfers at most a single ``id`` value regardless of how many
+        rows match, so counters cost bytes rather than tables.
+        """
+        query = self.supabase.table(table).select('id', count='exact')
+        if apply_filters is not None:
+            query = apply_filters(query)
+        response = query.limit(1).execute()
+        return int(response.count or 0)
+
+    @staticmethod
+    def _is_missing_relation_error(error: Exception) -> bool:
+        msg = str(error)
+        return '42P01' in msg or 'PGRST205' in msg or 'does not exist' in msg
+
+    def get_unbilled_readings_page(
+        self,
+        limit: int = 100,
+        cursor: Optional[Tuple[str, int]] = None,
+        min_value: Optional[float] = None,
+        exclude_ids: Optional[List[int]] = None,
+        with_count: bool = False
+    ) -> Dict:
+        """Fetch one page of readings that no bill references.
+
+        Reads from the ``unbilled_readings`` view, newest first, using a
+        ``(reading_date, id)`` keyset cursor. Pass the returned
+        ``next_cursor`` back in to get the following page.
+
+        Returns ``{"data": [...], "next_cursor": (date, id) | None,
+        "count": int | None}``; ``count`` is the exact total of matching
+        rows when ``with_count`` is set.
+        """
+        logger.debug(f"Fetching unbilled readings page (limit={limit}, cursor={cursor})")
+
+        query = self.supabase.table('unbilled_readings').select(
+            '*', count='exact' if with_count else None
+        )
+        if min_value is not None:
+            query = query.gt('reading_value', min_value)
+        if exclude_ids:
+            query = query.not_.in_('id', list(exclude_ids))
+        if cursor:
+            cursor_date, cursor_id = cursor
+            query = query.or_(
+                f"reading_date.lt.{cursor_date},"
+                f"and(reading_date.eq.{cursor_date},id.lt.{cursor_id})"
+            )
+
+        response = (
+            query
+            .order('reading_date', desc=True)
+            .order('id', desc=True)
+            .limit(limit)
+            .execute()
+        )
+        rows = response.data or []
+
+        next_cursor = None
+        if len(rows) == limit and rows:
+            last = rows[-1]
+            next_cursor = (str(last.get('reading_date')), last.get('id'))
+
+        return {
+            "data": rows,
+            "next_cursor": next_cursor,
+            "count": response.count if with_count else None,
+        }
+
     def get_unbilled_readings(self, limit: int = 100) -> List[Dict]:
         """
         Retrieve 'readings' that do not have a corresponding 'bill'.
-        New Schema: bills.flat_reading_id links to readings.id
+        New Schema: bills.flat_reading_id / bills.motor_reading_id link to readings.id
         """
         logger.debug(f"Fetching unbilled readings (limit: {limit})")
         
         try:
             if self.use_supabase:
-                # 1. Get IDs of readings that are already linked to bills
-                #    via either flat_reading_id (normal bills) OR
-                #    motor_reading_id (motor share bills). Any such
-                #    readings must be treated as "billed" so that the
-                #    UI never offers to delete them, which would violate
-                #    the foreign key constraints seen in production.
-
-                billed_resp = (
-                    self.supabase
-                    .table('bills')
-                    .select('flat_reading_id, motor_reading_id')
-                    .execute()
-                )
-
-                billed_ids: set[int] = set()
-                if billed_resp.data:
-                    for item in billed_resp.data:
-                        fr = item.get('flat_reading_id')
-                        mr = item.get('motor_reading_id')
-                        if fr is not None:
-                            billed_ids.add(fr)
-                        if mr is not None:
-                            billed_ids.add(mr)
-
-                # 2. Get latest readings and filter out any that are
-                #    already referenced by a bill.
-                query = (
-                    self.supabase
-                    .table('readings')
-                    .select('*')
-                    .order('reading_date', desc=True)
-                    .limit(limit)
-                )
-
-                response = query.execute()
-                candidates = response.data or []
-
-                unbilled = [r for r in candidates if r.get('id') not in billed_ids]
+                # Any reading referenced by a bill (as the flat reading OR
+                # the motor reading) counts as billed, so the UI never
+                # offers to delete it and violate the foreign keys. The
+                # anti-join runs server-side in the unbilled_readings view.
+                try:
+                    unbilled = self.get_unbilled_readings_page(limit=limit)["data"]
+                except PostgrestAPIError as e:
+                    if not self._is_missing_relation_error(e):
+                        raise
+                    logger.warning("unbilled_readings view missing; falling back to client-side filtering")
+                    unbilled = self._get_unbilled_readings_client_side(limit)
 
                 logger.info(f"Found {len(unbilled)} unbilled readings")
                 return unbilled
@@ -967,115 +2303,254 @@ class DatabaseService:
             return []
         
         return []
+
+    def _get_unbilled_readings_client_side(self, limit: int) -> List[Dict]:
+        """Pre-view fallback: download billed reading ids and filter in Python"""
+        billed_resp = (
+            self.supabase
+            .table('bills')
+            .select('flat_reading_id, motor_reading_id')
+            .execute()
+        )
+
+        billed_ids: set[int] = set()
+        for item in billed_resp.data or []:
+            fr = item.get('flat_reading_id')
+            mr = item.get('motor_reading_id')
+            if fr is not None:
+                billed_ids.add(fr)
+            if mr is not None:
+                billed_ids.add(mr)
+
+        response = (
+            self.supabase
+            .table('readings')
+            .select('*')
+            .order('reading_date', desc=True)
+            .limit(limit)
+            .execute()
+        )
+        return [r for r in response.data or [] if r.get('id') not in billed_ids]
+
+    def count_unbilled_readings(self, min_value: Optional[float] = None, exclude_ids: Optional[List[int]] = None) -> int:
+        """Exact count of unbilled readings, optionally only those above ``min_value``.
+
+        Returns 0 if the count fails; only successful counts are cached.
+        """
+        try:
+            return self._count_unbilled_readings(min_value, exclude_ids)
+        except Exception as e:
+            logger.error(f"Error counting unbilled readings: {e}")
+            return 0
+
+    @cached('aggregate', tags=lambda *_, **__: ('readings:unbilled',))
+    def _count_unbilled_readings(self, min_value: Optional[float], exclude_ids: Optional[List[int]]) -> int:
+        logger.debug(f"Counting unbilled readings (min_value={min_value})")
+        if self.use_supabase:
+            def apply_filters(query):
+                if min_value is not None:
+                    query = query.gt('reading_value', min_value)
+                if exclude_ids:
+                    query = query.not_.in_('id', list(exclude_ids))
+                return query
+
+            try:
+                count = self._count_rows('unbilled_readings', apply_filters)
+            except PostgrestAPIError as e:
+                if not self._is_missing_relation_error(e):
+                    raise
+                logger.warning("unbilled_readings view missing; counting client-side")
+                excluded = set(exclude_ids or [])
+                count = len([
+                    r for r in self._get_unbilled_readings_client_side(1000)
+                    if (min_value is None or float(r.get('reading_value') or 0) > min_value)
+                    and r.get('id') not in excluded
+                ])
+            logger.info(f"Unbilled readings count: {count}")
+            return count
+        return 0
     
     def get_pending_bills_count(self) -> int:
         """Get count of unbilled meter readings"""
         logger.debug("Fetching unbilled readings count")
         
         try:
-            unbilled = self.get_unbilled_readings(limit=1000)
-            count = len(unbilled)
+            count = self.count_unbilled_readings()
             logger.info(f"Total unbilled readings: {count}")
             return count
         except Exception as e:
             logger.error(f"Error getting unbilled count: {e}")
             return 0
 
-    def get_active_meters(self) -> List[Dict]:
-        """Get list of active meters/flats from the database (registry)"""
-        logger.debug("Fetching active meters registry via Joined Query")
+    @cached('meters', tags=lambda *_, **__: ('flat_motors',))
+    @retry(max_attempts=3, delay=1, backoff=2, exceptions=(Exception,))
+    def get_flat_motors(self) -> List[Dict]:
+        """All flat-to-motor mapping rows (id, flat_id, motor_id, start_date, end_date)"""
+        if self.use_supabase:
+            response = self.supabase.table('flat_motors')\
+                .select('id, flat_id, motor_id, start_date, end_date')\
+                .order('id')\
+                .execute()
+            return response.data or []
+
+        with self.get_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute("SELECT id, flat_id, motor_id, start_date, end_date FROM flat_motors ORDER BY id")
+                return [dict(row) for row in cur.fetchall()]
+
+    @cached('aggregate', tags=lambda *_, **__: ('readings:aggregate', 'flat_motors'))
+    @retry(max_attempts=3, delay=1, backoff=2, exceptions=(Exception,))
+    def get_motor_allocations(self, period_start, period_end) -> Dict[int, Dict]:
+        """Water-motor share of every flat for a billing period (dates inclusive).
+
+        Loads ``flat_motors`` and the period's reading consumption once,
+        sums units per active meter in one grouped pass and allocates
+        each motor across its flats (see services.motor_allocation).
+        Returns flat_id -> allocation, including ``motor_units`` and
+        ``total_flat_units_for_motor`` for calculate_simple_bill and the
+        flat's motor meter (``motor_meter_id``/``motor_meter_number``).
+        """
+        start = str(period_start)[:10]
+        end = str(period_end)[:10]
+        logger.debug(f"Allocating motor shares for {start} to {end}")
+
+        flat_motors = self.get_flat_motors()
+        units_by_meter: Dict[int, float] = {}
+        if self.use_supabase:
+            end_exclusive = (date.fromisoformat(end) + timedelta(days=1)).isoformat()
+            for row in self.iter_readings(start_date=start, end_date=end_exclusive, columns='meter_id, consumption'):
+                meter_pk = row.get('meter_id')
+                if meter_pk is not None:
+                    units_by_meter[meter_pk] = units_by_meter.get(meter_pk, 0.0) + float(row.get('consumption') or 0)
+        else:
+            with self.get_connection() as conn:
+                with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                    cur.execute(
+                        """
+                        SELECT meter_id, COALESCE(SUM(consumption), 0) AS units
+                        FROM readings
+                        WHERE reading_date BETWEEN %s AND %s
+                        GROUP BY meter_id
+                        """,
+                        (start, end)
+                    )
+                    units_by_meter = {row['meter_id']: float(row['units']) for row in cur.fetchall()}
+
+        flat_units: Dict[int, float] = {}
+        motor_units: Dict[int, float] = {}
+        motor_meters: Dict[int, Dict] = {}
+        for meter in self.identity.meters():
+            if meter.get('status') != 'active':
+                continue
+            units = units_by_meter.get(meter['id'], 0.0)
+            if meter.get('flat_id') is not None:
+                if meter['id'] in units_by_meter:
+                    flat_units[meter['flat_id']] = flat_units.get(meter['flat_id'], 0.0) + units
+            elif meter.get('motor_id') is not None:
+                motor_units[meter['motor_id']] = motor_units.get(meter['motor_id'], 0.0) + units
+                motor_meters.setdefault(meter['motor_id'], meter)
+
+        allocations = allocate_motor_shares(
+            active_motor_by_flat(flat_motors, start, end), flat_units, motor_units
+        )
+        for allocation in allocations.values():
+            motor_meter = motor_meters.get(allocation['motor_id']) or {}
+            allocation['motor_meter_id'] = motor_meter.get('id')
+            allocation['motor_meter_number'] = motor_meter.get('meter_number')
+
+        logger.info(f"Allocated motor shares for {len(allocations)} flats ({start} to {end})")
+        return allocations
+
+    def get_flat_motor_allocation(self, reading_date=None, meter_id=None, customer_id=None) -> Dict:
+        """Motor allocation of one flat for the month of ``reading_date``.
+
+        The flat is resolved from the meter or customer identifier. The
+        result is one entry of get_motor_allocations, or {} (no water
+        share) if the flat has no motor or the allocation fails.
+        """
+        flat_id = self.identity.resolve_flat_id(meter_id=meter_id, customer_id=customer_id)
+        if flat_id is None:
+            return {}
         try:
-            if self.use_supabase:
-                # Execute JOIN query to get meter + flat + owner details
-                # Note: This heavily relies on Supabase ability to run raw SQL or we construct a complex join via parameters
-                # Since we have the key, we can use the 'rpc' if one exists, or try a direct select with joins if using the py client properly.
-                # However, the python client `supabase-py` supports foreign key joins.
-                
-                # Query: Meters -> Flats -> Owners
-                response = self.supabase.table('meters')\
-                    .select('id, meter_number, status, flats(code, floor_id), flat_id')\
-                    .eq('status', 'Active')\
-                    .execute()
-                
-                # We need to manually flatten this or handle it in the UI. 
-                # Better: Use a helper function or raw SQL if we can.
-                # Let's try to stick to the client for now.
-                # Problem: We need Owner Name. Meters -> Flats -> Flat_Owners -> Owners
-                
-                # Let's fallback to a raw SQL execution for simplicity and performance as the joins are deep
-                # NOTE: The provided supabase client might not support raw sql directly without RPC.
-                # But we can use the `rpc` called `get_active_meters_view` if we created one? 
-                # The user's roadmap suggested a SQL query. Let's try to implement that logic in Python processing
-                # by fetching linked entities.
-                
-                # Actually, let's look at what we need: Meter ID, Flat No, Floor (maybe), Client Name.
-                
-                # Try fetching meter with Nested Resource
-                # meters (id, meter_number) -> flats (code, floor_id) -> flat_owners (owner_id) -> owners (name)
-                # Syntax: select('*, flats(code, flat_owners(owners(name)))')
-                
-                # But wait, looking at schema:
-                response = self.supabase.table('meters')\
-                    .select('id, meter_number, flats!inner(code, floor_id, type_id, flat_owners!inner(owners!inner(name)), flat_types!inner(name))')\
-                    .eq('status', 'active')\
-                    .execute()
-                    
-                # Fetch floors for mapping
-                floors_resp = self.supabase.table('floors').select('*').execute()
-                floor_map = {f['id']: f['code'] for f in floors_resp.data} if floors_resp.data else {}
-
-                # Transform data to flat structure expected by UI
-                meters = []
-                if response.data:
-                    for item in response.data:
-                        try:
-                            flat = item.get('flats') or {}
-                            flat_owners = flat.get('flat_owners', [])
-                            owner_name = "Unknown"
-                            if flat_owners and isinstance(flat_owners, list) and len(flat_owners) > 0:
-                                owner = flat_owners[0].get('owners')
-                                if owner:
-                                    owner_name = owner.get('name')
-                            
-                            floor_id = flat.get('floor_id')
-                            floor_code = floor_map.get(floor_id, "")
-                            
-                            flat_type_obj = flat.get('flat_types') or {}
-                            flat_type_name = flat_type_obj.get('name', "")
-                            
-                            # Construct Unit ID like '5BHK-B5-FF'
-                            # Logic: {Type}-{FlatNo} (since FlatNo like B5-FF already includes floor)
-                            unit_id = ""
-                            if flat_type_name and flat.get('code'):
-                                if floor_code and flat.get('code').endswith(f"-{floor_code}"):
-                                    unit_id = f"{flat_type_name}-{flat.get('code')}"
-                                elif floor_code:
-                                     unit_id = f"{flat_type_name}-{flat.get('code')}-{floor_code}"
-                                else:
-                                     unit_id = f"{flat_type_name}-{flat.get('code')}"
-
-                            meters.append({
-                                "meter_id": item['id'],  # Integer ID from new schema
-                                "meter_number": item['meter_number'], # Display string
-                                "flat_no": flat.get('code'),
-                                "client_name": owner_name,
-                                "floor": floor_code, # Populated from map
-                                "type": flat_type_name,
-                                "unit_id": unit_id,
-                                "status": "active"
-                            })
-                        except Exception as e:
-                            logger.warning(f"Error parsing meter item: {e}")
-                            continue
-
-                logger.info(f"Retrieved {len(meters)} active meters from new schema")
-                return meters
+            return self.get_motor_allocations(*month_bounds(reading_date)).get(flat_id) or {}
+        except Exception as e:
+            logger.error(f"Error allocating motor share for flat {flat_id}: {e}")
+            return {}
 
+    def get_active_meters(self) -> List[Dict]:
+        """Get list of active meters/flats from the database (registry).
+
+        Returns [] if the load fails; only successful loads are cached.
+        """
+        try:
+            return self._load_active_meters()
         except Exception as e:
             logger.error(f"Error fetching active meters: {e}")
             return []
+
+    @cached('meters', tags=lambda *_, **__: ('meters',))
+    def _load_active_meters(self) -> List[Dict]:
+        logger.debug("Fetching active meters registry via Joined Query")
+        if self.use_supabase:
+            # Meters -> Flats -> Flat_Owners -> Owners via nested
+            # resources in one request. Floor codes come from the
+            # identity registry instead of a separate floors query.
+            response = self.supabase.table('meters')\
+                .select('id, meter_number, flats!inner(code, floor_id, type_id, flat_owners!inner(owners!inner(name)), flat_types!inner(name))')\
+                .eq('status', 'active')\
+                .execute()
+
+            floor_map = self.identity.floor_map()
+
+            # Transform data to flat structure expected by UI
+            meters = []
+            if response.data:
+                for item in response.data:
+                    try:
+                        flat = item.get('flats') or {}
+                        flat_owners = flat.get('flat_owners', [])
+                        owner_name = "Unknown"
+                        if flat_owners and isinstance(flat_owners, list) and len(flat_owners) > 0:
+                            owner = flat_owners[0].get('owners')
+                            if owner:
+                                owner_name = owner.get('name')
+                        
+                        floor_id = flat.get('floor_id')
+                        floor_code = floor_map.get(floor_id, "")
+                        
+                        flat_type_obj = flat.get('flat_types') or {}
+                        flat_type_name = flat_type_obj.get('name', "")
+                        
+                        # Construct Unit ID like '5BHK-B5-FF'
+                        # Logic: {Type}-{FlatNo} (since FlatNo like B5-FF already includes floor)
+                        unit_id = ""
+                        if flat_type_name and flat.get('code'):
+                            if floor_code and flat.get('code').endswith(f"-{floor_code}"):
+                                unit_id = f"{flat_type_name}-{flat.get('code')}"
+                            elif floor_code:
+                                 unit_id = f"{flat_type_name}-{flat.get('code')}-{floor_code}"
+                            else:
+                                 unit_id = f"{flat_type_name}-{flat.get('code')}"
+
+                        meters.append({
+                            "meter_id": item['id'],  # Integer ID from new schema
+                            "meter_number": item['meter_number'], # Display string
+                            "flat_no": flat.get('code'),
+                            "client_name": owner_name,
+                            "floor": floor_code, # Populated from map
+                            "type": flat_type_name,
+                            "unit_id": unit_id,
+                            "status": "active"
+                        })
+                    except Exception as e:
+                        logger.warning(f"Error parsing meter item: {e}")
+                        continue
+
+            logger.info(f"Retrieved {len(meters)} active meters from new schema")
+            return meters
         return []
 
+    @invalidates(lambda self, *_, **__: self._reading_cache_tags())
     def update_meter_reading(self, reading_id: int, reading_data: Dict) -> Dict:
         """Update an existing meter reading"""
         logger.debug(f"Updating reading {reading_id}")
@@ -1093,6 +2568,7 @@ class DatabaseService:
             logger.error(f"Error updating reading {reading_id}: {e}")
             raise
         return {}
+    @invalidates(lambda self, *_, **__: self._reading_cache_tags())
     @retry(max_attempts=3, delay=1, backoff=2, exceptions=(Exception,))
     def delete_reading(self, reading_id: int) -> bool:
         """Delete a meter reading by ID"""
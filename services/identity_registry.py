@@ -0,0 +1,362 @@
+"""
+In-process identity registry for meters, flats, floors and flat types.
+
+The UI, API and scheduler refer to the same flat in several ways: a
+meter number ("19152159"), a meter primary key (42), a unit ID
+("5BHK-B17-FF") or a plain flat code ("B17-FF"). Resolving those used
+to cost one Supabase round trip per attempted alias. The registry loads
+the four small reference tables once, indexes every alias for O(1)
+lookup and refreshes itself on a TTL, on a (rate-limited) lookup miss,
+or explicitly when a caller knows the tables changed.
+"""
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from utils.logger import setup_logger
+
+logger = setup_logger('identity_registry')
+
+IDENTITY_TABLES = ('meters', 'flats', 'floors', 'flat_types')
+
+
+def normalize_flat_code(identifier) -> Optional[str]:
+    """Normalise a unit/flat identifier into a canonical flat code.
+
+    "5BHK-B17-FF" -> "B17-FF". Any leading type prefix is stripped and
+    only the last two segments are kept, matching `flats.code`.
+    """
+    if identifier is None:
+        return None
+
+    raw = str(identifier).strip().upper()
+    if not raw:
+        return None
+
+    parts = [p for p in raw.split('-') if p]
+    if len(parts) >= 2:
+        return '-'.join(parts[-2:])
+    return raw
+
+
+class IdentityRegistry:
+    """Alias index over `meters`, `flats`, `floors` and `flat_types`.
+
+    ``loader`` is a zero-argument callable returning a dict with one
+    list of row dicts per table in ``IDENTITY_TABLES``. It is the only
+    place the registry touches the network, so the same registry works
+    for the Supabase REST client and the psycopg2 path.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[], Dict[str, List[Dict]]],
+        ttl_seconds: float = 300.0,
+        miss_refresh_interval: float = 30.0
+    ):
+        self._loader = loader
+        self.ttl_seconds = ttl_seconds
+        self.miss_refresh_interval = miss_refresh_interval
+
+        self._lock = threading.RLock()
+        self._loaded_at: Optional[float] = None
+
+        self._meters_by_pk: Dict[int, Dict] = {}
+        self._meters_by_number: Dict[str, Dict] = {}
+        self._flats_by_id: Dict[int, Dict] = {}
+        self._flat_id_by_code: Dict[str, int] = {}
+        self._flat_id_by_unit: Dict[str, int] = {}
+        self._floor_code_by_id: Dict[int, str] = {}
+        self._type_name_by_id: Dict[int, str] = {}
+
+    # ------------------------------------------------------------------
+    # Loading and refresh
+    # ------------------------------------------------------------------
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._loaded_at is not None
+
+    def refresh(self) -> None:
+        """Reload every identity table and rebuild the indexes."""
+        tables = self._loader() or {}
+        with self._lock:
+            self._rebuild(tables)
+            self._loaded_at = time.monotonic()
+        logger.info(
+            f"Identity registry loaded: {len(self._meters_by_pk)} meters, "
+            f"{len(self._flats_by_id)} flats"
+        )
+
+    def invalidate(self) -> None:
+        """Drop the loaded state so the next lookup reloads the tables."""
+        with self._lock:
+            self._loaded_at = None
+
+    def _ensure_loaded(self) -> None:
+        loaded_at = self._loaded_at
+        if loaded_at is not None and time.monotonic() - loaded_at < self.ttl_seconds:
+            return
+        with self._lock:
+            loaded_at = self._loaded_at
+            if loaded_at is not None and time.monotonic() - loaded_at < self.ttl_seconds:
+                return
+            try:
+                self.refresh()
+            except Exception as e:
+                # Keep serving the previous snapshot if we have one
+                if loaded_at is None:
+                    raise
+                logger.warning(f"Identity registry refresh failed, serving stale snapshot: {e}")
+
+    def _refresh_after_miss(self) -> bool:
+        """Reload once on an unknown alias, at most every ``miss_refresh_interval``."""
+        with self._lock:
+            loaded_at = self._loaded_at
+            if loaded_at is not None and time.monotonic() - loaded_at < self.miss_refresh_interval:
+                return False
+            try:
+                self.refresh()
+                return True
+            except Exception as e:
+                logger.warning(f"Identity registry refresh after miss failed: {e}")
+                return False
+
+    def _rebuild(self, tables: Dict[str, List[Dict]]) -> None:
+        self._meters_by_pk = {}
+        self._meters_by_number = {}
+        self._flats_by_id = {}
+        self._flat_id_by_code = {}
+        self._flat_id_by_unit = {}
+        self._floor_code_by_id = {}
+        self._type_name_by_id = {}
+
+        for floor in tables.get('floors') or []:
+            if floor.get('id') is not None:
+                self._floor_code_by_id[int(floor['id'])] = str(floor.get('code') or '')
+
+        for flat_type in tables.get('flat_types') or []:
+            if flat_type.get('id') is not None:
+                self._type_name_by_id[int(flat_type['id'])] = str(flat_type.get('name') or '')
+
+        for flat in tables.get('flats') or []:
+            self._index_flat(flat)
+
+        for meter in tables.get('meters') or []:
+            self._index_meter(meter)
+
+    def _index_flat(self, flat: Dict) -> None:
+        if flat.get('id') is None:
+            return
+        flat_id = int(flat['id'])
+        code = str(flat.get('code') or '').strip().upper()
+        self._flats_by_id[flat_id] = dict(flat)
+        if not code:
+            return
+
+        self._flat_id_by_code[code] = flat_id
+
+        # Index the unit IDs the UI builds in get_active_meters, e.g.
+        # "5BHK-B17-FF" (code already carries the floor) or
+        # "5BHK-B17-FF-FF" for older codes without it.
+        type_name = self._type_name_by_id.get(flat.get('type_id'), '').strip().upper()
+        floor_code = self._floor_code_by_id.get(flat.get('floor_id'), '').strip().upper()
+        if type_name:
+            self._flat_id_by_unit[f"{type_name}-{code}"] = flat_id
+            if floor_code and not code.endswith(f"-{floor_code}"):
+                self._flat_id_by_unit[f"{type_name}-{code}-{floor_code}"] = flat_id
+
+    def _index_meter(self, meter: Dict) -> None:
+        if meter.get('id') is None:
+            return
+        row = dict(meter)
+        self._meters_by_pk[int(meter['id'])] = row
+        number = meter.get('meter_number')
+        if number is not None and str(number).strip():
+            self._meters_by_number[str(number).strip()] = row
+
+    def register_meter(self, meter: Dict) -> None:
+        """Add or replace a single meter after a write, without a reload."""
+        with self._lock:
+            self._index_meter(meter)
+
+    def register_flat(self, flat: Dict) -> None:
+        """Add or replace a single flat after a write, without a reload."""
+        with self._lock:
+            self._index_flat(flat)
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+
+    def _lookup_meter(self, identifier, prefer_pk: bool) -> Optional[Dict]:
+        key = str(identifier).strip()
+        try:
+            pk = int(key)
+        except (TypeError, ValueError):
+            pk = None
+
+        if prefer_pk and pk is not None and pk in self._meters_by_pk:
+            return self._meters_by_pk[pk]
+
+        meter = self._meters_by_number.get(key)
+        if meter is None and pk is not None:
+            meter = self._meters_by_pk.get(pk)
+        return meter
+
+    def get_meter(self, identifier, prefer_pk: bool = False) -> Optional[Dict]:
+        """Return the meter row for a meter number or primary key.
+
+        Meter numbers win over primary keys unless ``prefer_pk`` is set,
+        mirroring the historical lookup order in DatabaseService.
+        """
+        if identifier is None:
+            return None
+        self._ensure_loaded()
+        meter = self._lookup_meter(identifier, prefer_pk)
+        if meter is None and self._refresh_after_miss():
+            meter = self._lookup_meter(identifier, prefer_pk)
+        return meter
+
+    def resolve_meter_pk(self, identifier, prefer_pk: bool = False) -> Optional[int]:
+        """Resolve a meter number or id to the `meters.id` primary key.
+
+        Unknown numeric identifiers are still returned as ints so that
+        callers behave as before when the registry is momentarily stale.
+        """
+        if identifier is None:
+            return None
+        meter = self.get_meter(identifier, prefer_pk=prefer_pk)
+        if meter is not None:
+            return int(meter['id'])
+        try:
+            return int(str(identifier))
+        except (TypeError, ValueError):
+            return None
+
+    def flat_id_for_code(self, identifier) -> Optional[int]:
+        """Resolve a unit ID or flat code to `flats.id`."""
+        if identifier is None:
+            return None
+        self._ensure_loaded()
+
+        def lookup():
+            raw = str(identifier).strip().upper()
+            flat_id = self._flat_id_by_unit.get(raw)
+            if flat_id is None:
+                flat_id = self._flat_id_by_code.get(raw)
+            if flat_id is None:
+                flat_id = self._flat_id_by_code.get(normalize_flat_code(raw))
+            return flat_id
+
+        flat_id = lookup()
+        if flat_id is None and self._refresh_after_miss():
+            flat_id = lookup()
+        return flat_id
+
+    def resolve_flat_id(self, flat_id=None, meter_id=None, customer_id=None) -> Optional[int]:
+        """Resolve the flat for a bill from whichever identifiers are known.
+
+        Order matches the original create_bill logic: explicit flat_id,
+        then the meter (by number, then by id), then the customer
+        identifier as a numeric flat id or a unit/flat code.
+        """
+        if flat_id is not None:
+            return flat_id
+
+        if meter_id is not None:
+            meter = self.get_meter(meter_id)
+            if meter is not None and meter.get('flat_id') is not None:
+                return meter['flat_id']
+
+        if customer_id is not None:
+            try:
+                return int(customer_id)
+            except (TypeError, ValueError):
+                return self.flat_id_for_code(customer_id)
+
+        return None
+
+    def canonical_flat_code(self, identifier) -> Optional[str]:
+        """Return `flats.code` for a meter number, unit ID or flat code.
+
+        Only consults the in-memory snapshot; never triggers a reload,
+        so pricing lookups stay network-free.
+        """
+        if identifier is None or not self.is_loaded:
+            return None
+
+        raw = str(identifier).strip()
+        meter = self._meters_by_number.get(raw)
+        flat_id = meter.get('flat_id') if meter else None
+        if flat_id is None:
+            upper = raw.upper()
+            flat_id = self._flat_id_by_unit.get(upper)
+            if flat_id is None:
+                flat_id = self._flat_id_by_code.get(normalize_flat_code(upper))
+
+        flat = self._flats_by_id.get(flat_id) if flat_id is not None else None
+        if not flat or not flat.get('code'):
+            return None
+        return str(flat['code']).strip().upper()
+
+    def get_flat(self, flat_id) -> Optional[Dict]:
+        if flat_id is None:
+            return None
+        self._ensure_loaded()
+        return self._flats_by_id.get(int(flat_id))
+
+    def floor_code(self, floor_id) -> str:
+        if floor_id is None:
+            return ""
+        self._ensure_loaded()
+        return self._floor_code_by_id.get(int(floor_id), "")
+
+    def flat_type_name(self, type_id) -> str:
+        if type_id is None:
+            return ""
+        self._ensure_loaded()
+        return self._type_name_by_id.get(int(type_id), "")
+
+    def floor_map(self) -> Dict[int, str]:
+        self._ensure_loaded()
+        return dict(self._floor_code_by_id)
+
+    def flat_type_map(self) -> Dict[int, str]:
+        self._ensure_loaded()
+        return dict(self._type_name_by_id)
+
+    def meters(self) -> List[Dict]:
+        self._ensure_loaded()
+        return list(self._meters_by_pk.values())
+
+    def flats(self) -> List[Dict]:
+        self._ensure_loaded()
+        return list(self._flats_by_id.values())
+
+
+# Process-wide registries, one per backend (e.g. Supabase URL). Every
+# DatabaseService instance pointing at the same backend shares one.
+_registries: Dict[str, IdentityRegistry] = {}
+_registries_lock = threading.Lock()
+_default_key: Optional[str] = None
+
+
+def get_identity_registry(key: str, loader: Callable[[], Dict[str, List[Dict]]], **kwargs) -> IdentityRegistry:
+    """Get or create the shared registry for a backend."""
+    global _default_key
+    with _registries_lock:
+        registry = _registries.get(key)
+        if registry is None:
+            registry = IdentityRegistry(loader, **kwargs)
+            _registries[key] = registry
+        _default_key = key
+        return registry
+
+
+def get_default_registry() -> Optional[IdentityRegistry]:
+    """Return the most recently requested registry, if any."""
+    with _registries_lock:
+        if _default_key is None:
+            return None
+        return _registries.get(_default_key)
@@ -0,0 +1,130 @@
+"""
+Run history for scheduler jobs.
+
+Job results (bills generated, reminders sent, ...) used to be logged and
+lost. Each execution is now stored as one ``scheduler_job_runs`` row:
+start/end time, items processed and failed, per-item latency
+percentiles and, for pipelined jobs, the per-stage breakdown. Comparing
+rows over time shows whether a job is getting slower.
+
+Jobs time their items with an ItemTimer and return its summary fields:
+
+    timer = ItemTimer()
+    for bill in bills:
+        with timer.item():
+            send(bill)
+    return {"success": True, **timer.summary()}
+"""
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from services.billing_pipeline import latency_percentiles
+
+# Result keys that go into their own columns rather than the summary
+_RESULT_FIELDS = ('items_processed', 'items_failed', 'item_latency_ms', 'pipeline')
+
+
+class ItemTimer:
+    """Per-item latencies and failure count for one job run (thread-safe)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies: List[float] = []
+        self.failed = 0
+
+    @contextmanager
+    def item(self):
+        """Time one item; an exception counts it as failed and propagates"""
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            raise
+        finally:
+            self.add(time.perf_counter() - started)
+
+    def add(self, seconds: float, failed: bool = False) -> None:
+        with self._lock:
+            self.latencies.append(seconds)
+            if failed:
+                self.failed += 1
+
+    def summary(self) -> Dict:
+        return {
+            'items_processed': len(self.latencies) - self.failed,
+            'items_failed': self.failed,
+            'item_latency_ms': latency_percentiles(self.latencies),
+        }
+
+
+def build_job_run(
+    job_id: str,
+    trigger: str,
+    started_at: datetime,
+    finished_at: datetime,
+    result: Optional[Dict],
+    error: Optional[str] = None
+) -> Dict:
+    """Turn one job execution and its result dict into a scheduler_job_runs row"""
+    result = result if isinstance(result, dict) else {}
+    latency = result.get('item_latency_ms') or {}
+    pipeline = result.get('pipeline') or {}
+    if error is None and result.get('success') is False:
+        error = result.get('error')
+
+    if error is not None:
+        status = 'failed'
+    elif result.get('skipped'):
+        status = 'skipped'
+    else:
+        status = 'succeeded'
+
+    return {
+        'job_id': job_id,
+        'trigger': trigger,
+        'status': status,
+        'host': socket.gethostname(),
+        'started_at': started_at.isoformat(),
+        'finished_at': finished_at.isoformat(),
+        'duration_seconds': round((finished_at - started_at).total_seconds(), 3),
+        'items_processed': int(result.get('items_processed') or 0),
+        'items_failed': int(result.get('items_failed') or 0),
+        'latency_p50_ms': latency.get('p50'),
+        'latency_p90_ms': latency.get('p90'),
+        'latency_p99_ms': latency.get('p99'),
+        'latency_max_ms': latency.get('max'),
+        'stages': [
+            {key: value for key, value in stage.items() if key != 'errors'}
+            for stage in pipeline.get('stages', [])
+        ] or None,
+        'summary': {key: value for key, value in result.items() if key not in _RESULT_FIELDS},
+        'error': error,
+    }
+
+
+def job_trend(runs: List[Dict]) -> Optional[Dict]:
+    """Latest succeeded run against the one before it (runs newest first)"""
+    succeeded = [run for run in runs if run.get('status') == 'succeeded']
+    if len(succeeded) < 2:
+        return None
+    latest, previous = succeeded[0], succeeded[1]
+
+    def change(key: str) -> Optional[float]:
+        new, old = latest.get(key), previous.get(key)
+        if new is None or not old:
+            return None
+        return round((float(new) - float(old)) / float(old) * 100, 1)
+
+    return {
+        'latest_started_at': latest.get('started_at'),
+        'previous_started_at': previous.get('started_at'),
+        'duration_change_pct': change('duration_seconds'),
+        'latency_p50_change_pct': change('latency_p50_ms'),
+        'latency_p99_change_pct': change('latency_p99_ms'),
+    }
@@ -0,0 +1,357 @@
+"""
+Leader election for the billing scheduler.
+
+app.py starts a BillingScheduler in every process, so under gunicorn
+with N workers each cron job would fire N times. Every process keeps its
+scheduler running, but only the holder of a short lease executes jobs:
+
+    elector = LeaderElector(create_scheduler_lease())
+    elector.start()            # acquire/renew every few seconds
+    if elector.wait_for_leadership(timeout=20):
+        run_job()
+
+The leader renews the lease every ``renew_interval`` seconds. If it dies
+the lease lapses after ``lease_seconds`` (or at once for the Postgres
+advisory lock, whose session dies with the process) and the next
+follower to renew takes over.
+
+Leadership alone does not make a firing run once: a leader that runs a
+job and then shuts down cleanly hands the lease to a follower that is
+still waiting on the same firing. So before running, the leader also
+claims the firing (``claim_firing(job_id + scheduled time)``) in the
+lease store, and whoever finds it already claimed skips it.
+
+Two lease stores:
+
+- ``FileLease``: a JSON lease record updated under an exclusive flock;
+  coordinates processes on one host (gunicorn workers).
+- ``PostgresAdvisoryLease``: ``pg_try_advisory_lock`` held on a
+  dedicated session; coordinates processes across hosts.
+"""
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+import zlib
+from typing import Callable, Dict, Optional
+
+from config import Config
+from utils.logger import setup_logger
+
+logger = setup_logger('leader_election')
+
+# How long a firing claim is kept; far longer than any follower waits
+CLAIM_KEEP_SECONDS = 24 * 3600
+
+try:
+    import fcntl
+    HAS_FCNTL = True
+except ImportError:  # pragma: no cover - Windows
+    HAS_FCNTL = False
+
+
+class FileLease:
+    """Lease record ``{"owner", "expires_at", "claims"}`` in a file, changed under flock.
+
+    ``expires_at`` is wall-clock time so every process on the host reads
+    it the same way. ``claims`` maps firing keys to their claimant and
+    survives release, so a new leader still sees what already ran.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+    def _locked(self, update: Callable[[Optional[Dict]], Optional[Dict]]) -> Optional[Dict]:
+        """Read the record, let ``update`` replace it, all under one exclusive lock"""
+        with open(self.path, 'a+', encoding='utf-8') as f:
+            if HAS_FCNTL:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                raw = f.read().strip()
+                try:
+                    record = json.loads(raw) if raw else None
+                except ValueError:
+                    record = None
+                new_record = update(record)
+                if new_record is not record:
+                    f.seek(0)
+                    f.truncate()
+                    if new_record is not None:
+                        f.write(json.dumps(new_record))
+                    f.flush()
+                    os.fsync(f.fileno())
+                return new_record
+            finally:
+                if HAS_FCNTL:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def try_acquire(self, owner: str, lease_seconds: float) -> bool:
+        """Take the lease if it is free or expired, or renew it if ours"""
+        def update(record):
+            now = time.time()
+            if record and record.get('owner') != owner and record.get('expires_at', 0) > now:
+                return record
+            return {
+                'owner': owner,
+                'expires_at': now + lease_seconds,
+                'claims': (record or {}).get('claims', {}),
+            }
+
+        record = self._locked(update)
+        return bool(record) and record.get('owner') == owner
+
+    def release(self, owner: str) -> None:
+        def update(record):
+            if record and record.get('owner') == owner:
+                return {'owner': None, 'expires_at': 0, 'claims': record.get('claims', {})}
+            return record
+
+        self._locked(update)
+
+    def claim(self, key: str, owner: str, keep_seconds: float = CLAIM_KEEP_SECONDS) -> bool:
+        """Record ``owner`` as the one running ``key``; False if someone else did"""
+        def update(record):
+            now = time.time()
+            record = dict(record or {'owner': None, 'expires_at': 0})
+            claims = {
+                k: c for k, c in record.get('claims', {}).items()
+                if c.get('expires_at', 0) > now
+            }
+            if key not in claims:
+                claims[key] = {'owner': owner, 'expires_at': now + keep_seconds}
+            record['claims'] = claims
+            return record
+
+        record = self._locked(update)
+        return record['claims'][key]['owner'] == owner
+
+    def holder(self) -> Optional[str]:
+        record = self._locked(lambda record: record)
+        if record and record.get('expires_at', 0) > time.time():
+            return record.get('owner')
+        return None
+
+
+class PostgresAdvisoryLease:
+    """Session-level ``pg_try_advisory_lock`` on a dedicated connection.
+
+    The lock lives exactly as long as the session, so a crashed leader
+    releases it when its connection drops. Renewal is a round trip on
+    the session; if that fails the lease is treated as lost.
+    """
+
+    def __init__(self, connect: Callable[[], object], name: str = 'billing_scheduler'):
+        self.connect = connect
+        # Advisory locks take a bigint key; derive a stable one from the name
+        self.key = zlib.crc32(name.encode('utf-8'))
+        self._conn = None
+        self._held = False
+
+    def _drop(self) -> None:
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+        self._conn = None
+        self._held = False
+
+    def try_acquire(self, owner: str, lease_seconds: float) -> bool:
+        try:
+            if self._conn is None:
+                self._conn = self.connect()
+                self._conn.autocommit = True
+            with self._conn.cursor() as cur:
+                if self._held:
+                    cur.execute("SELECT 1")
+                else:
+                    cur.execute("SELECT pg_try_advisory_lock(%s)", (self.key,))
+                    self._held = bool(cur.fetchone()[0])
+            return self._held
+        except Exception as e:
+            logger.warning(f"Advisory lock check failed, dropping session: {e}")
+            self._drop()
+            return False
+
+    def release(self, owner: str) -> None:
+        if self._conn is not None and self._held:
+            try:
+                with self._conn.cursor() as cur:
+                    cur.execute("SELECT pg_advisory_unlock(%s)", (self.key,))
+            except Exception as e:
+                logger.warning(f"Could not release advisory lock: {e}")
+        self._drop()
+
+    def claim(self, key: str, owner: str, keep_seconds: float = CLAIM_KEEP_SECONDS) -> bool:
+        """Insert the firing into scheduler_job_claims; False if another owner has it"""
+        if self._conn is None:
+            return False
+        with self._conn.cursor() as cur:
+            cur.execute(
+                "DELETE FROM scheduler_job_claims WHERE claimed_at < NOW() - %s * INTERVAL '1 second'",
+                (keep_seconds,)
+            )
+            cur.execute(
+                "INSERT INTO scheduler_job_claims (claim_key, owner) VALUES (%s, %s) "
+                "ON CONFLICT (claim_key) DO NOTHING",
+                (key, owner)
+            )
+            cur.execute("SELECT owner FROM scheduler_job_claims WHERE claim_key = %s", (key,))
+            row = cur.fetchone()
+        return bool(row) and row[0] == owner
+
+    def holder(self) -> Optional[str]:
+        if self._conn is None:
+            return None
+        try:
+            with self._conn.cursor() as cur:
+                cur.execute(
+                    "SELECT pid FROM pg_locks WHERE locktype = 'advisory' AND objid = %s AND granted",
+                    (self.key & 0xFFFFFFFF,)
+                )
+                row = cur.fetchone()
+            return f"pg backend {row[0]}" if row else None
+        except Exception:
+            return None
+
+
+class LeaderElector:
+    """Keep trying to hold a lease in the background; report leadership."""
+
+    def __init__(
+        self,
+        lease,
+        lease_seconds: float = 15.0,
+        renew_interval: Optional[float] = None,
+        owner: Optional[str] = None
+    ):
+        self.lease = lease
+        self.lease_seconds = lease_seconds
+        self.renew_interval = renew_interval or max(lease_seconds / 3, 0.5)
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._leader_until = 0.0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def is_leader(self) -> bool:
+        # Leadership lapses locally a little before the lease itself, so
+        # a leader that stopped renewing stops running jobs first.
+        return time.monotonic() < self._leader_until
+
+    def tick(self) -> bool:
+        """One acquire/renew attempt; returns whether we lead afterwards"""
+        with self._lock:
+            was_leader = self.is_leader
+            started = time.monotonic()
+            try:
+                acquired = self.lease.try_acquire(self.owner, self.lease_seconds)
+            except Exception as e:
+                logger.warning(f"Lease renewal failed for {self.owner}: {e}")
+                acquired = False
+            self._leader_until = started + self.lease_seconds * 0.8 if acquired else 0.0
+            if acquired and not was_leader:
+                logger.info(f"{self.owner} is now the scheduler leader")
+            elif was_leader and not acquired:
+                logger.warning(f"{self.owner} lost scheduler leadership")
+            return acquired
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self.tick()
+
+        def loop():
+            while not self._stop.wait(self.renew_interval):
+                self.tick()
+
+        self._thread = threading.Thread(target=loop, name='scheduler-leader-election', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop renewing and hand the lease back so a follower takes over at once"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.renew_interval + 1)
+            self._thread = None
+        with self._lock:
+            if self.is_leader:
+                try:
+                    self.lease.release(self.owner)
+                except Exception as e:
+                    logger.warning(f"Could not release scheduler lease: {e}")
+            self._leader_until = 0.0
+
+    def wait_for_leadership(self, timeout: float) -> bool:
+        """True once we lead, trying until ``timeout`` seconds have passed.
+
+        Called when a job fires: the current leader returns at once, and
+        a follower keeps trying long enough to take over from a leader
+        that died just before the job was due.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            if self.is_leader or self.tick():
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            self._stop.wait(min(self.renew_interval, remaining))
+
+    def claim_firing(self, key: str) -> bool:
+        """True if this process is the one to run firing ``key``.
+
+        A claim that cannot be stored falls back to leadership alone
+        (logged), so a missing claims table never stops the jobs.
+        """
+        try:
+            return self.lease.claim(key, self.owner)
+        except Exception as e:
+            logger.warning(f"Could not claim {key}, running on leadership alone: {e}")
+            return True
+
+    def status(self) -> Dict:
+        try:
+            holder = self.lease.holder()
+        except Exception:
+            holder = None
+        return {
+            'owner': self.owner,
+            'is_leader': self.is_leader,
+            'leader': self.owner if self.is_leader else holder,
+            'lease_seconds': self.lease_seconds,
+            'backend': type(self.lease).__name__,
+        }
+
+
+def create_scheduler_lease():
+    """Lease store selected by SCHEDULER_LOCK_BACKEND ('file', 'postgres' or 'none')"""
+    backend = Config.SCHEDULER_LOCK_BACKEND
+    if backend in ('none', 'off', ''):
+        return None
+    if backend == 'postgres':
+        import psycopg2
+
+        def connect():
+            if Config.POSTGRES_CONNECTION_STRING:
+                return psycopg2.connect(Config.POSTGRES_CONNECTION_STRING)
+            return psycopg2.connect(
+                host=Config.POSTGRES_HOST,
+                port=Config.POSTGRES_PORT,
+                database=Config.POSTGRES_DB,
+                user=Config.POSTGRES_USER,
+                password=Config.POSTGRES_PASSWORD,
+                sslmode='require'
+            )
+
+        return PostgresAdvisoryLease(connect)
+    if backend == 'file':
+        return FileLease(Config.SCHEDULER_LOCK_PATH)
+    raise ValueError(f"Unknown SCHEDULER_LOCK_BACKEND: {backend!r}")
@@ -0,0 +1,815 @@
+"""
+Embedded SQLite backend that speaks the Supabase client contract.
+
+DatabaseService talks to Supabase through a small subset of the
+postgrest-py query builder (``table().select().eq().order().range()``,
+``insert``/``update``/``delete``, embedded resources such as
+``flats!inner(code)`` and ``rpc``). LocalSupabaseClient implements that
+subset on top of a SQLite file built from ``database/supabase_schema.sql``,
+so every Supabase code path in DatabaseService runs unchanged against a
+local database:
+
+    DATABASE_BACKEND=local
+    LOCAL_DATABASE_PATH=data/local_billing.db
+
+The SQL functions in the schema (``bill_status_summary``,
+``readings_before_batch``) and the deployed ``generate_bills_for_month``
+RPC are implemented in Python as RPC handlers. Errors are raised as
+LocalAPIError carrying the same Postgres/PostgREST codes (23505,
+PGRST202, ...) the callers already check for.
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from utils.logger import setup_logger
+
+logger = setup_logger('local_backend')
+
+try:
+    from postgrest.exceptions import APIError as _APIErrorBase
+except Exception:  # pragma: no cover - postgrest not installed
+    _APIErrorBase = Exception
+
+SCHEMA_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'database', 'supabase_schema.sql'
+)
+
+
+class LocalAPIError(_APIErrorBase):
+    """Error shaped like postgrest's APIError (``code``/``message``/...)."""
+
+    def __init__(self, code: str, message: str, details: Optional[str] = None, hint: Optional[str] = None):
+        self.code = code
+        self.message = message
+        self.details = details
+        self.hint = hint
+        error = {'code': code, 'message': message, 'details': details, 'hint': hint}
+        if _APIErrorBase is Exception:
+            Exception.__init__(self, str(error))
+        else:
+            super().__init__(error)
+
+    def __str__(self):
+        return str({'code': self.code, 'message': self.message, 'details': self.details, 'hint': self.hint})
+
+
+class LocalResponse:
+    """Mirror of postgrest's APIResponse: ``data`` plus optional ``count``."""
+
+    def __init__(self, data: Any, count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+
+# ---------------------------------------------------------------------------
+# Schema translation
+# ---------------------------------------------------------------------------
+
+def translate_schema(sql: str) -> str:
+    """Rewrite the Postgres schema into SQLite DDL.
+
+    Functions are dropped (their logic lives in the RPC handlers), column
+    types are mapped to SQLite affinities and identity columns become
+    AUTOINCREMENT rowids.
+    """
+    sql = re.sub(r'--[^\n]*', '', sql)
+    sql = re.sub(r'create\s+or\s+replace\s+function.*?\$\$.*?\$\$\s*;', '', sql, flags=re.I | re.S)
+    sql = re.sub(r'^\s*(begin|commit)\s*;', '', sql, flags=re.I | re.M)
+    sql = re.sub(r'\bpublic\.', '', sql)
+    sql = re.sub(
+        r'bigint\s+generated\s+by\s+default\s+as\s+identity\s+primary\s+key',
+        'INTEGER PRIMARY KEY AUTOINCREMENT', sql, flags=re.I
+    )
+    sql = re.sub(r'default\s+now\(\)', "default (strftime('%Y-%m-%dT%H:%M:%f', 'now'))", sql, flags=re.I)
+    sql = re.sub(r'\btimestamptz\b', 'TEXT', sql, flags=re.I)
+    sql = re.sub(r'\bjsonb\b', 'TEXT', sql, flags=re.I)
+    sql = re.sub(r'\bnumeric\b', 'REAL', sql, flags=re.I)
+    sql = re.sub(r'\bboolean\s+default\s+false\b', 'INTEGER DEFAULT 0', sql, flags=re.I)
+    sql = re.sub(r'\bboolean\b', 'INTEGER', sql, flags=re.I)
+    sql = re.sub(r'create\s+or\s+replace\s+view', 'create view if not exists', sql, flags=re.I)
+    return sql
+
+
+def _to_db(value: Any) -> Any:
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return value
+
+
+def _split_top_level(text: str, sep: str = ',') -> List[str]:
+    """Split on ``sep`` outside parentheses and double quotes."""
+    parts, depth, quoted, current = [], 0, False, []
+    for ch in text:
+        if ch == '"':
+            quoted = not quoted
+        elif not quoted and ch == '(':
+            depth += 1
+        elif not quoted and ch == ')':
+            depth -= 1
+        if ch == sep and depth == 0 and not quoted:
+            parts.append(''.join(current).strip())
+            current = []
+        else:
+            current.append(ch)
+    if ''.join(current).strip():
+        parts.append(''.join(current).strip())
+    return parts
+
+
+def _unquote(value: str) -> str:
+    value = value.strip()
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        return value[1:-1]
+    return value
+
+
+_COMPARISONS = {'eq': '=', 'neq': '!=', 'gt': '>', 'gte': '>=', 'lt': '<', 'lte': '<='}
+
+
+def _condition(column: str, op: str, value: Any) -> Tuple[str, List]:
+    """SQL fragment and params for one PostgREST operator."""
+    column_sql = f'"{column}"'
+    if op in _COMPARISONS:
+        return f'{column_sql} {_COMPARISONS[op]} ?', [_to_db(value)]
+    if op == 'in':
+        values = [_to_db(v) for v in value]
+        if not values:
+            return '0', []
+        return f'{column_sql} IN ({", ".join("?" * len(values))})', values
+    if op == 'is':
+        keyword = {None: 'NULL', 'null': 'NULL', True: 'TRUE', 'true': 'TRUE',
+                   False: 'FALSE', 'false': 'FALSE'}[value]
+        return f'{column_sql} IS {keyword}', []
+    if op == 'like':
+        return f'{column_sql} GLOB ?', [str(value).replace('%', '*').replace('_', '?')]
+    if op == 'ilike':
+        return f'{column_sql} LIKE ?', [str(value).replace('*', '%')]
+    raise LocalAPIError('PGRST100', f'unsupported operator "{op}"')
+
+
+def _parse_logic_tree(expression: str) -> Tuple[List[str], List]:
+    """Translate an ``or_()`` filter string such as
+    ``reading_date.lt."2025-01-01",and(reading_date.eq."2025-01-01",id.lt.5)``.
+    """
+    clauses, params = [], []
+    for part in _split_top_level(expression):
+        negate = False
+        if part.startswith('not.'):
+            negate, part = True, part[4:]
+        match = re.match(r'^(and|or)\((.*)\)$', part, re.S)
+        if match:
+            inner_sql, inner_params = _parse_logic_tree(match.group(2))
+            joiner = ' AND ' if match.group(1) == 'and' else ' OR '
+            sql = '(' + joiner.join(inner_sql) + ')'
+            params.extend(inner_params)
+        else:
+            column, op, raw = part.split('.', 2)
+            if op == 'not':
+                negate = True
+                op, raw = raw.split('.', 1)
+            if op == 'in':
+                value = [_unquote(v) for v in _split_top_level(raw.strip()[1:-1])]
+            elif op == 'is':
+                value = raw
+            else:
+                value = _unquote(raw)
+            sql, cond_params = _condition(column, op, value)
+            params.extend(cond_params)
+        clauses.append(f'NOT ({sql})' if negate else sql)
+    return clauses, params
+
+
+def _parse_select(columns: str) -> Tuple[List[str], List[Dict]]:
+    """Split a select string into plain columns and embedded resources."""
+    plain, embeds = [], []
+    for item in _split_top_level(columns or '*'):
+        match = re.match(r'^(?:(\w+):)?(\w+)(?:!(\w+))?\((.*)\)$', item, re.S)
+        if not match:
+            plain.append(item)
+            continue
+        alias, table, hint, inner = match.groups()
+        embeds.append({
+            'alias': alias or table,
+            'table': table,
+            'inner': hint == 'inner',
+            'columns': inner,
+        })
+    return plain, embeds
+
+
+# ---------------------------------------------------------------------------
+# Query builder
+# ---------------------------------------------------------------------------
+
+class _NotProxy:
+    """``query.not_.in_(...)`` support: negates the next filter."""
+
+    def __init__(self, query: 'LocalQuery'):
+        self._query = query
+
+    def __getattr__(self, name):
+        method = getattr(self._query, name)
+
+        def negated(*args, **kwargs):
+            self._query._negate_next = True
+            return method(*args, **kwargs)
+        return negated
+
+
+class LocalQuery:
+    """Chainable query over one table or view (postgrest builder subset)."""
+
+    def __init__(self, client: 'LocalSupabaseClient', table: str):
+        self._client = client
+        self._table = table
+        self._action = 'select'
+        self._columns = '*'
+        self._count = None
+        self._payload = None
+        self._where: List[str] = []
+        self._params: List[Any] = []
+        self._order: List[str] = []
+        self._limit: Optional[int] = None
+        self._offset: Optional[int] = None
+        self._single = False
+        self._negate_next = False
+
+    # -- actions ----------------------------------------------------------
+    def select(self, columns: str = '*', count: Optional[str] = None, **_):
+        self._columns = columns
+        self._count = count
+        return self
+
+    def insert(self, rows, **_):
+        self._action = 'insert'
+        self._payload = rows if isinstance(rows, list) else [rows]
+        return self
+
+    def update(self, values: Dict, **_):
+        self._action = 'update'
+        self._payload = values
+        return self
+
+    def delete(self, **_):
+        self._action = 'delete'
+        return self
+
+    # -- filters ----------------------------------------------------------
+    def _filter(self, column: str, op: str, value: Any):
+        sql, params = _condition(column, op, value)
+        if self._negate_next:
+            sql, self._negate_next = f'NOT ({sql})', False
+        self._where.append(sql)
+        self._params.extend(params)
+        return self
+
+    def eq(self, column, value):
+        return self._filter(column, 'eq', value)
+
+    def neq(self, column, value):
+        return self._filter(column, 'neq', value)
+
+    def gt(self, column, value):
+        return self._filter(column, 'gt', value)
+
+    def gte(self, column, value):
+        return self._filter(column, 'gte', value)
+
+    def lt(self, column, value):
+        return self._filter(column, 'lt', value)
+
+    def lte(self, column, value):
+        return self._filter(column, 'lte', value)
+
+    def in_(self, column, values):
+        return self._filter(column, 'in', list(values))
+
+    def is_(self, column, value):
+        return self._filter(column, 'is', value)
+
+    def like(self, column, pattern):
+        return self._filter(column, 'like', pattern)
+
+    def ilike(self, column, pattern):
+        return self._filter(column, 'ilike', pattern)
+
+    @property
+    def not_(self):
+        return _NotProxy(self)
+
+    def or_(self, filters: str, **_):
+        clauses, params = _parse_logic_tree(filters)
+        sql = '(' + ' OR '.join(clauses) + ')'
+        if self._negate_next:
+            sql, self._negate_next = f'NOT {sql}', False
+        self._where.append(sql)
+        self._params.extend(params)
+        return self
+
+    # -- modifiers --------------------------------------------------------
+    def order(self, column: str, desc: bool = False, nullsfirst: Optional[bool] = None, **_):
+        # PostgREST defaults: NULLS LAST ascending, NULLS FIRST descending
+        if nullsfirst is None:
+            nullsfirst = desc
+        self._order.append(
+            f'"{column}" {"DESC" if desc else "ASC"} NULLS {"FIRST" if nullsfirst else "LAST"}'
+        )
+        return self
+
+    def limit(self, size: int, **_):
+        self._limit = size
+        return self
+
+    def range(self, start: int, end: int, **_):
+        self._offset = start
+        self._limit = end - start + 1
+        return self
+
+    def single(self):
+        self._single = True
+        return self
+
+    maybe_single = single
+
+    # -- execution --------------------------------------------------------
+    def _where_sql(self) -> str:
+        return (' WHERE ' + ' AND '.join(self._where)) if self._where else ''
+
+    def execute(self) -> LocalResponse:
+        with self._client._lock:
+            try:
+                if self._action == 'select':
+                    response = self._execute_select()
+                elif self._action == 'insert':
+                    response = self._execute_insert()
+                elif self._action == 'update':
+                    response = self._execute_update()
+                else:
+                    response = self._execute_delete()
+                self._client._conn.commit()
+            except sqlite3.Error as e:
+                self._client._conn.rollback()
+                raise self._client._translate_error(e, self._table) from e
+        if self._single:
+            if len(response.data) != 1:
+                raise LocalAPIError('PGRST116', 'JSON object requested, multiple (or no) rows returned')
+            response.data = response.data[0]
+        return response
+
+    def _execute_select(self) -> LocalResponse:
+        client = self._client
+        plain, embeds = _parse_select(self._columns)
+        where = self._where_sql()
+
+        sql = f'SELECT * FROM "{self._table}"{where}'
+        if self._order:
+            sql += ' ORDER BY ' + ', '.join(self._order)
+        # With !inner embeds, parent rows can still be dropped after the
+        # page is fetched; paginate in Python in that case.
+        paginate_in_sql = not any(e['inner'] for e in embeds)
+        if paginate_in_sql and (self._limit is not None or self._offset):
+            sql += f' LIMIT {self._limit if self._limit is not None else -1} OFFSET {self._offset or 0}'
+
+        rows = [dict(r) for r in client._conn.execute(sql, self._params)]
+        rows = client._embed(self._table, rows, embeds)
+        if not paginate_in_sql and (self._limit is not None or self._offset):
+            start = self._offset or 0
+            rows = rows[start:start + self._limit] if self._limit is not None else rows[start:]
+
+        count = None
+        if self._count:
+            count = client._conn.execute(
+                f'SELECT COUNT(*) FROM "{self._table}"{where}', self._params
+            ).fetchone()[0]
+
+        return LocalResponse([client._project(row, plain, embeds) for row in rows], count)
+
+    def _execute_insert(self) -> LocalResponse:
+        client = self._client
+        known = client._columns(self._table)
+        inserted = []
+        for row in self._payload:
+            unknown = [c for c in row if c not in known]
+            if unknown:
+                raise LocalAPIError(
+                    'PGRST204',
+                    f"Could not find the '{unknown[0]}' column of '{self._table}' in the schema cache"
+                )
+            columns = list(row)
+            if columns:
+                names = ', '.join('"%s"' % c for c in columns)
+                marks = ', '.join('?' * len(columns))
+                sql = f'INSERT INTO "{self._table}" ({names}) VALUES ({marks}) RETURNING *'
+            else:
+                sql = f'INSERT INTO "{self._table}" DEFAULT VALUES RETURNING *'
+            inserted.append(dict(client._conn.execute(sql, [_to_db(row[c]) for c in columns]).fetchone()))
+        return LocalResponse(inserted, len(inserted) if self._count else None)
+
+    def _execute_update(self) -> LocalResponse:
+        known = self._client._columns(self._table)
+        unknown = [c for c in self._payload if c not in known]
+        if unknown:
+            raise LocalAPIError(
+                'PGRST204',
+                f"Could not find the '{unknown[0]}' column of '{self._table}' in the schema cache"
+            )
+        assignments = ', '.join(f'"{c}" = ?' for c in self._payload)
+        sql = f'UPDATE "{self._table}" SET {assignments}{self._where_sql()} RETURNING *'
+        params = [_to_db(v) for v in self._payload.values()] + self._params
+        rows = [dict(r) for r in self._client._conn.execute(sql, params)]
+        return LocalResponse(rows, len(rows) if self._count else None)
+
+    def _execute_delete(self) -> LocalResponse:
+        sql = f'DELETE FROM "{self._table}"{self._where_sql()} RETURNING *'
+        rows = [dict(r) for r in self._client._conn.execute(sql, self._params)]
+        return LocalResponse(rows, len(rows) if self._count else None)
+
+
+class _RpcCall:
+    def __init__(self, client: 'LocalSupabaseClient', name: str, params: Optional[Dict]):
+        self._client = client
+        self._name = name
+        self._params = params or {}
+
+    def execute(self) -> LocalResponse:
+        handler = self._client._rpc_handlers.get(self._name)
+        if handler is None:
+            raise LocalAPIError(
+                'PGRST202',
+                f'Could not find the function public.{self._name} in the schema cache'
+            )
+        with self._client._lock:
+            try:
+                data = handler(self._client, **self._params)
+                self._client._conn.commit()
+            except sqlite3.Error as e:
+                self._client._conn.rollback()
+                raise self._client._translate_error(e, self._name) from e
+        return LocalResponse(data)
+
+
+# ---------------------------------------------------------------------------
+# Client
+# ---------------------------------------------------------------------------
+
+class LocalSupabaseClient:
+    """SQLite-backed stand-in for ``supabase.Client``.
+
+    One connection is shared by all threads and serialised with a lock;
+    file databases use WAL so other processes can read concurrently.
+    """
+
+    def __init__(self, path: str = ':memory:', schema_path: str = SCHEMA_PATH):
+        self.path = path
+        if path != ':memory:':
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA foreign_keys = ON')
+        if path != ':memory:':
+            self._conn.execute('PRAGMA journal_mode = WAL')
+            self._conn.execute('PRAGMA synchronous = NORMAL')
+
+        with open(schema_path, 'r', encoding='utf-8') as f:
+            self._conn.executescript(translate_schema(f.read()))
+        self._conn.commit()
+
+        self._column_cache: Dict[str, set] = {}
+        self._foreign_keys = self._load_foreign_keys()
+        self._unique_indexes = self._load_unique_indexes()
+        self._rpc_handlers: Dict[str, Callable] = dict(RPC_HANDLERS)
+        logger.info(f"Local SQLite backend ready at {path}")
+
+    # -- supabase.Client surface -------------------------------------------
+    def table(self, name: str) -> LocalQuery:
+        return LocalQuery(self, name)
+
+    from_ = table
+
+    def rpc(self, name: str, params: Optional[Dict] = None) -> _RpcCall:
+        return _RpcCall(self, name, params)
+
+    def register_rpc(self, name: str, handler: Callable) -> None:
+        """Add or replace an RPC handler ``handler(client, **params)``."""
+        self._rpc_handlers[name] = handler
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def bulk_insert(self, table: str, rows: List[Dict]) -> int:
+        """Insert many rows with one ``executemany`` (used for seeding)."""
+        if not rows:
+            return 0
+        columns = list(rows[0])
+        names = ', '.join('"%s"' % c for c in columns)
+        marks = ', '.join('?' * len(columns))
+        with self._lock:
+            try:
+                self._conn.executemany(
+                    f'INSERT INTO "{table}" ({names}) VALUES ({marks})',
+                    ([_to_db(row.get(c)) for c in columns] for row in rows)
+                )
+                self._conn.commit()
+            except sqlite3.Error as e:
+                self._conn.rollback()
+                raise self._translate_error(e, table) from e
+        return len(rows)
+
+    # -- helpers used by queries and RPC handlers --------------------------
+    def query(self, sql: str, params: Tuple = ()) -> List[Dict]:
+        return [dict(r) for r in self._conn.execute(sql, params)]
+
+    def _columns(self, table: str) -> set:
+        columns = self._column_cache.get(table)
+        if columns is None:
+            columns = {r['name'] for r in self._conn.execute(f'PRAGMA table_info("{table}")')}
+            if not columns:
+                raise LocalAPIError(
+                    'PGRST205', f"Could not find the table 'public.{table}' in the schema cache"
+                )
+            self._column_cache[table] = columns
+        return columns
+
+    def _tables(self) -> List[str]:
+        return [r['name'] for r in self._conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+        )]
+
+    def _load_foreign_keys(self) -> Dict[str, List[Tuple[str, str, str]]]:
+        """``{table: [(column, referenced_table, referenced_column), ...]}``"""
+        keys = {}
+        for table in self._tables():
+            keys[table] = [
+                (r['from'], r['table'], r['to'] or 'id')
+                for r in self._conn.execute(f'PRAGMA foreign_key_list("{table}")')
+            ]
+        return keys
+
+    def _load_unique_indexes(self) -> Dict[Tuple[str, Tuple[str, ...]], str]:
+        """Map ``(table, columns)`` to the Postgres constraint name."""
+        indexes = {}
+        for table in self._tables():
+            for index in self._conn.execute(f'PRAGMA index_list("{table}")'):
+                if not index['unique']:
+                    continue
+                columns = tuple(
+                    r['name'] for r in self._conn.execute(f'PRAGMA index_info("{index["name"]}")')
+                )
+                name = index['name']
+                if name.startswith('sqlite_autoindex'):
+                    name = f"{table}_{'_'.join(columns)}_key"
+                indexes[(table, columns)] = name
+        return indexes
+
+    def _translate_error(self, error: sqlite3.Error, table: str) -> LocalAPIError:
+        message = str(error)
+        if 'UNIQUE constraint failed' in message:
+            failed = message.split('failed:', 1)[1].strip()
+            columns = tuple(c.strip().split('.', 1)[-1] for c in failed.split(','))
+            tbl = failed.split('.', 1)[0].strip()
+            name = self._unique_indexes.get((tbl, columns), f"{tbl}_{'_'.join(columns)}_key")
+            return LocalAPIError(
+                '23505', f'duplicate key value violates unique constraint "{name}"',
+                details=f"Key ({', '.join(columns)}) already exists."
+            )
+        if 'NOT NULL constraint failed' in message:
+            column = message.rsplit('.', 1)[-1]
+            return LocalAPIError('23502', f'null value in column "{column}" of relation "{table}" violates not-null constraint')
+        if 'FOREIGN KEY constraint failed' in message:
+            return LocalAPIError('23503', f'insert or update on table "{table}" violates foreign key constraint')
+        if 'no such table' in message:
+            return LocalAPIError('42P01', f'relation "public.{table}" does not exist')
+        if 'no such column' in message:
+            return LocalAPIError('42703', message)
+        return LocalAPIError('XX000', message)
+
+    def _relationship(self, parent: str, child: str) -> Tuple[str, str, str]:
+        """How ``child`` embeds into ``parent``.
+
+        Returns ``('one', parent_column, child_column)`` for a many-to-one
+        embed (parent holds the FK) or ``('many', parent_column,
+        child_column)`` for one-to-many. The first matching FK wins.
+        """
+        for column, ref_table, ref_column in self._foreign_keys.get(parent, []):
+            if ref_table == child:
+                return 'one', column, ref_column
+        for column, ref_table, ref_column in self._foreign_keys.get(child, []):
+            if ref_table == parent:
+                return 'many', ref_column, column
+        raise LocalAPIError(
+            'PGRST200',
+            f"Could not find a relationship between '{parent}' and '{child}' in the schema cache"
+        )
+
+    def _embed(self, table: str, rows: List[Dict], embeds: List[Dict]) -> List[Dict]:
+        """Attach embedded resources to ``rows`` (one query per resource)."""
+        for embed in embeds:
+            if not rows:
+                break
+            kind, parent_column, child_column = self._relationship(table, embed['table'])
+            keys = list({row[parent_column] for row in rows if row.get(parent_column) is not None})
+            children: List[Dict] = []
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                children.extend(self.query(
+                    f'SELECT * FROM "{embed["table"]}" WHERE "{child_column}" IN ({", ".join("?" * len(chunk))})',
+                    tuple(chunk)
+                ))
+            child_plain, child_embeds = _parse_select(embed['columns'])
+            children = self._embed(embed['table'], children, child_embeds)
+
+            grouped: Dict[Any, List[Dict]] = {}
+            for child in children:
+                grouped.setdefault(child[child_column], []).append(
+                    self._project(child, child_plain, child_embeds)
+                )
+
+            kept = []
+            for row in rows:
+                matches = grouped.get(row.get(parent_column), [])
+                if embed['inner'] and not matches:
+                    continue
+                row[f"__embed__{embed['alias']}"] = (matches[0] if matches else None) if kind == 'one' else matches
+                kept.append(row)
+            rows = kept
+        return rows
+
+    @staticmethod
+    def _project(row: Dict, plain: List[str], embeds: List[Dict]) -> Dict:
+        if not plain or plain == ['*'] or '*' in plain:
+            result = {k: v for k, v in row.items() if not k.startswith('__embed__')}
+        else:
+            result = {}
+            for item in plain:
+                alias, _, column = item.rpartition(':')
+                column = column.split('::', 1)[0].strip()
+                result[alias or column] = row.get(column)
+        for embed in embeds:
+            key = f"__embed__{embed['alias']}"
+            if key in row:
+                result[embed['alias']] = row[key]
+        return result
+
+
+# ---------------------------------------------------------------------------
+# RPC handlers (Python versions of the database functions)
+# ---------------------------------------------------------------------------
+
+def _rpc_bill_status_summary(client: LocalSupabaseClient, p_from=None, p_to=None) -> List[Dict]:
+    return client.query(
+        """
+        SELECT status, COUNT(*) AS bill_count, COALESCE(SUM(total_amount), 0) AS total_amount
+        FROM bills
+        WHERE (? IS NULL OR created_at >= ?) AND (? IS NULL OR created_at < ?)
+        GROUP BY status
+        """,
+        (_to_db(p_from), _to_db(p_from), _to_db(p_to), _to_db(p_to))
+    )
+
+
+def _rpc_readings_before_batch(client: LocalSupabaseClient, p_meter_ids, p_from, p_to) -> List[Dict]:
+    ids = [int(m) for m in p_meter_ids or []]
+    if not ids:
+        return []
+    marks = ', '.join('?' * len(ids))
+    return client.query(
+        f"""
+        SELECT id, meter_id, reading_date, reading_value FROM (
+            SELECT id, meter_id, reading_date, reading_value,
+                   ROW_NUMBER() OVER (PARTITION BY meter_id ORDER BY reading_date DESC, id DESC) AS rn
+            FROM readings
+            WHERE meter_id IN ({marks}) AND reading_date < ?
+        ) WHERE rn = 1
+        UNION ALL
+        SELECT id, meter_id, reading_date, reading_value
+        FROM readings
+        WHERE meter_id IN ({marks}) AND reading_date >= ? AND reading_date < ?
+        """,
+        tuple(ids) + (_to_db(p_from),) + tuple(ids) + (_to_db(p_from), _to_db(p_to))
+    )
+
+
+def _rpc_generate_bills_for_month(
+    client: LocalSupabaseClient,
+    p_billing_period_start,
+    p_billing_period_end,
+    p_due_date
+) -> List[Dict]:
+    """Reference implementation of the deployed bulk billing RPC.
+
+    For every flat with an active meter and readings in the period:
+    flat units are the summed reading consumption, the shared motor's
+    units are split across the flats on that motor by the motor
+    allocation engine, pricing comes from PricingService and the amounts from
+    the batch billing engine. Flats that already have a bill for the
+    period are skipped; the inserted bills are returned.
+    """
+    from services.billing_engine import bills_to_records, calculate_bills_batch
+    from services.motor_allocation import active_motor_by_flat, allocate_motor_shares
+    from services.pricing_service import PricingService
+
+    start, end, due = _to_db(p_billing_period_start), _to_db(p_billing_period_end), _to_db(p_due_date)
+
+    usage = client.query(
+        """
+        SELECT m.id AS meter_id, m.flat_id, m.motor_id,
+               COALESCE(SUM(r.consumption), 0) AS units,
+               (SELECT r2.id FROM readings r2
+                 WHERE r2.meter_id = m.id AND r2.reading_date BETWEEN ? AND ?
+                 ORDER BY r2.reading_date DESC, r2.id DESC LIMIT 1) AS last_reading_id
+        FROM meters m
+        JOIN readings r ON r.meter_id = m.id AND r.reading_date BETWEEN ? AND ?
+        WHERE m.status = 'active'
+        GROUP BY m.id
+        """,
+        (start, end, start, end)
+    )
+    flat_usage = {u['flat_id']: u for u in usage if u['flat_id'] is not None}
+    motor_usage = {u['motor_id']: u for u in usage if u['flat_id'] is None and u['motor_id'] is not None}
+
+    allocations = allocate_motor_shares(
+        active_motor_by_flat(
+            client.query('SELECT id, flat_id, motor_id, start_date, end_date FROM flat_motors'), start, end
+        ),
+        {flat_id: u['units'] for flat_id, u in flat_usage.items()},
+        {motor_id: u['units'] for motor_id, u in motor_usage.items()},
+    )
+
+    codes = {r['id']: r['code'] for r in client.query('SELECT id, code FROM flats')}
+    billed = {
+        r['flat_id'] for r in client.query(
+            'SELECT flat_id FROM bills WHERE billing_period_start = ?', (start,)
+        )
+    }
+
+    to_bill = [flat_id for flat_id in sorted(flat_usage) if flat_id not in billed]
+    motors = [motor_usage.get(allocations[flat_id]['motor_id']) for flat_id in to_bill]
+    pricing = [PricingService.get_pricing_for_flat(codes.get(flat_id, '')) for flat_id in to_bill]
+    bills = bills_to_records(calculate_bills_batch(
+        flat_units=[flat_usage[flat_id]['units'] or 0.0 for flat_id in to_bill],
+        motor_units=[allocations[flat_id]['motor_units'] for flat_id in to_bill],
+        total_flat_units_for_motor=[allocations[flat_id]['total_flat_units_for_motor'] for flat_id in to_bill],
+        rate_per_unit=[rate for rate, _ in pricing],
+        fixed_charge=[fixed for _, fixed in pricing],
+    ))
+
+    inserted = []
+    for flat_id, motor, bill in zip(to_bill, motors, bills):
+        row = client._conn.execute(
+            """
+            INSERT INTO bills (flat_id, billing_period_start, billing_period_end, due_date,
+                               flat_units, motor_units, total_units, total_amount,
+                               water_motor_share, flat_reading_id, motor_reading_id, status)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 'pending')
+            ON CONFLICT (flat_id, billing_period_start) DO NOTHING
+            RETURNING *
+            """,
+            (
+                flat_id, start, end, due,
+                bill['flat_units'], bill['motor_units'], bill['total_units'], bill['total_amount'],
+                bill['water_motor_share'], flat_usage[flat_id]['last_reading_id'],
+                motor['last_reading_id'] if motor else None,
+            )
+        ).fetchone()
+        if row is not None:
+            inserted.append(dict(row))
+
+    logger.info(f"Local generate_bills_for_month created {len(inserted)} bills for {start}..{end}")
+    return inserted
+
+
+RPC_HANDLERS: Dict[str, Callable] = {
+    'bill_status_summary': _rpc_bill_status_summary,
+    'readings_before_batch': _rpc_readings_before_batch,
+    'generate_bills_for_month': _rpc_generate_bills_for_month,
+}
+
+
+# One client per database file so every DatabaseService shares the same
+# connection and lock.
+_clients: Dict[str, LocalSupabaseClient] = {}
+_clients_lock = threading.Lock()
+
+
+def create_local_client(path: str) -> LocalSupabaseClient:
+    """Get or create the shared local client for ``path``."""
+    key = path if path == ':memory:' else os.path.abspath(path)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = LocalSupabaseClient(path)
+            _clients[key] = client
+        return client
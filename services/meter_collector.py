@@ -0,0 +1,266 @@
+"""
+Concurrent smart-meter polling.
+
+The weekly collection job used to poll ``api_endpoint`` of every smart
+meter one after another, so hundreds of meters would overrun the Sunday
+window. MeterCollector polls them on one asyncio event loop:
+
+- at most ``concurrency`` requests in flight,
+- at most ``per_host_rate`` requests per second to any one host (meters
+  behind the same gateway share its limit),
+- a ``timeout`` per attempt, and
+- retries with jittered exponential backoff on timeouts, connection
+  errors, 429 and 5xx.
+
+    outcomes = MeterCollector(concurrency=50).collect(meters)
+    readings = [o['reading'] for o in outcomes if o['status'] == 'ok']
+    db.insert_meter_readings_bulk(readings)
+
+Requests go through one shared ``httpx.AsyncClient`` per collection
+(connection reuse, redirects, proxies from the environment), and a
+response larger than ``MAX_RESPONSE_BYTES`` is rejected. A meter
+endpoint answers ``GET`` with JSON holding ``reading_value`` (or
+``value``) and optionally ``reading_date``.
+"""
+import asyncio
+import functools
+import json
+import random
+import time
+from datetime import date
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from utils.logger import setup_logger
+
+logger = setup_logger('meter_collector')
+
+try:
+    import httpx
+    HAS_HTTPX = True
+    # Connection failures and timeouts inside httpx; worth another attempt
+    RETRYABLE_ERRORS: Tuple[type, ...] = (asyncio.TimeoutError, OSError, httpx.TransportError)
+except ImportError:
+    HAS_HTTPX = False
+    RETRYABLE_ERRORS = (asyncio.TimeoutError, OSError)
+    logger.warning("httpx not installed - smart-meter polling needs a custom fetch")
+
+# (status code, parsed JSON body)
+Fetch = Callable[[str, float], Awaitable[Tuple[int, Any]]]
+
+# A meter reading is a few hundred bytes; anything far larger is not one
+MAX_RESPONSE_BYTES = 64 * 1024
+
+
+class MeterPollError(Exception):
+    """A meter answered with a non-retryable status or an unusable body."""
+
+
+async def http_get_json(
+    url: str,
+    timeout: float,
+    client: Optional['httpx.AsyncClient'] = None,
+    max_bytes: int = MAX_RESPONSE_BYTES
+) -> Tuple[int, Any]:
+    """GET ``url`` and return ``(status, json body or None)``.
+
+    Uses ``client`` if given, else a client for this one request (setting
+    one up is costly, so share one when polling many meters). The
+    body is read in chunks and the request fails with MeterPollError as
+    soon as it (or its Content-Length) passes ``max_bytes``.
+    """
+    if not HAS_HTTPX:
+        raise MeterPollError("httpx is not installed")
+
+    async def request(client: 'httpx.AsyncClient') -> Tuple[int, Any]:
+        async with client.stream('GET', url, headers={'Accept': 'application/json'}) as response:
+            length = response.headers.get('content-length')
+            if length is not None and length.isdigit() and int(length) > max_bytes:
+                raise MeterPollError(f"Response of {length} bytes exceeds {max_bytes}")
+            body = bytearray()
+            async for chunk in response.aiter_bytes():
+                body += chunk
+                if len(body) > max_bytes:
+                    raise MeterPollError(f"Response exceeds {max_bytes} bytes")
+            status = response.status_code
+        try:
+            return status, json.loads(bytes(body)) if body.strip() else None
+        except ValueError:
+            return status, None
+
+    async def run() -> Tuple[int, Any]:
+        if client is not None:
+            return await request(client)
+        async with new_http_client(timeout) as own_client:
+            return await request(own_client)
+
+    # httpx times each phase; this bounds the whole attempt
+    return await asyncio.wait_for(run(), timeout)
+
+
+def new_http_client(timeout: float, concurrency: int = 100) -> 'httpx.AsyncClient':
+    """AsyncClient for meter polling: follows redirects, honours proxy env vars"""
+    return httpx.AsyncClient(
+        timeout=timeout,
+        follow_redirects=True,
+        limits=httpx.Limits(max_connections=concurrency),
+        headers={'User-Agent': 'billing-meter-collector'}
+    )
+
+
+class HostRateLimiter:
+    """Spaces requests to each host at least ``1 / rate_per_second`` apart"""
+
+    def __init__(self, rate_per_second: float):
+        self.interval = 1.0 / rate_per_second if rate_per_second and rate_per_second > 0 else 0.0
+        self._next_slot: Dict[str, float] = {}
+
+    def reserve(self, host: str) -> float:
+        """Book the host's slot if it is due; else seconds until it is.
+
+        Only books a slot that can be used right away, so the caller
+        sends the request immediately and the spacing holds at the wire.
+        No await inside, so coroutines on one loop cannot both book it.
+        """
+        if not self.interval:
+            return 0.0
+        now = asyncio.get_running_loop().time()
+        slot = self._next_slot.get(host, now)
+        if slot > now:
+            return slot - now
+        self._next_slot[host] = now + self.interval
+        return 0.0
+
+
+class MeterCollector:
+    """Poll many smart meters concurrently with limits, timeouts and retries."""
+
+    def __init__(
+        self,
+        concurrency: int = 50,
+        per_host_rate: float = 10.0,
+        timeout: float = 10.0,
+        max_attempts: int = 3,
+        backoff: float = 0.5,
+        fetch: Optional[Fetch] = None
+    ):
+        self.concurrency = max(1, int(concurrency))
+        self.per_host_rate = per_host_rate
+        self.timeout = timeout
+        self.max_attempts = max(1, int(max_attempts))
+        self.backoff = backoff
+        self.fetch = fetch
+
+    @staticmethod
+    def _retryable(status: int) -> bool:
+        return status == 429 or status >= 500
+
+    def _reading_from(self, meter: Dict, body: Any) -> Dict:
+        if not isinstance(body, dict):
+            raise MeterPollError("Response is not a JSON object")
+        value = body.get('reading_value', body.get('value'))
+        if value is None:
+            raise MeterPollError("Response has no reading_value")
+        return {
+            'meter_id': meter['meter_id'],
+            'reading_value': float(value),
+            'reading_date': str(body.get('reading_date') or date.today().isoformat())[:10],
+        }
+
+    @staticmethod
+    async def _acquire(semaphore: asyncio.Semaphore, limiter: HostRateLimiter, host: str) -> None:
+        """Take a request slot and the host's rate slot, in that order.
+
+        The rate slot is booked only while holding the request slot, so
+        time spent queueing for concurrency cannot bunch requests to one
+        host. If the host's slot is not due yet, the request slot is
+        handed back for other hosts while this meter waits.
+        """
+        while True:
+            await semaphore.acquire()
+            delay = limiter.reserve(host)
+            if delay <= 0:
+                return
+            semaphore.release()
+            await asyncio.sleep(delay)
+
+    async def _poll(
+        self,
+        meter: Dict,
+        semaphore: asyncio.Semaphore,
+        limiter: HostRateLimiter,
+        fetch: Fetch
+    ) -> Dict:
+        url = meter.get('api_endpoint') or ''
+        host = urlsplit(url).netloc
+        started = time.perf_counter()
+        outcome = {'meter_id': meter.get('meter_id'), 'status': 'error', 'attempts': 0}
+        for attempt in range(1, self.max_attempts + 1):
+            outcome['attempts'] = attempt
+            retry = False
+            try:
+                if not host:
+                    raise MeterPollError(f"Invalid api_endpoint {url!r}")
+                await self._acquire(semaphore, limiter, host)
+                try:
+                    status, body = await fetch(url, self.timeout)
+                finally:
+                    semaphore.release()
+                if status == 200:
+                    outcome.update(status='ok', reading=self._reading_from(meter, body), error=None)
+                    break
+                retry = self._retryable(status)
+                outcome['error'] = f"HTTP {status}"
+            except MeterPollError as e:
+                outcome['error'] = str(e)
+            except RETRYABLE_ERRORS as e:
+                # A bad URL scheme will not fix itself on another attempt
+                retry = not (HAS_HTTPX and isinstance(e, httpx.UnsupportedProtocol))
+                timed_out = isinstance(e, asyncio.TimeoutError) or (HAS_HTTPX and isinstance(e, httpx.TimeoutException))
+                outcome['error'] = 'timeout' if timed_out else (str(e) or type(e).__name__)
+            except (ValueError, IndexError) as e:
+                outcome['error'] = f"Malformed response: {e}"
+            except Exception as e:
+                # e.g. too many redirects or an unsupported URL scheme
+                outcome['error'] = f"{type(e).__name__}: {e}"
+            if not retry or attempt == self.max_attempts:
+                break
+            # Full jitter: spread retries of meters that failed together
+            await asyncio.sleep(random.uniform(0, self.backoff * 2 ** (attempt - 1)))
+        outcome['seconds'] = time.perf_counter() - started
+        if outcome['status'] != 'ok':
+            logger.warning(f"Polling meter {outcome['meter_id']} failed after {outcome['attempts']} attempts: {outcome['error']}")
+        return outcome
+
+    async def collect_async(self, meters: List[Dict]) -> List[Dict]:
+        """One outcome per meter, in input order"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        limiter = HostRateLimiter(self.per_host_rate)
+        if self.fetch is not None:
+            return await self._gather(meters, semaphore, limiter, self.fetch)
+        if not HAS_HTTPX:
+            raise RuntimeError("httpx is required to poll smart meters")
+        async with new_http_client(self.timeout, self.concurrency) as client:
+            fetch = functools.partial(http_get_json, client=client)
+            return await self._gather(meters, semaphore, limiter, fetch)
+
+    async def _gather(self, meters, semaphore, limiter, fetch: Fetch) -> List[Dict]:
+        return list(await asyncio.gather(*(self._poll(meter, semaphore, limiter, fetch) for meter in meters)))
+
+    def collect(self, meters: List[Dict]) -> List[Dict]:
+        """Poll every meter on a fresh event loop (for scheduler threads).
+
+        Each outcome is ``{"meter_id", "status": "ok" | "error",
+        "reading": {meter_id, reading_value, reading_date}, "attempts",
+        "seconds", "error"}``.
+        """
+        if not meters:
+            return []
+        started = time.perf_counter()
+        outcomes = asyncio.run(self.collect_async(meters))
+        ok = sum(1 for o in outcomes if o['status'] == 'ok')
+        logger.info(
+            f"Polled {len(meters)} smart meters in {time.perf_counter() - started:.2f}s: "
+            f"{ok} ok, {len(meters) - ok} failed"
+        )
+        return outcomes
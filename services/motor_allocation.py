@@ -0,0 +1,109 @@
+"""
+Water-motor share allocation for a billing period.
+
+Each shared water motor has its own meter. Its units are split across
+the flats mapped to it in ``flat_motors`` in proportion to their own
+units for the period:
+
+    Water Motor Share = (Motor Units ÷ Total Units of all flats on the motor) × Flat Units
+
+The functions here take the mapping rows and per-flat/per-motor unit
+totals (however they were loaded), sum every motor's block total in a
+single pass and price all shares at once with the batch billing engine,
+so a whole society is allocated together instead of one flat at a time.
+DatabaseService.get_motor_allocations loads the inputs for a period.
+"""
+import calendar
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from services.billing_engine import calculate_water_motor_share_batch
+
+
+def _as_date(value) -> Optional[date]:
+    if value is None or value == '':
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def month_bounds(day) -> Tuple[date, date]:
+    """First and last day of the month containing ``day``."""
+    day = _as_date(day) or date.today()
+    last = calendar.monthrange(day.year, day.month)[1]
+    return day.replace(day=1), day.replace(day=last)
+
+
+def active_motor_by_flat(flat_motors: Iterable[Dict], period_start, period_end) -> Dict[int, int]:
+    """Map each flat to the motor it shares during the period.
+
+    A ``flat_motors`` row applies when its ``start_date``/``end_date``
+    (either may be NULL) overlaps the period. If a flat has several
+    applicable rows the one that started last wins.
+    """
+    start, end = _as_date(period_start), _as_date(period_end)
+    chosen: Dict[int, Tuple[date, int, int]] = {}
+    for row in flat_motors:
+        row_start, row_end = _as_date(row.get('start_date')), _as_date(row.get('end_date'))
+        if row_start is not None and end is not None and row_start > end:
+            continue
+        if row_end is not None and start is not None and row_end < start:
+            continue
+        flat_id = int(row['flat_id'])
+        rank = (row_start or date.min, int(row.get('id') or 0), int(row['motor_id']))
+        if flat_id not in chosen or rank > chosen[flat_id]:
+            chosen[flat_id] = rank
+    return {flat_id: rank[2] for flat_id, rank in chosen.items()}
+
+
+def allocate_motor_shares(
+    motor_by_flat: Dict[int, int],
+    flat_units: Dict[int, float],
+    motor_units: Dict[int, float]
+) -> Dict[int, Dict]:
+    """Allocate every motor's units across its flats.
+
+    Args:
+        motor_by_flat: flat_id -> motor_id (see active_motor_by_flat).
+        flat_units: flat_id -> the flat's own units for the period.
+        motor_units: motor_id -> the motor meter's units for the period.
+
+    Returns:
+        flat_id -> dict with flat_id, motor_id, flat_units, motor_units,
+        total_flat_units_for_motor and water_motor_share, for every flat
+        with units or a motor. ``motor_units`` and
+        ``total_flat_units_for_motor`` are the arguments
+        TariffRules.calculate_simple_bill expects.
+    """
+    flat_ids: List[int] = sorted(set(flat_units) | set(motor_by_flat))
+
+    # One pass: block total per motor over the flats mapped to it
+    block_units: Dict[int, float] = {}
+    for flat_id in flat_ids:
+        motor_id = motor_by_flat.get(flat_id)
+        if motor_id is not None:
+            units = max(float(flat_units.get(flat_id) or 0.0), 0.0)
+            block_units[motor_id] = block_units.get(motor_id, 0.0) + units
+
+    motors = [motor_by_flat.get(flat_id) for flat_id in flat_ids]
+    units = [max(float(flat_units.get(flat_id) or 0.0), 0.0) for flat_id in flat_ids]
+    motor_totals = [float(motor_units.get(m) or 0.0) if m is not None else 0.0 for m in motors]
+    block_totals = [block_units.get(m, 0.0) if m is not None else 0.0 for m in motors]
+
+    shares = calculate_water_motor_share_batch(motor_totals, block_totals, units).tolist()
+
+    return {
+        flat_id: {
+            'flat_id': flat_id,
+            'motor_id': motor_id,
+            'flat_units': flat,
+            'motor_units': motor,
+            'total_flat_units_for_motor': block,
+            'water_motor_share': share,
+        }
+        for flat_id, motor_id, flat, motor, block, share
+        in zip(flat_ids, motors, units, motor_totals, block_totals, shares)
+    }
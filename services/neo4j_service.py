@@ -1,4 +1,5 @@
-from typing import List, Dict
+import uuid
+from typing import Dict, Iterable, List
 from config import Config
 import logging
 
@@ -146,12 +147,17 @@ class Neo4jService:
                 return dict(record['b'])
             return {}
     
-    def sync_bills_from_supabase(self, bills: List[Dict]) -> Dict:
+    def sync_bills_from_supabase(self, bills: Iterable[Dict]) -> Dict:
         """
         Sync bills from Supabase to Neo4j - EXACT MATCH
-        1. CLEARS all existing bills
-        2. Creates all bills from Supabase fresh
+        1. MERGEs every bill from Supabase, stamping it with this sync's id
+        2. Once the source has been read to the end, deletes the bills
+           that were not seen in this sync
         Result: Neo4j will have EXACTLY the same bills as Supabase
+
+        ``bills`` may be any iterable, e.g. DatabaseService.iter_bills(),
+        so the full table never has to be held in memory. If the source
+        yields nothing or fails part-way, nothing is deleted.
         """
         if not self.driver:
             return {"error": "Neo4j driver not available", "synced": 0}
@@ -159,22 +165,27 @@ class Neo4jService:
         synced_count = 0
         deleted_count = 0
         errors = []
+        failed_ids = []
+        sync_id = uuid.uuid4().hex
         
         try:
             with self.driver.session() as session:
-                # Step 1: Clear ALL existing bills from Neo4j
-                delete_result = session.run("""
-                    MATCH (b:Bill)
-                    WITH b, b.id as bill_id
-                    DETACH DELETE b
-                    RETURN count(bill_id) as deleted
-                """)
-                
-                delete_record = delete_result.single()
-                deleted_count = delete_record['deleted'] if delete_record else 0
-                
-                # Step 3: Sync all bills from Supabase (overwrite existing, add new)
-                for bill in bills:
+                # Step 1: MERGE all bills from Supabase (overwrite existing, add new)
+                source = iter(bills)
+                while True:
+                    try:
+                        bill = next(source)
+                    except StopIteration:
+                        break
+                    except Exception as e:
+                        logger.error(f"Failed to fetch bills from source: {e}")
+                        return {
+                            "success": False,
+                            "error": f"Failed to fetch bills: {e}; existing bills were kept",
+                            "synced": synced_count,
+                            "deleted": 0
+                        }
+
                     try:
                         # Ensure Customer node exists
                         session.run("""
@@ -199,9 +210,11 @@ class Neo4jService:
                                 b.billing_period_start = $period_start,
                                 b.billing_period_end = $period_end,
                                 b.created_at = $created_at,
+                                b.sync_id = $sync_id,
                                 b.updated_at = datetime()
                         """, 
                             bill_id=bill.get('id'),
+                            sync_id=sync_id,
                             amount=float(bill.get('amount', 0)),
                             consumption=float(bill.get('consumption_kwh', 0)),
                             status=bill.get('status', 'pending'),
@@ -227,13 +240,31 @@ class Neo4jService:
                         
                     except Exception as e:
                         errors.append(f"Bill {bill.get('id')}: {str(e)}")
+                        failed_ids.append(bill.get('id'))
                         continue
+
+                if synced_count + len(errors) == 0:
+                    logger.warning("Source returned no bills; leaving Neo4j bills unchanged")
+                    return {"success": True, "synced": 0, "deleted": 0, "total": 0, "errors": None}
+
+                # Step 2: Remove bills that are no longer in Supabase
+                # (rows that failed to write keep their previous node)
+                delete_result = session.run("""
+                    MATCH (b:Bill)
+                    WHERE coalesce(b.sync_id, '') <> $sync_id AND NOT b.id IN $failed_ids
+                    WITH b, b.id as bill_id
+                    DETACH DELETE b
+                    RETURN count(bill_id) as deleted
+                """, sync_id=sync_id, failed_ids=failed_ids)
+                
+                delete_record = delete_result.single()
+                deleted_count = delete_record['deleted'] if delete_record else 0
             
             return {
                 "success": True,
                 "synced": synced_count,
                 "deleted": deleted_count,
-                "total": len(bills),
+                "total": synced_count + len(errors),
                 "errors": errors if errors else None
             }
         
@@ -245,11 +276,15 @@ class Neo4jService:
                 "deleted": deleted_count
             }
 
-    def sync_readings_from_supabase(self, readings: List[Dict]) -> Dict:
+    def sync_readings_from_supabase(self, readings: Iterable[Dict]) -> Dict:
         """
         Sync meter readings from Supabase to Neo4j
-        1. CLEARS all existing readings
-        2. Creates all readings from Supabase fresh
+        1. MERGEs every reading from Supabase, stamping it with this sync's id
+        2. Once the source has been read to the end, deletes the readings
+           that were not seen in this sync
+
+        ``readings`` may be any iterable, e.g. DatabaseService.iter_readings().
+        If the source yields nothing or fails part-way, nothing is deleted.
         """
         if not self.driver:
             return {"error": "Neo4j driver not available", "synced": 0}
@@ -257,24 +292,28 @@ class Neo4jService:
         synced_count = 0
         deleted_count = 0
         errors = []
+        failed_ids = []
+        sync_id = uuid.uuid4().hex
         
         try:
             with self.driver.session() as session:
-                # Step 1: Clear ALL existing readings from Neo4j
-                logger.info("Clearing existing readings from Neo4j...")
-                delete_result = session.run("""
-                    MATCH (r:Reading)
-                    DETACH DELETE r
-                    RETURN count(r) as deleted
-                """)
-                
-                delete_record = delete_result.single()
-                deleted_count = delete_record['deleted'] if delete_record else 0
-                logger.info(f"Deleted {deleted_count} existing readings")
-                
-                # Step 2: Sync all readings from Supabase
-                logger.info(f"Syncing {len(readings)} readings to Neo4j...")
-                for reading in readings:
+                # Step 1: Sync all readings from Supabase
+                logger.info("Syncing readings to Neo4j...")
+                source = iter(readings)
+                while True:
+                    try:
+                        reading = next(source)
+                    except StopIteration:
+                        break
+                    except Exception as e:
+                        logger.error(f"Failed to fetch readings from source: {e}")
+                        return {
+                            "success": False,
+                            "error": f"Failed to fetch readings: {e}; existing readings were kept",
+                            "synced": synced_count,
+                            "deleted": 0
+                        }
+
                     try:
                         # Determine how to match the Meter node
                         # Priority 1: Match by unit_id (which is the Meter node ID)
@@ -301,7 +340,8 @@ class Neo4jService:
                                 r.created_at = $created_at,
                                 r.unit = $unit,
                                 r.meter_id = $meter_id_prop,
-                                r.unit_id = $unit_id_prop
+                                r.unit_id = $unit_id_prop,
+                                r.sync_id = $sync_id
                             MERGE (m)-[:HAS_READING]->(r)
                         """, 
                             reading_id=str(reading.get('id')),
@@ -311,6 +351,7 @@ class Neo4jService:
                             unit=reading.get('unit', 'kWh'),
                             meter_id_prop=meter_id,
                             unit_id_prop=unit_id,
+                            sync_id=sync_id,
                             **match_params
                         )
                         
@@ -318,13 +359,31 @@ class Neo4jService:
                         
                     except Exception as e:
                         errors.append(f"Reading {reading.get('id')}: {str(e)}")
+                        failed_ids.append(str(reading.get('id')))
                         continue
+
+                if synced_count + len(errors) == 0:
+                    logger.warning("Source returned no readings; leaving Neo4j readings unchanged")
+                    return {"success": True, "synced": 0, "deleted": 0, "total": 0, "errors": None}
+
+                # Step 2: Remove readings that are no longer in Supabase
+                logger.info("Removing readings not seen in this sync...")
+                delete_result = session.run("""
+                    MATCH (r:Reading)
+                    WHERE coalesce(r.sync_id, '') <> $sync_id AND NOT r.id IN $failed_ids
+                    DETACH DELETE r
+                    RETURN count(r) as deleted
+                """, sync_id=sync_id, failed_ids=failed_ids)
+                
+                delete_record = delete_result.single()
+                deleted_count = delete_record['deleted'] if delete_record else 0
+                logger.info(f"Deleted {deleted_count} stale readings")
             
             return {
                 "success": True,
                 "synced": synced_count,
                 "deleted": deleted_count,
-                "total": len(readings),
+                "total": synced_count + len(errors),
                 "errors": errors if errors else None
             }
         
@@ -47,6 +47,7 @@ class PaymentService:
         customer_id: str = None,
         description: str = None,
         currency: str = "inr",
+        idempotency_key: str = None,
         **kwargs
     ) -> Dict:
         """
@@ -59,6 +60,8 @@ class PaymentService:
             customer_id: Customer identifier
             description: Optional description
             currency: Currency code (default: inr)
+            idempotency_key: Sent to Stripe so a retried or resumed call
+                returns the same price/link instead of creating another
             **kwargs: Additional metadata
         
         Returns:
@@ -94,7 +97,8 @@ class PaymentService:
                 unit_amount=amount_smallest,
                 product_data={
                     "name": description or f"Electricity Bill - {meter_id or 'N/A'}"
-                }
+                },
+                idempotency_key=f"{idempotency_key}:price" if idempotency_key else None
             )
             
             # Create payment link
@@ -104,7 +108,8 @@ class PaymentService:
                     "price": price.id,
                     "quantity": 1
                 }],
-                metadata=metadata
+                metadata=metadata,
+                idempotency_key=f"{idempotency_key}:link" if idempotency_key else None
             )
             
             # Add payment_link_id to metadata for tracking
@@ -1,14 +1,38 @@
 from __future__ import annotations
 
-from functools import lru_cache
+import hashlib
+import json
+import os
+import threading
 from pathlib import Path
-from typing import Dict, Tuple
+from types import MappingProxyType
+from typing import Dict, Mapping, NamedTuple, Optional, Tuple
 
-import pandas as pd
+from services.identity_registry import get_default_registry, normalize_flat_code
 
 
 MASTER_EXCEL_PATH = Path("data/Blessings_City_Master_Data.xlsx")
 
+# Compiled pricing index, keyed by the master file's mtime/size/hash so
+# new processes skip the pandas Excel parse entirely.
+PRICING_INDEX_CACHE_PATH = Path("data/.cache/pricing_index.json")
+PRICING_INDEX_VERSION = 1
+
+# Fixed charge by BHK count (see PricingService docstring)
+BHK_FIXED_OVERRIDES = MappingProxyType({5: 2311.0, 4: 1890.0, 2: 1474.0})
+
+# Flats billed at 9₹ with no fixed charge in production
+NINE_RUPEE_FLATS = frozenset({"C14-SF", "D3-SF", "D4-SF"})
+
+
+class FlatPricing(NamedTuple):
+    """Compiled pricing for one flat code, overrides already applied."""
+
+    rate_per_unit: float
+    fixed_charge: float
+    # Fixed charge per BHK count; empty for 9₹ units (never charged)
+    bhk_fixed: Mapping[int, float]
+
 
 class PricingService:
     """Lookup helper for per-flat pricing.
@@ -46,21 +70,19 @@ class PricingService:
 
         The UI often uses values like "5BHK-B17-FF" where the first
         segment encodes the unit type. The master pricing sheet and
-        Supabase `flats.code` store just "B17-FF". This helper strips
-        any leading type prefix and returns the last two segments so
-        that lookups remain consistent.
+        Supabase `flats.code` store just "B17-FF". When a
+        DatabaseService has loaded the shared identity registry, the
+        identifier is resolved through it (so meter numbers and unit
+        IDs map to the real flat code); otherwise we strip any leading
+        type prefix and return the last two segments.
         """
-        if not identifier:
-            return None
-
-        raw = str(identifier).strip().upper()
-        if not raw:
-            return None
+        registry = get_default_registry()
+        if registry is not None:
+            code = registry.canonical_flat_code(identifier)
+            if code:
+                return code
 
-        parts = [p for p in raw.split("-") if p]
-        if len(parts) >= 2:
-            return "-".join(parts[-2:])
-        return raw
+        return normalize_flat_code(identifier)
 
     @staticmethod
     def extract_bhk_from_identifier(identifier: str | None) -> int | None:
@@ -94,10 +116,12 @@ class PricingService:
         except Exception:
             return None
 
-    @classmethod
-    @lru_cache(maxsize=1)
-    def _load_master(cls) -> Dict[str, Dict[str, float]]:
-        """Load master Excel and build a flat_code -> pricing map.
+    _index: Optional[Mapping[str, FlatPricing]] = None
+    _index_lock = threading.Lock()
+
+    @staticmethod
+    def _read_master_rows(path: Path) -> Dict[str, Dict[str, float]]:
+        """Parse the master Excel into a flat_code -> pricing map.
 
         Expected columns (case-insensitive match):
           - "Flat no"      : flat identifier (e.g. "B17")
@@ -105,70 +129,179 @@ class PricingService:
           - "Fixed Charge" : fixed maintenance charge (₹)
           - "Rate Per Unit": energy rate (₹/kWh), e.g. 12 or 9
         """
-        path = MASTER_EXCEL_PATH
-        if not path.exists():
+        # pandas is only needed when the on-disk index is stale
+        import pandas as pd
+
+        def find_columns(columns):
+            cols = {str(c).strip().lower(): c for c in columns}
+
+            def find_col(name_sub: str) -> str | None:
+                for key, col in cols.items():
+                    if name_sub in key:
+                        return col
+                return None
+
+            return (
+                find_col("flat no") or find_col("flat_no") or find_col("flat"),
+                find_col("floor"),
+                find_col("fixed charge") or find_col("fixed_charges"),
+                find_col("rate per unit") or find_col("rate_per_unit"),
+            )
+
+        # The current Blessings master file has its header on the first
+        # row; the legacy layout had it on row 3. Read the sheet once
+        # without a header and pick whichever row has the columns.
+        raw = pd.read_excel(path, header=None)
+        df = None
+        for header_row in (2, 0):
+            if header_row >= len(raw):
+                continue
+            candidate = raw.iloc[header_row + 1:]
+            candidate.columns = raw.iloc[header_row].tolist()
+            if all(find_columns(candidate.columns)):
+                df = candidate
+                break
+        if df is None:
+            # Missing required cols – return empty map so callers fall back
             return {}
 
-        # Try legacy header row index first (row 3), then fall back to
-        # the first row if required columns are not found.
-        df = pd.read_excel(path, header=2)
-
-        # Normalise column names for robust lookup
-        cols = {str(c).strip().lower(): c for c in df.columns}
+        col_flat, col_floor, col_fixed, col_rate = find_columns(df.columns)
 
-        def find_col(name_sub: str) -> str | None:
-            for key, col in cols.items():
-                if name_sub in key:
-                    return col
-            return None
+        def to_float(value) -> float:
+            try:
+                return float(str(value).replace(",", "").strip() or 0)
+            except Exception:
+                return 0.0
 
-        col_flat = find_col("flat no") or find_col("flat_no") or find_col("flat")
-        col_floor = find_col("floor")
-        col_fixed = find_col("fixed charge") or find_col("fixed_charges")
-        col_rate = find_col("rate per unit") or find_col("rate_per_unit")
+        pricing: Dict[str, Dict[str, float]] = {}
+        for flat_no, floor, fixed, rate in zip(
+            df[col_flat].tolist(), df[col_floor].tolist(),
+            df[col_fixed].tolist(), df[col_rate].tolist(),
+        ):
+            flat_no = str(flat_no if flat_no is not None else "").strip()
+            floor = str(floor if floor is not None else "").strip()
+            if not flat_no or not floor or flat_no.lower() == "nan":
+                continue
+            pricing[f"{flat_no}-{floor}".upper()] = {
+                "rate_per_unit": to_float(rate),
+                "fixed_charge": to_float(fixed),
+            }
+        return pricing
 
-        # If we didn't find the required columns, try again using the
-        # first row as the header (header=0). This matches the current
-        # Blessings master file layout.
-        if not (col_flat and col_floor and col_fixed and col_rate):
-            df = pd.read_excel(path, header=0)
-            cols = {str(c).strip().lower(): c for c in df.columns}
+    @staticmethod
+    def _compile(rows: Dict[str, Dict[str, float]]) -> Dict[str, list]:
+        """Fold the 9₹ and BHK overrides into per-flat entries.
 
-            col_flat = find_col("flat no") or find_col("flat_no") or find_col("flat")
-            col_floor = find_col("floor")
-            col_fixed = find_col("fixed charge") or find_col("fixed_charges")
-            col_rate = find_col("rate per unit") or find_col("rate_per_unit")
+        Entries are ``[rate, fixed, {bhk: fixed}]`` (JSON friendly). The
+        9₹ rule wins over everything: such units never carry a fixed
+        charge, whatever the sheet or BHK prefix says.
+        """
+        compiled = {}
+        for code, info in rows.items():
+            rate = float(info.get("rate_per_unit", 12.0))
+            fixed = float(info.get("fixed_charge", 0.0))
+            if code in NINE_RUPEE_FLATS:
+                rate = 9.0
+            if abs(rate - 9.0) < 1e-6:
+                compiled[code] = [rate, 0.0, {}]
+            else:
+                compiled[code] = [rate, fixed, dict(BHK_FIXED_OVERRIDES)]
+        return compiled
 
-            if not (col_flat and col_floor and col_fixed and col_rate):
-                # Missing required cols – return empty map so callers fall back
-                return {}
+    @staticmethod
+    def _file_sha256(path: Path) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
 
-        pricing: Dict[str, Dict[str, float]] = {}
+    @classmethod
+    def _load_index(cls) -> Mapping[str, FlatPricing]:
+        """Load the compiled index from disk, recompiling when stale.
 
-        for _, row in df.iterrows():
-            flat_no = str(row.get(col_flat, "")).strip()
-            floor = str(row.get(col_floor, "")).strip()
-            if not flat_no or not floor or flat_no.lower() == "nan":
-                continue
+        The cache is trusted when the master file's mtime and size match;
+        otherwise its SHA-256 is compared, so a touched-but-unchanged
+        file does not trigger a re-parse.
+        """
+        path = MASTER_EXCEL_PATH
+        if not path.exists():
+            return MappingProxyType({})
 
-            flat_code = f"{flat_no}-{floor}".upper()
+        stat = path.stat()
+        cached = None
+        try:
+            with open(PRICING_INDEX_CACHE_PATH, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+            if cached.get("version") != PRICING_INDEX_VERSION or cached.get("source") != str(path):
+                cached = None
+        except (OSError, ValueError):
+            cached = None
+
+        entries = None
+        sha256 = None
+        if cached is not None:
+            if cached.get("mtime_ns") == stat.st_mtime_ns and cached.get("size") == stat.st_size:
+                entries = cached["entries"]
+            else:
+                sha256 = cls._file_sha256(path)
+                if cached.get("sha256") == sha256:
+                    entries = cached["entries"]
+
+        if entries is None:
+            entries = cls._compile(cls._read_master_rows(path))
+
+        if entries is not None and (cached is None or cached.get("mtime_ns") != stat.st_mtime_ns):
+            cls._write_index_cache({
+                "version": PRICING_INDEX_VERSION,
+                "source": str(path),
+                "mtime_ns": stat.st_mtime_ns,
+                "size": stat.st_size,
+                "sha256": sha256 or cls._file_sha256(path),
+                "entries": entries,
+            })
+
+        return MappingProxyType({
+            code: FlatPricing(rate, fixed, MappingProxyType({int(k): v for k, v in bhk.items()}))
+            for code, (rate, fixed, bhk) in entries.items()
+        })
 
-            try:
-                fixed_val = float(str(row.get(col_fixed, 0)).replace(",", "").strip() or 0)
-            except Exception:
-                fixed_val = 0.0
+    @staticmethod
+    def _write_index_cache(payload: Dict) -> None:
+        """Atomically replace the on-disk index; failures only cost speed."""
+        try:
+            PRICING_INDEX_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+            tmp = PRICING_INDEX_CACHE_PATH.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(payload, f)
+            os.replace(tmp, PRICING_INDEX_CACHE_PATH)
+        except OSError:
+            pass
 
-            try:
-                rate_val = float(str(row.get(col_rate, 0)).replace(",", "").strip() or 0)
-            except Exception:
-                rate_val = 0.0
+    @classmethod
+    def pricing_index(cls) -> Mapping[str, FlatPricing]:
+        """Read-only flat_code -> FlatPricing map (loaded once per process)"""
+        index = cls._index
+        if index is None:
+            with cls._index_lock:
+                if cls._index is None:
+                    cls._index = cls._load_index()
+                index = cls._index
+        return index
 
-            pricing[flat_code] = {
-                "rate_per_unit": rate_val,
-                "fixed_charge": fixed_val,
-            }
+    @classmethod
+    def reload_index(cls) -> None:
+        """Drop the in-memory index so the next lookup revalidates it"""
+        with cls._index_lock:
+            cls._index = None
 
-        return pricing
+    @classmethod
+    def _load_master(cls) -> Mapping[str, Dict[str, float]]:
+        """flat_code -> {"rate_per_unit", "fixed_charge"} (compat view)"""
+        return MappingProxyType({
+            code: {"rate_per_unit": p.rate_per_unit, "fixed_charge": p.fixed_charge}
+            for code, p in cls.pricing_index().items()
+        })
 
     @classmethod
     def get_pricing_for_flat(cls, flat_code: str) -> Tuple[float, float]:
@@ -189,41 +322,10 @@ class PricingService:
         if not norm_code:
             return 12.0, 0.0
 
-        mapping = cls._load_master()
-        info = mapping.get(norm_code)
+        info = cls.pricing_index().get(norm_code)
         if not info:
             return 12.0, 0.0
 
-        rate = float(info.get("rate_per_unit", 12.0))
-        fixed = float(info.get("fixed_charge", 0.0))
-
-        # Apply BHK-based fixed charges when we have a recognised BHK
-        # prefix. This ensures all 5/4/2 BHK units share the same
-        # maintenance component regardless of per-flat values in the
-        # master sheet.
-        bhk_fixed_overrides = {
-            5: 2311.0,
-            4: 1890.0,
-            2: 1474.0,
-        }
-        if bhk_count in bhk_fixed_overrides:
-            fixed = bhk_fixed_overrides[bhk_count]
-
-        # Supabase-based override: these flats are billed at 9₹ with no
-        # fixed charge in production. Enforce that explicitly so the
-        # workflow matches existing bills even if the master sheet is
-        # not yet updated.
-        nine_rupee_flats = {"C14-SF", "D3-SF", "D4-SF"}
-        if norm_code in nine_rupee_flats:
-            rate = 9.0
-            fixed = 0.0
-
-        # Business rule: units billed at ₹9/kWh should not have any
-        # fixed/maintenance charges applied, even if the master sheet
-        # or BHK rules contain a non-zero value. Enforce that
-        # explicitly here so all downstream calculations stay
-        # consistent.
-        if abs(rate - 9.0) < 1e-6:
-            fixed = 0.0
-
-        return rate, fixed
+        # BHK-based fixed charges and the 9₹/no-fixed-charge rule are
+        # folded into the index at compile time (see _compile).
+        return info.rate_per_unit, info.bhk_fixed.get(bhk_count, info.fixed_charge)
@@ -0,0 +1,267 @@
+"""
+Read-through cache for DatabaseService lookups.
+
+Bills, meters and readings are fetched repeatedly within one request and
+across Streamlit reruns. QueryCache keeps those results in a size-bounded
+LRU with a TTL per entity type ("namespace") and lets writers evict just
+what they touched through tags, e.g. ``bill:42`` or ``bills:aggregate``,
+instead of clearing everything.
+
+The storage backend is pluggable: anything with ``get``/``set``/
+``delete``/``clear`` works. The default is an in-process LRU.
+"""
+import copy
+import functools
+import inspect
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Set, Tuple
+
+from utils.logger import setup_logger
+
+logger = setup_logger('query_cache')
+
+CacheKey = Tuple[str, Hashable]
+
+
+class LRUCacheBackend:
+    """In-process LRU store of ``key -> (expires_at, value)``."""
+
+    def __init__(self, max_entries: int = 2048):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[CacheKey, Tuple[float, Any]]" = OrderedDict()
+        self.evictions = 0
+
+    def get(self, key: CacheKey):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        self._data.move_to_end(key)
+        return entry
+
+    def set(self, key: CacheKey, entry: Tuple[float, Any]) -> Optional[CacheKey]:
+        """Store an entry; returns the key evicted to make room, if any."""
+        self._data[key] = entry
+        self._data.move_to_end(key)
+        if len(self._data) > self.max_entries:
+            evicted, _ = self._data.popitem(last=False)
+            self.evictions += 1
+            return evicted
+        return None
+
+    def delete(self, key: CacheKey) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class QueryCache:
+    """TTL + LRU read-through cache with tag-based invalidation.
+
+    ``ttls`` maps a namespace (e.g. ``"bill"``) to its time-to-live in
+    seconds; namespaces without an entry use ``default_ttl``. A TTL of 0
+    disables caching for that namespace.
+    """
+
+    def __init__(
+        self,
+        ttls: Optional[Dict[str, float]] = None,
+        default_ttl: float = 60.0,
+        max_entries: int = 2048,
+        backend=None,
+        enabled: bool = True
+    ):
+        self.ttls = dict(ttls or {})
+        self.default_ttl = default_ttl
+        self.enabled = enabled
+        self._backend = backend if backend is not None else LRUCacheBackend(max_entries)
+
+        self._lock = threading.RLock()
+        self._tags: Dict[str, Set[CacheKey]] = {}
+        self._key_tags: Dict[CacheKey, Tuple[str, ...]] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+        # Bumped on every invalidation so a load that raced with a write
+        # is returned to its caller but not stored.
+        self._generation = 0
+
+    def _count(self, namespace: str, field: str, amount: int = 1) -> None:
+        entry = self._stats.setdefault(namespace, {'hits': 0, 'misses': 0, 'invalidations': 0})
+        entry[field] += amount
+
+    def _forget(self, key: CacheKey) -> None:
+        for tag in self._key_tags.pop(key, ()):
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def get_or_load(
+        self,
+        namespace: str,
+        key: Hashable,
+        loader: Callable[[], Any],
+        tags: Iterable[str] = ()
+    ) -> Any:
+        """Return the cached value for ``(namespace, key)`` or load and store it.
+
+        Callers get a copy, so mutating a result never corrupts the cache.
+        ``None`` results (e.g. "not found") are never stored.
+        """
+        ttl = self.ttls.get(namespace, self.default_ttl)
+        if not self.enabled or ttl <= 0:
+            return loader()
+
+        cache_key = (namespace, key)
+        with self._lock:
+            entry = self._backend.get(cache_key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._count(namespace, 'hits')
+                    return copy.deepcopy(value)
+                self._backend.delete(cache_key)
+                self._forget(cache_key)
+            self._count(namespace, 'misses')
+            generation = self._generation
+
+        value = loader()
+
+        with self._lock:
+            if value is None or generation != self._generation:
+                return value
+            evicted = self._backend.set(cache_key, (time.monotonic() + ttl, copy.deepcopy(value)))
+            if evicted is not None:
+                self._forget(evicted)
+            self._forget(cache_key)
+            all_tags = (f"ns:{namespace}",) + tuple(tags)
+            self._key_tags[cache_key] = all_tags
+            for tag in all_tags:
+                self._tags.setdefault(tag, set()).add(cache_key)
+        return value
+
+    def invalidate(self, *tags: str) -> int:
+        """Evict every entry carrying any of ``tags``; returns how many."""
+        removed = 0
+        with self._lock:
+            self._generation += 1
+            for tag in tags:
+                for cache_key in list(self._tags.get(tag, ())):
+                    self._backend.delete(cache_key)
+                    self._forget(cache_key)
+                    self._count(cache_key[0], 'invalidations')
+                    removed += 1
+        if removed:
+            logger.debug(f"Invalidated {removed} cache entries for {tags}")
+        return removed
+
+    def invalidate_namespace(self, namespace: str) -> int:
+        return self.invalidate(f"ns:{namespace}")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._backend.clear()
+            self._tags.clear()
+            self._key_tags.clear()
+
+    def stats(self) -> Dict:
+        """Hit/miss counters per namespace plus overall size and evictions."""
+        with self._lock:
+            namespaces = {ns: dict(counts) for ns, counts in self._stats.items()}
+            size = len(self._key_tags)
+            evictions = getattr(self._backend, 'evictions', 0)
+        hits = sum(c['hits'] for c in namespaces.values())
+        misses = sum(c['misses'] for c in namespaces.values())
+        return {
+            'enabled': self.enabled,
+            'size': size,
+            'evictions': evictions,
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / (hits + misses), 4) if hits + misses else 0.0,
+            'namespaces': namespaces,
+        }
+
+
+def _hashable(value):
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return tuple(_hashable(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _hashable(v)) for k, v in value.items()))
+    return value
+
+
+def cached(namespace: str, tags: Optional[Callable[..., Iterable[str]]] = None):
+    """Serve a DatabaseService read method through ``self.cache``.
+
+    The cache key is built from the bound call arguments, so positional
+    and keyword calls share entries. ``tags`` receives the same
+    arguments as the method and returns the invalidation tags for the
+    result. Place it above ``@retry`` so retries happen inside the load.
+
+    Example:
+        @cached('bill', tags=lambda self, bill_id: (f"bill:{bill_id}",))
+        @retry(max_attempts=3, delay=1, backoff=2)
+        def get_bill_by_id(self, bill_id): ...
+    """
+    def decorator(func: Callable) -> Callable:
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            cache = getattr(self, 'cache', None)
+            if cache is None:
+                return func(self, *args, **kwargs)
+
+            bound = signature.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            arguments = list(bound.arguments.items())[1:]
+            key = (func.__name__,) + tuple(_hashable(v) for _, v in arguments)
+            entry_tags = tags(self, *args, **kwargs) if tags else ()
+
+            return cache.get_or_load(
+                namespace, key, lambda: func(self, *args, **kwargs), entry_tags
+            )
+        return wrapper
+    return decorator
+
+
+def invalidates(tags: Callable[..., Iterable[str]]):
+    """Evict cache entries after a DatabaseService write method returns.
+
+    ``tags`` is called as ``tags(self, result, *args, **kwargs)`` and
+    returns the tags to invalidate (``"ns:<namespace>"`` drops a whole
+    namespace).
+    """
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            result = func(self, *args, **kwargs)
+            cache = getattr(self, 'cache', None)
+            if cache is not None:
+                cache.invalidate(*tags(self, result, *args, **kwargs))
+            return result
+        return wrapper
+    return decorator
+
+
+# Process-wide caches, one per backend, so a write through any
+# DatabaseService instance invalidates reads made through the others.
+_caches: Dict[str, QueryCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_query_cache(key: str, **kwargs) -> QueryCache:
+    """Get or create the shared cache for a backend."""
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = QueryCache(**kwargs)
+            _caches[key] = cache
+        return cache
@@ -0,0 +1,462 @@
+"""
+Per-query instrumentation for DatabaseService.
+
+InstrumentedClient wraps the Supabase client (or the local backend) and
+records every ``execute()``: table or RPC name, method, row count,
+request/response payload bytes, latency and whether it was a retry of a
+query that just failed. Measurements go into in-memory histograms that
+can be dumped as JSON or Prometheus text:
+
+    db.metrics.snapshot()
+    db.metrics.prometheus()
+
+``query_budget`` scopes the queries issued by one request or rerun and
+reports repeated query shapes (same table, method and filter columns),
+which is how N+1 patterns show up:
+
+    with query_budget('webhook:meter-reading') as budget:
+        ...
+    budget.report()  # {'queries': 7, 'suspected_n_plus_one': [...], ...}
+
+On the legacy psycopg2 path the connection pool hands out
+InstrumentedConnection wrappers instead, whose cursors record every
+``execute()`` into the same metrics and budgets. The target, method and
+filter columns are read from the SQL text; response bytes are not
+measured there (rows are fetched after ``execute`` returns).
+"""
+import contextvars
+import json
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.logger import setup_logger
+
+logger = setup_logger('query_metrics')
+
+# Latency bucket upper bounds in seconds (Prometheus ``le`` labels)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_ACTION_METHODS = ('select', 'insert', 'update', 'delete', 'upsert')
+_FILTER_METHODS = (
+    'eq', 'neq', 'gt', 'gte', 'lt', 'lte', 'in_', 'is_', 'like', 'ilike',
+    'contains', 'contained_by', 'match', 'filter', 'or_',
+)
+
+
+def _payload_bytes(value: Any) -> int:
+    if value is None:
+        return 0
+    try:
+        return len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return 0
+
+
+class _Series:
+    """Counters and a latency histogram for one ``(target, method)``."""
+
+    __slots__ = ('calls', 'errors', 'retries', 'rows', 'request_bytes',
+                 'response_bytes', 'latency_sum', 'latency_max', 'buckets')
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.rows = 0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def observe(self, latency: float, rows: int, request_bytes: int,
+                response_bytes: int, error: bool, retry: bool) -> None:
+        self.calls += 1
+        self.errors += int(error)
+        self.retries += int(retry)
+        self.rows += rows
+        self.request_bytes += request_bytes
+        self.response_bytes += response_bytes
+        self.latency_sum += latency
+        self.latency_max = max(self.latency_max, latency)
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if latency <= bound:
+                self.buckets[i] += 1
+                break
+        else:
+            self.buckets[-1] += 1
+
+    def as_dict(self) -> Dict:
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'retries': self.retries,
+            'rows': self.rows,
+            'request_bytes': self.request_bytes,
+            'response_bytes': self.response_bytes,
+            'latency_seconds_sum': round(self.latency_sum, 6),
+            'latency_seconds_max': round(self.latency_max, 6),
+            'latency_seconds_avg': round(self.latency_sum / self.calls, 6) if self.calls else 0.0,
+            'latency_buckets': {
+                **{str(b): n for b, n in zip(LATENCY_BUCKETS, self.buckets)},
+                '+Inf': self.buckets[-1],
+            },
+        }
+
+
+class QueryBudget:
+    """Queries recorded while a ``query_budget`` scope is active."""
+
+    def __init__(self, name: str, max_queries: Optional[int] = None, repeat_threshold: int = 5):
+        self.name = name
+        self.max_queries = max_queries
+        self.repeat_threshold = repeat_threshold
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+        self.queries: List[Dict] = []
+        self._lock = threading.Lock()
+
+    def add(self, entry: Dict) -> None:
+        with self._lock:
+            self.queries.append(entry)
+
+    def report(self) -> Dict:
+        """Totals plus query shapes repeated ``repeat_threshold`` times or more."""
+        with self._lock:
+            queries = list(self.queries)
+        shapes: Dict[Tuple, Dict] = {}
+        for q in queries:
+            entry = shapes.setdefault(q['shape'], {'count': 0, 'latency_seconds': 0.0, 'rows': 0})
+            entry['count'] += 1
+            entry['latency_seconds'] += q['latency']
+            entry['rows'] += q['rows']
+
+        repeated = [
+            {
+                'target': shape[0],
+                'method': shape[1],
+                'filters': list(shape[2]),
+                'count': entry['count'],
+                'latency_seconds': round(entry['latency_seconds'], 6),
+                'rows': entry['rows'],
+            }
+            for shape, entry in shapes.items()
+            if entry['count'] >= self.repeat_threshold
+        ]
+        repeated.sort(key=lambda r: r['count'], reverse=True)
+
+        return {
+            'name': self.name,
+            'queries': len(queries),
+            'distinct_shapes': len(shapes),
+            'latency_seconds': round(sum(q['latency'] for q in queries), 6),
+            'wall_seconds': round(self.elapsed, 6),
+            'rows': sum(q['rows'] for q in queries),
+            'errors': sum(1 for q in queries if q['error']),
+            'retries': sum(1 for q in queries if q['retry']),
+            'over_budget': self.max_queries is not None and len(queries) > self.max_queries,
+            'suspected_n_plus_one': repeated,
+        }
+
+
+_active_budgets: contextvars.ContextVar[Tuple[QueryBudget, ...]] = contextvars.ContextVar(
+    'query_budgets', default=()
+)
+
+
+@contextmanager
+def query_budget(name: str, max_queries: Optional[int] = None, repeat_threshold: int = 5):
+    """Record the queries issued inside the block into a QueryBudget.
+
+    Scopes nest (a query counts towards every active budget). On exit a
+    warning is logged if the budget is exceeded or a query shape repeats
+    ``repeat_threshold`` times or more.
+    """
+    budget = QueryBudget(name, max_queries=max_queries, repeat_threshold=repeat_threshold)
+    token = _active_budgets.set(_active_budgets.get() + (budget,))
+    try:
+        yield budget
+    finally:
+        _active_budgets.reset(token)
+        budget.elapsed = time.perf_counter() - budget.started
+        report = budget.report()
+        if report['over_budget'] or report['suspected_n_plus_one']:
+            logger.warning(
+                f"Query budget '{name}': {report['queries']} queries"
+                f"{f' (budget {max_queries})' if max_queries is not None else ''}; "
+                f"repeated shapes: {report['suspected_n_plus_one']}"
+            )
+
+
+class QueryMetrics:
+    """Thread-safe histograms of query latency, rows and payload bytes."""
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple[str, str], _Series] = {}
+        # Shape of the last failed query per thread; re-issuing the same
+        # shape next counts as a retry (the @retry decorator re-runs the
+        # whole method, so the same query comes around again).
+        self._last_failure = threading.local()
+
+    def record(
+        self,
+        target: str,
+        method: str,
+        latency: float,
+        rows: int = 0,
+        request_bytes: int = 0,
+        response_bytes: int = 0,
+        error: bool = False,
+        filters: Tuple[str, ...] = ()
+    ) -> None:
+        if not self.enabled:
+            return
+        shape = (target, method, filters)
+        retry = getattr(self._last_failure, 'shape', None) == shape
+        self._last_failure.shape = shape if error else None
+
+        with self._lock:
+            series = self._series.get((target, method))
+            if series is None:
+                series = self._series[(target, method)] = _Series()
+            series.observe(latency, rows, request_bytes, response_bytes, error, retry)
+
+        budgets = _active_budgets.get()
+        if budgets:
+            entry = {'shape': shape, 'latency': latency, 'rows': rows, 'error': error, 'retry': retry}
+            for budget in budgets:
+                budget.add(entry)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+    def snapshot(self) -> Dict:
+        """JSON-serialisable dump: ``{"totals": {...}, "queries": {"table.method": {...}}}``."""
+        with self._lock:
+            series = {f"{t}.{m}": s.as_dict() for (t, m), s in sorted(self._series.items())}
+        totals = {
+            key: sum(s[key] for s in series.values())
+            for key in ('calls', 'errors', 'retries', 'rows', 'request_bytes', 'response_bytes')
+        }
+        totals['latency_seconds_sum'] = round(sum(s['latency_seconds_sum'] for s in series.values()), 6)
+        return {'enabled': self.enabled, 'totals': totals, 'queries': series}
+
+    def prometheus(self, prefix: str = 'billing_db') -> str:
+        """Render the histograms in the Prometheus text exposition format."""
+        with self._lock:
+            items = [((t, m), s.as_dict()) for (t, m), s in sorted(self._series.items())]
+
+        lines = [
+            f"# HELP {prefix}_query_duration_seconds Database query latency.",
+            f"# TYPE {prefix}_query_duration_seconds histogram",
+        ]
+        for (target, method), s in items:
+            labels = f'target="{target}",method="{method}"'
+            cumulative = 0
+            for bound in LATENCY_BUCKETS:
+                cumulative += s['latency_buckets'][str(bound)]
+                lines.append(f'{prefix}_query_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            cumulative += s['latency_buckets']['+Inf']
+            lines.append(f'{prefix}_query_duration_seconds_bucket{{{labels},le="+Inf"}} {cumulative}')
+            lines.append(f'{prefix}_query_duration_seconds_sum{{{labels}}} {s["latency_seconds_sum"]}')
+            lines.append(f'{prefix}_query_duration_seconds_count{{{labels}}} {s["calls"]}')
+
+        for name, key, help_text in (
+            ('query_rows_total', 'rows', 'Rows returned or written.'),
+            ('query_request_bytes_total', 'request_bytes', 'Request payload bytes.'),
+            ('query_response_bytes_total', 'response_bytes', 'Response payload bytes.'),
+            ('query_errors_total', 'errors', 'Queries that raised.'),
+            ('query_retries_total', 'retries', 'Queries re-issued after a failure.'),
+        ):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} counter")
+            for (target, method), s in items:
+                lines.append(f'{prefix}_{name}{{target="{target}",method="{method}"}} {s[key]}')
+        return '\n'.join(lines) + '\n'
+
+
+class _InstrumentedQuery:
+    """Proxy over a postgrest request builder that times ``execute()``."""
+
+    def __init__(self, builder, metrics: QueryMetrics, target: str, method: str,
+                 filters: Tuple[str, ...] = (), payload: Any = None):
+        self._builder = builder
+        self._metrics = metrics
+        self._target = target
+        self._method = method
+        self._filters = filters
+        self._payload = payload
+
+    def _wrap(self, result, name: str, args: tuple):
+        # ``not_`` may hand back a negation helper rather than a builder
+        if not hasattr(result, 'execute') and name != 'not_':
+            return result
+        method, filters, payload = self._method, self._filters, self._payload
+        if name in _ACTION_METHODS:
+            method = name
+            if name != 'select' and args:
+                payload = args[0]
+        elif name in _FILTER_METHODS:
+            column = args[0] if args and isinstance(args[0], str) and name != 'or_' else ''
+            filters = filters + (f"{column}.{name}" if column else name,)
+        elif name == 'not_':
+            filters = filters + ('not',)
+        return _InstrumentedQuery(result, self._metrics, self._target, method, filters, payload)
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._builder, name)
+        if not callable(attr):
+            return self._wrap(attr, name, ())
+
+        def call(*args, **kwargs):
+            return self._wrap(attr(*args, **kwargs), name, args)
+        return call
+
+    def execute(self):
+        started = time.perf_counter()
+        try:
+            response = self._builder.execute()
+        except Exception:
+            self._metrics.record(
+                self._target, self._method, time.perf_counter() - started,
+                request_bytes=_payload_bytes(self._payload), error=True, filters=self._filters
+            )
+            raise
+        latency = time.perf_counter() - started
+        data = getattr(response, 'data', None)
+        rows = len(data) if isinstance(data, list) else int(data is not None)
+        self._metrics.record(
+            self._target, self._method, latency, rows=rows,
+            request_bytes=_payload_bytes(self._payload),
+            response_bytes=_payload_bytes(data), filters=self._filters
+        )
+        return response
+
+
+class InstrumentedClient:
+    """Drop-in wrapper for a Supabase client that records every query."""
+
+    def __init__(self, client, metrics: QueryMetrics):
+        self._client = client
+        self.metrics = metrics
+
+    def table(self, name: str):
+        return _InstrumentedQuery(self._client.table(name), self.metrics, name, 'select')
+
+    from_ = table
+
+    def rpc(self, name: str, params: Optional[Dict] = None, *args, **kwargs):
+        return _InstrumentedQuery(
+            self._client.rpc(name, params, *args, **kwargs), self.metrics,
+            f"rpc:{name}", 'rpc', payload=params
+        )
+
+    def __getattr__(self, name: str):
+        return getattr(self._client, name)
+
+
+_SQL_TARGET = re.compile(r'\b(?:from|into|update)\s+("?[\w.]+"?)', re.IGNORECASE)
+_SQL_WHERE = re.compile(
+    r'\bwhere\b(.*?)(?:\bgroup\s+by\b|\border\s+by\b|\blimit\b|\breturning\b|\bon\s+conflict\b|$)',
+    re.IGNORECASE
+)
+_SQL_FILTER_COLUMN = re.compile(
+    r'([A-Za-z_][\w.]*)\s*(?:=|<>|!=|<=|>=|<|>|\bin\b|\bbetween\b|\bi?like\b|\bis\b)',
+    re.IGNORECASE
+)
+
+
+def _sql_shape(sql: Any) -> Tuple[str, str, Tuple[str, ...]]:
+    """``(table, statement keyword, filter columns)`` of a SQL statement"""
+    if isinstance(sql, bytes):
+        sql = sql.decode('utf-8', 'replace')
+    text = ' '.join(str(sql).split())
+    method = text.split(' ', 1)[0].lower() if text else 'execute'
+    target = _SQL_TARGET.search(text)
+    where = _SQL_WHERE.search(text)
+    filters = tuple(sorted({
+        column.lower() for column in _SQL_FILTER_COLUMN.findall(where.group(1))
+    })) if where else ()
+    return (target.group(1).strip('"') if target else 'sql'), method, filters
+
+
+class _InstrumentedCursor:
+    """Proxy over a DB-API cursor that times ``execute()``/``executemany()``."""
+
+    def __init__(self, cursor, metrics: QueryMetrics):
+        self._cursor = cursor
+        self._metrics = metrics
+
+    def _timed(self, run, sql, params):
+        target, method, filters = _sql_shape(sql)
+        started = time.perf_counter()
+        try:
+            result = run()
+        except Exception:
+            self._metrics.record(
+                target, method, time.perf_counter() - started,
+                request_bytes=_payload_bytes(params), error=True, filters=filters
+            )
+            raise
+        self._metrics.record(
+            target, method, time.perf_counter() - started,
+            rows=max(getattr(self._cursor, 'rowcount', 0) or 0, 0),
+            request_bytes=_payload_bytes(params), filters=filters
+        )
+        return result
+
+    def execute(self, sql, params=None):
+        return self._timed(lambda: self._cursor.execute(sql, params), sql, params)
+
+    def executemany(self, sql, params_seq):
+        params_seq = list(params_seq)
+        return self._timed(lambda: self._cursor.executemany(sql, params_seq), sql, params_seq)
+
+    def __enter__(self):
+        self._cursor.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        return self._cursor.__exit__(*exc)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name: str):
+        return getattr(self._cursor, name)
+
+
+class InstrumentedConnection:
+    """Drop-in wrapper for a DB-API connection whose cursors record every query."""
+
+    def __init__(self, conn, metrics: QueryMetrics):
+        self._conn = conn
+        self.metrics = metrics
+
+    def cursor(self, *args, **kwargs):
+        return _InstrumentedCursor(self._conn.cursor(*args, **kwargs), self.metrics)
+
+    def __getattr__(self, name: str):
+        return getattr(self._conn, name)
+
+
+# Process-wide metrics, one per backend, so every DatabaseService
+# instance reports into the same histograms.
+_metrics: Dict[str, QueryMetrics] = {}
+_metrics_lock = threading.Lock()
+
+
+def get_query_metrics(key: str, **kwargs) -> QueryMetrics:
+    """Get or create the shared metrics for a backend."""
+    with _metrics_lock:
+        metrics = _metrics.get(key)
+        if metrics is None:
+            metrics = QueryMetrics(**kwargs)
+            _metrics[key] = metrics
+        return metrics
@@ -4,44 +4,130 @@ Uses APScheduler for scheduled jobs
 """
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
-from datetime import datetime, timedelta
-from typing import List, Dict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from contextlib import ExitStack
+import functools
+import multiprocessing
+import time
+from datetime import date, datetime, timedelta
+from typing import List, Dict, Optional, Tuple
 import logging
 
+from config import Config
 from services import DatabaseService, TariffRules, AIAgentService, PaymentService
+from services.billing_pipeline import Stage, StagedPipeline, merge_reports
+from services.billing_shards import shard_by_block
 from services.discord_service import DiscordService
+from services.job_history import ItemTimer, build_job_run, job_trend
+from services.leader_election import LeaderElector, create_scheduler_lease
+from services.meter_collector import MeterCollector
 from utils.logger import setup_logger, LogContext
 
 logger = setup_logger('billing_scheduler')
 
+MONTHLY_BILLING_JOB = 'monthly_bill_generation'
+
+# Per-meter checkpoint states of a billing run, in pipeline order, and
+# the states a resumed run leaves alone
+RUN_ITEM_STATES = ('pending', 'billed', 'linked', 'notified')
+RUN_ITEM_FINAL_STATES = ('notified', 'skipped')
+
+# Reminders go out for bills due within this many days (the pending-bill
+# window is everything due up to today + DUE_WINDOW_DAYS, overdue included).
+DUE_WINDOW_DAYS = 3
+
 
 class BillingScheduler:
     """Automated billing cycle scheduler"""
     
     def __init__(self):
         self.scheduler = BackgroundScheduler()
+        self._init_services()
+        
+        # Every process schedules the jobs, but only the lease holder runs
+        # them (one run per job across gunicorn workers)
+        lease = create_scheduler_lease()
+        self.elector = LeaderElector(lease, lease_seconds=Config.SCHEDULER_LEASE_SECONDS) if lease else None
+        
+        logger.info("Billing scheduler initialized")
+    
+    def _init_services(self) -> None:
         self.db = DatabaseService()
         self.ai_service = AIAgentService()
         self.payment_service = PaymentService()
         self.discord_service = DiscordService()
         self.tariff_calculator = TariffRules()
-        
-        logger.info("Billing scheduler initialized")
+    
+    @classmethod
+    def for_billing_worker(cls) -> 'BillingScheduler':
+        """Services only (no APScheduler, no leader election), for shard processes"""
+        worker = cls.__new__(cls)
+        worker.scheduler = None
+        worker.elector = None
+        worker._init_services()
+        return worker
+    
+    def _leader_only(self, job_id: str, func):
+        """Wrap a cron job so it runs only in the leader process"""
+        @functools.wraps(func)
+        def run(*args, **kwargs):
+            if self.elector is not None:
+                # The cron triggers all fire on whole minutes, so the
+                # minute the job fired in names the firing in every process
+                fired_at = datetime.now().replace(second=0, microsecond=0)
+                # A follower keeps trying for one lease period, so it takes
+                # over a job whose leader died just before it was due.
+                timeout = self.elector.lease_seconds + self.elector.renew_interval
+                if not self.elector.wait_for_leadership(timeout):
+                    logger.info(f"Skipping {job_id}: scheduler leader is {self.elector.status()['leader']}")
+                    return {"success": True, "skipped": True, "reason": "not leader"}
+                # A leader that ran this firing and then shut down hands
+                # the lease over inside that wait; its claim stops a rerun
+                if not self.elector.claim_firing(f"{job_id}@{fired_at.isoformat()}"):
+                    logger.info(f"Skipping {job_id}: firing at {fired_at} already claimed")
+                    return {"success": True, "skipped": True, "reason": "already run"}
+            return self._run_recorded(job_id, 'cron', func, *args, **kwargs)
+        return run
+    
+    def _run_recorded(self, job_id: str, trigger: str, func, *args, **kwargs):
+        """Run a job and store its execution in the run history"""
+        started_at = datetime.now()
+        result, error = None, None
+        try:
+            result = func(*args, **kwargs)
+            return result
+        except Exception as e:
+            error = str(e)
+            raise
+        finally:
+            run = build_job_run(job_id, trigger, started_at, datetime.now(), result, error)
+            try:
+                self.db.record_job_run(run)
+            except Exception as e:
+                logger.error(f"Could not record run of {job_id}: {e}")
+            logger.info(
+                f"Job {job_id} {run['status']} in {run['duration_seconds']}s: "
+                f"{run['items_processed']} items, {run['items_failed']} failed, "
+                f"p50 {run['latency_p50_ms']}ms p99 {run['latency_p99_ms']}ms"
+            )
     
     def start(self):
         """Start the scheduler"""
+        if self.elector is not None:
+            self.elector.start()
+        
         # Monthly bill generation - 1st of every month at 2:00 AM
         self.scheduler.add_job(
-            self.generate_monthly_bills,
+            self._leader_only(MONTHLY_BILLING_JOB, self.generate_monthly_bills),
             trigger=CronTrigger(day=1, hour=2, minute=0),
-            id='monthly_bill_generation',
+            id=MONTHLY_BILLING_JOB,
             name='Generate Monthly Bills',
             replace_existing=True
         )
         
         # Payment reminder - Daily at 10:00 AM
         self.scheduler.add_job(
-            self.send_payment_reminders,
+            self._leader_only('payment_reminders', self.send_payment_reminders),
             trigger=CronTrigger(hour=10, minute=0),
             id='payment_reminders',
             name='Send Payment Reminders',
@@ -50,7 +136,7 @@ class BillingScheduler:
         
         # Overdue bill check - Daily at 11:00 AM
         self.scheduler.add_job(
-            self.mark_overdue_bills,
+            self._leader_only('overdue_bills', self.mark_overdue_bills),
             trigger=CronTrigger(hour=11, minute=0),
             id='overdue_bills',
             name='Mark Overdue Bills',
@@ -59,7 +145,7 @@ class BillingScheduler:
         
         # Meter reading collection - Every Sunday at 8:00 AM
         self.scheduler.add_job(
-            self.collect_meter_readings,
+            self._leader_only('meter_reading_collection', self.collect_meter_readings),
             trigger=CronTrigger(day_of_week='sun', hour=8, minute=0),
             id='meter_reading_collection',
             name='Collect Meter Readings',
@@ -73,8 +159,17 @@ class BillingScheduler:
     def stop(self):
         """Stop the scheduler"""
         self.scheduler.shutdown()
+        if self.elector is not None:
+            # Hand the lease back so another worker takes over right away
+            self.elector.stop()
         logger.info("Billing scheduler stopped")
     
+    def leader_status(self) -> Dict:
+        """Which process holds the scheduler lease"""
+        if self.elector is None:
+            return {"is_leader": True, "leader": None, "backend": None}
+        return self.elector.status()
+    
     def _log_scheduled_jobs(self):
         """Log all scheduled jobs"""
         jobs = self.scheduler.get_jobs()
@@ -82,48 +177,247 @@ class BillingScheduler:
         for job in jobs:
             logger.info(f"  - {job.name}: {job.next_run_time}")
     
-    def generate_monthly_bills(self):
+    def generate_monthly_bills(self, resume: bool = True):
         """
         Generate bills for all active meters
         Runs on 1st of every month at 2:00 AM
+
+        Meters flow through a staged pipeline (history read, calculate,
+        bill insert, Stripe payment link, notification), each stage with
+        its own bounded concurrency, so the run takes about as long as
+        its slowest stage rather than the sum of all of them.
+
+        Every run is recorded in ``billing_runs`` with a checkpoint per
+        meter (pending -> billed -> linked -> notified). With ``resume``
+        an unfinished run for the current period is continued: notified
+        meters are left alone and the rest pick up after their last
+        completed stage. Meters added after a run completed are billed
+        by reopening it. ``resume=False`` starts a new run; bills and
+        payment links from earlier runs of the period are still reused
+        through the per-meter idempotency keys (reported as
+        ``bills_reused``, and not notified again). Meters without enough
+        readings are reported as ``bills_skipped``, not as failures.
         """
         with LogContext(logger, "Generate monthly bills"):
             try:
                 # Get all active meters (this would come from a meters table)
                 # For now, using sample data
                 active_meters = self._get_active_meters()
+                period = datetime.now().strftime('%Y-%m')
                 
-                logger.info(f"Generating bills for {len(active_meters)} active meters")
+                run, items = self._open_billing_run(period, active_meters, resume)
+                if run['status'] == 'completed':
+                    logger.info(f"Billing run {run['id']} for {period} already completed; no new meters to bill")
+                    return {
+                        "success": True,
+                        "run_id": run['id'],
+                        "period": period,
+                        "already_completed": True,
+                        "bills_generated": 0,
+                        "bills_reused": 0,
+                        "total_meters": len(active_meters),
+                        "items_processed": 0,
+                        "items_failed": 0
+                    }
                 
-                bills_generated = 0
-                bills_failed = 0
+                meters_by_id = {str(meter['meter_id']): meter for meter in active_meters}
+                jobs = [
+                    self._job_from_checkpoint(meters_by_id[item['meter_id']], item)
+                    for item in items
+                    if item['state'] not in RUN_ITEM_FINAL_STATES and item['meter_id'] in meters_by_id
+                ]
                 
-                for meter in active_meters:
-                    try:
-                        bill = self._generate_bill_for_meter(meter)
-                        if bill:
-                            bills_generated += 1
-                            logger.info(f"Bill generated for meter {meter['meter_id']}: ₹{bill['amount']}")
-                        else:
-                            bills_failed += 1
-                            logger.warning(f"Failed to generate bill for meter {meter['meter_id']}")
-                    except Exception as e:
-                        bills_failed += 1
-                        logger.error(f"Error generating bill for meter {meter['meter_id']}: {e}")
+                logger.info(
+                    f"Generating bills for {len(jobs)} of {len(active_meters)} active meters "
+                    f"(run {run['id']}, {period}, attempt {run.get('attempts', 1)})"
+                )
+                
+                processes = min(Config.BILLING_SHARD_PROCESSES, len(jobs))
+                if processes > 1 and len(jobs) >= Config.BILLING_SHARD_MIN_METERS:
+                    bills, report = self._run_billing_shards(jobs, processes)
+                else:
+                    bills, report = self._run_billing_jobs(jobs)
+                bills_reused = sum(1 for bill in bills if bill.get('reused'))
+                bills_generated = len(bills) - bills_reused
+                # Meters dropped by a stage (not enough readings) are
+                # skipped, not failed; failed covers stage errors and
+                # the meters of a shard that did not finish
+                bills_skipped = sum(stage['dropped'] for stage in report['stages'])
+                bills_failed = len(jobs) - len(bills) - bills_skipped
+                
+                for stage in report['stages']:
+                    logger.info(
+                        f"  stage {stage['stage']}: {stage['processed']} ok, {stage['dropped']} skipped, "
+                        f"{stage['failed']} failed, avg {stage['avg_ms']}ms, "
+                        f"utilisation {stage['utilisation']:.0%}"
+                    )
                 
-                logger.info(f"Monthly billing completed: {bills_generated} generated, {bills_failed} failed")
+                states = self._close_billing_run(run, report)
+                logger.info(
+                    f"Monthly billing completed: {bills_generated} generated, {bills_reused} reused, "
+                    f"{bills_skipped} skipped, {bills_failed} failed "
+                    f"in {report['wall_seconds']}s (bottleneck: {report['bottleneck']}); run states {states}"
+                )
                 
                 return {
                     "success": True,
+                    "run_id": run['id'],
+                    "period": period,
                     "bills_generated": bills_generated,
+                    "bills_reused": bills_reused,
+                    "bills_skipped": bills_skipped,
                     "bills_failed": bills_failed,
-                    "total_meters": len(active_meters)
+                    "meters_already_done": len(active_meters) - len(jobs),
+                    "total_meters": len(active_meters),
+                    "run_states": states,
+                    "items_processed": len(bills),
+                    "items_failed": bills_failed,
+                    "item_latency_ms": report['item_latency_ms'],
+                    "pipeline": report
                 }
                 
             except Exception as e:
                 logger.error(f"Monthly billing job failed: {e}", exc_info=True)
                 return {"success": False, "error": str(e)}
     
+    def _run_billing_jobs(self, jobs: List[Dict], samples: bool = False) -> Tuple[List[Dict], Dict]:
+        """Run jobs through one billing pipeline; returns (bills, report)"""
+        pipeline = self._build_billing_pipeline()
+        bills = pipeline.run(jobs)
+        return bills, pipeline.report(samples=samples)
+    
+    def _run_billing_shards(self, jobs: List[Dict], processes: int) -> Tuple[List[Dict], Dict]:
+        """Split jobs by block across worker processes and merge their reports.
+
+        Each process has its own services and connections and runs the
+        full pipeline (read, calculate, write, payment, notify) for its
+        blocks; checkpoints go to the shared billing run, so a crashed
+        shard is picked up by the next resumed run. A failed shard is
+        logged and listed with its ``error`` in ``report['shards']``; the
+        other shards' bills and reports are kept.
+        """
+        # Meter numbers map to blocks through the identity registry
+        self.db.identity.meters()
+        shards = shard_by_block(jobs, processes)
+        logger.info(
+            f"Billing {len(jobs)} meters in {len(shards)} processes: "
+            + ", ".join(f"{len(shard_jobs)} meters/{len(blocks)} blocks" for blocks, shard_jobs in shards)
+        )
+        
+        started = time.perf_counter()
+        results: Dict[int, Tuple[List[Dict], Dict]] = {}
+        errors: Dict[int, str] = {}
+        # One single-process pool per shard: a worker that dies breaks
+        # only its own pool, so the other shards run to completion.
+        # spawn: workers must not inherit this process's scheduler,
+        # pool and audit threads
+        with ExitStack() as stack:
+            futures = {}
+            for index, (_, shard_jobs) in enumerate(shards):
+                try:
+                    executor = stack.enter_context(ProcessPoolExecutor(
+                        max_workers=1,
+                        mp_context=multiprocessing.get_context('spawn'),
+                        initializer=_init_billing_worker
+                    ))
+                    futures[executor.submit(_run_billing_shard, shard_jobs)] = index
+                except Exception as e:
+                    errors[index] = f"{type(e).__name__}: {e}"
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    results[index] = future.result()
+                except Exception as e:
+                    errors[index] = f"{type(e).__name__}: {e}"
+        wall_seconds = time.perf_counter() - started
+        
+        for index, error in sorted(errors.items()):
+            blocks, shard_jobs = shards[index]
+            logger.error(
+                f"Billing shard {index} ({len(shard_jobs)} meters, blocks {', '.join(blocks)}) failed: {error}; "
+                f"its meters stay pending for the next resumed run"
+            )
+        
+        report = merge_reports([results[index][1] for index in sorted(results)], wall_seconds)
+        report['shards'] = []
+        for index, (blocks, shard_jobs) in enumerate(shards):
+            shard_bills, shard_report = results.get(index, ([], {}))
+            report['shards'].append({
+                "shard": index,
+                "blocks": blocks,
+                "meters": len(shard_jobs),
+                "bills": len(shard_bills),
+                "wall_seconds": shard_report.get('wall_seconds'),
+                "bottleneck": shard_report.get('bottleneck'),
+                "error": errors.get(index),
+            })
+        report['shards_failed'] = len(errors)
+        return [bill for index in sorted(results) for bill in results[index][0]], report
+    
+    def _open_billing_run(self, period: str, meters: List[Dict], resume: bool):
+        """Resume the latest run for the period, or start a new one.
+
+        Returns ``(run, items)`` with one checkpoint row per active meter;
+        meters that appeared since the run started are added as pending,
+        which reopens a completed run. A completed run with no new meters
+        is returned as is.
+        """
+        run = self.db.get_latest_billing_run(MONTHLY_BILLING_JOB, period) if resume else None
+        items = self.db.get_billing_run_items(run['id']) if run is not None else []
+        
+        known = {item['meter_id'] for item in items}
+        missing = [
+            {
+                'meter_id': str(meter['meter_id']),
+                'idempotency_key': f"{MONTHLY_BILLING_JOB}:{period}:{meter['meter_id']}"
+            }
+            for meter in meters if str(meter['meter_id']) not in known
+        ]
+        if run is not None and run['status'] == 'completed' and not missing:
+            return run, items
+        
+        if run is not None:
+            attempts = int(run.get('attempts') or 1) + 1
+            action = 'Reopening completed' if run['status'] == 'completed' else 'Resuming'
+            run = self.db.update_billing_run(run['id'], {'status': 'running', 'attempts': attempts}) or run
+            logger.info(
+                f"{action} billing run {run['id']} for {period} (attempt {attempts}, {len(missing)} new meters)"
+            )
+        else:
+            run = self.db.create_billing_run(MONTHLY_BILLING_JOB, period)
+            logger.info(f"Started billing run {run['id']} for {period}")
+        
+        items.extend(self.db.add_billing_run_items(run['id'], missing))
+        return run, items
+    
+    def _close_billing_run(self, run: Dict, report: Dict) -> Dict[str, int]:
+        """Record the outcome; the run stays resumable unless every meter is done"""
+        states: Dict[str, int] = {}
+        for item in self.db.get_billing_run_items(run['id']):
+            states[item['state']] = states.get(item['state'], 0) + 1
+        finished = all(state in RUN_ITEM_FINAL_STATES for state in states)
+        self.db.update_billing_run(run['id'], {
+            'status': 'completed' if finished else 'incomplete',
+            'finished_at': datetime.now().isoformat(),
+            'summary': {
+                'states': states,
+                'wall_seconds': report['wall_seconds'],
+                'bottleneck': report['bottleneck'],
+            },
+        })
+        return states
+    
+    def _build_billing_pipeline(self) -> StagedPipeline:
+        """Stages of one meter's bill, with per-stage worker counts from Config"""
+        stage = self._record_stage_errors
+        return StagedPipeline([
+            Stage('read', stage(self._read_meter_history), workers=Config.BILLING_PIPELINE_READ_WORKERS),
+            Stage('calculate', stage(self._calculate_meter_bill), workers=1),
+            Stage('write', stage(self._store_meter_bill), workers=Config.BILLING_PIPELINE_WRITE_WORKERS),
+            Stage('payment', stage(self._link_meter_bill), workers=Config.BILLING_PIPELINE_PAYMENT_WORKERS),
+            Stage('notify', stage(self._notify_meter_bill), workers=Config.BILLING_PIPELINE_NOTIFY_WORKERS),
+        ], queue_size=Config.BILLING_PIPELINE_QUEUE_SIZE)
+    
     def send_payment_reminders(self):
         """
         Send payment reminders for pending bills
@@ -132,23 +426,30 @@ class BillingScheduler:
         with LogContext(logger, "Send payment reminders"):
             try:
                 # Get pending bills due in next 3 days
-                upcoming_bills = self._get_upcoming_due_bills(days=3)
+                upcoming_bills = self._get_upcoming_due_bills(days=DUE_WINDOW_DAYS)
                 
                 logger.info(f"Sending reminders for {len(upcoming_bills)} upcoming bills")
                 
                 reminders_sent = 0
                 reminders_failed = 0
+                timer = ItemTimer()
                 
                 for bill in upcoming_bills:
+                    item_started = time.perf_counter()
+                    sent = False
                     try:
                         # Generate reminder message
-                        days_until_due = self._calculate_days_until_due(bill['billing_period_end'])
+                        customer_id = self._bill_customer_id(bill)
+                        amount = float(bill.get('amount', bill.get('total_amount')) or 0)
+                        consumption = bill.get('consumption_kwh', bill.get('total_units'))
+                        due_date = str(bill['due_date'])[:10]
+                        days_until_due = self._calculate_days_until_due(due_date)
                         
                         if self.ai_service.enabled:
                             message = self.ai_service.generate_notification_message(
-                                customer_id=bill['customer_id'],
-                                bill_amount=bill['amount'],
-                                consumption_kwh=bill['consumption_kwh'],
+                                customer_id=customer_id,
+                                bill_amount=amount,
+                                consumption_kwh=consumption,
                                 payment_link=bill.get('payment_link', '')
                             )
                         else:
@@ -156,9 +457,9 @@ class BillingScheduler:
 
 Your electricity bill is due in {days_until_due} days.
 
-Bill Amount: ₹{bill['amount']:.2f}
-Consumption: {bill['consumption_kwh']} kWh
-Due Date: {bill['billing_period_end']}
+Bill Amount: ₹{amount:.2f}
+Consumption: {consumption} kWh
+Due Date: {due_date}
 
 Pay now: {bill.get('payment_link', 'N/A')}
 
@@ -166,21 +467,22 @@ Avoid late fees - pay today!"""
                         
                         # Send reminder
                         result = self.discord_service.send_payment_reminder(
-                            customer_id=bill['customer_id'],
+                            customer_id=customer_id,
                             bill_id=str(bill['id']),
-                            amount=bill['amount'],
-                            due_date=bill['billing_period_end'],
+                            amount=amount,
+                            due_date=due_date,
                             days_until_due=days_until_due,
                             payment_link=bill.get('payment_link', '')
                         )
                         
                         if result.get('success'):
                             reminders_sent += 1
+                            sent = True
                             
                             # Log notification
                             self.db.log_notification({
                                 'bill_id': bill['id'],
-                                'customer_id': bill['customer_id'],
+                                'customer_id': customer_id,
                                 'channel': 'discord',
                                 'message': f"Payment reminder for bill {bill['id']}",
                                 'status': 'sent',
@@ -192,6 +494,8 @@ Avoid late fees - pay today!"""
                     except Exception as e:
                         reminders_failed += 1
                         logger.error(f"Error sending reminder for bill {bill['id']}: {e}")
+                    
+                    timer.add(time.perf_counter() - item_started, failed=not sent)
                 
                 logger.info(f"Payment reminders completed: {reminders_sent} sent, {reminders_failed} failed")
                 
@@ -199,7 +503,8 @@ Avoid late fees - pay today!"""
                     "success": True,
                     "reminders_sent": reminders_sent,
                     "reminders_failed": reminders_failed,
-                    "total_bills": len(upcoming_bills)
+                    "total_bills": len(upcoming_bills),
+                    **timer.summary()
                 }
                 
             except Exception as e:
@@ -213,54 +518,78 @@ Avoid late fees - pay today!"""
         """
         with LogContext(logger, "Mark overdue bills"):
             try:
-                # Get pending bills past due date
-                overdue_bills = self._get_overdue_bills()
-                
-                logger.info(f"Marking {len(overdue_bills)} bills as overdue")
+                # One set-based UPDATE selects and moves every pending bill
+                # past its due date and returns the rows, so notices need
+                # no re-read.
+                overdue_bills = self.db.mark_overdue_bills()
                 
-                bills_marked = 0
-                bills_failed = 0
+                logger.info(f"Marked {len(overdue_bills)} bills as overdue")
                 
-                for bill in overdue_bills:
-                    try:
-                        # Update bill status to overdue
-                        self.db.update_bill_status(
-                            bill_id=bill['id'],
-                            status='overdue'
-                        )
-                        bills_marked += 1
-                        
-                        # Send overdue notification
-                        days_overdue = self._calculate_days_overdue(bill['billing_period_end'])
-                        result = self.discord_service.send_overdue_notice(
-                            customer_id=bill['customer_id'],
-                            bill_id=str(bill['id']),
-                            amount=bill['amount'],
-                            days_overdue=days_overdue,
-                            late_fee=0.0  # Calculate late fee if needed
-                        )
-                        
-                    except Exception as e:
-                        bills_failed += 1
-                        logger.error(f"Error marking bill {bill['id']} as overdue: {e}")
+                timer = ItemTimer()
+                results = self._send_overdue_notices(overdue_bills, timer=timer)
+                notices_failed = sum(1 for r in results if not r.get('success'))
                 
-                logger.info(f"Overdue marking completed: {bills_marked} marked, {bills_failed} failed")
+                logger.info(
+                    f"Overdue marking completed: {len(overdue_bills)} marked, "
+                    f"{notices_failed} notices failed"
+                )
                 
                 return {
                     "success": True,
-                    "bills_marked": bills_marked,
-                    "bills_failed": bills_failed,
-                    "total_bills": len(overdue_bills)
+                    "bills_marked": len(overdue_bills),
+                    "notices_sent": len(results) - notices_failed,
+                    "notices_failed": notices_failed,
+                    "total_bills": len(overdue_bills),
+                    **timer.summary()
                 }
                 
             except Exception as e:
                 logger.error(f"Overdue billing job failed: {e}", exc_info=True)
                 return {"success": False, "error": str(e)}
     
+    def _send_overdue_notices(
+        self,
+        bills: List[Dict],
+        max_workers: int = 4,
+        timer: Optional[ItemTimer] = None
+    ) -> List[Dict]:
+        """Send overdue notices for a batch of bills on a small thread pool"""
+        if not bills:
+            return []
+        
+        def notify(bill):
+            started = time.perf_counter()
+            result = send(bill)
+            if timer is not None:
+                timer.add(time.perf_counter() - started, failed=not result.get('success'))
+            return result
+        
+        def send(bill):
+            try:
+                return self.discord_service.send_overdue_notice(
+                    customer_id=self._bill_customer_id(bill),
+                    bill_id=str(bill['id']),
+                    amount=float(bill.get('amount', bill.get('total_amount')) or 0),
+                    days_overdue=self._calculate_days_overdue(
+                        str(bill.get('due_date') or bill.get('billing_period_end') or '')
+                    ),
+                    late_fee=0.0  # Calculate late fee if needed
+                )
+            except Exception as e:
+                logger.error(f"Error sending overdue notice for bill {bill.get('id')}: {e}")
+                return {"success": False, "error": str(e)}
+        
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(bills))) as executor:
+            return list(executor.map(notify, bills))
+    
     def collect_meter_readings(self):
         """
         Collect meter readings from smart meters
         Runs every Sunday at 8:00 AM
+
+        Meters are polled concurrently (MeterCollector: bounded
+        concurrency, per-host rate limit, timeouts, jittered retries)
+        and the readings are stored with one bulk insert.
         """
         with LogContext(logger, "Collect meter readings"):
             try:
@@ -269,24 +598,25 @@ Avoid late fees - pay today!"""
                 
                 logger.info(f"Collecting readings from {len(smart_meters)} smart meters")
                 
-                readings_collected = 0
-                readings_failed = 0
+                collector = MeterCollector(
+                    concurrency=Config.SMART_METER_POLL_CONCURRENCY,
+                    per_host_rate=Config.SMART_METER_POLL_RATE_PER_HOST,
+                    timeout=Config.SMART_METER_POLL_TIMEOUT_SECONDS,
+                    max_attempts=Config.SMART_METER_POLL_MAX_ATTEMPTS
+                )
+                outcomes = collector.collect(smart_meters)
+                readings = [o['reading'] for o in outcomes if o['status'] == 'ok']
                 
-                for meter in smart_meters:
-                    try:
-                        # In production, this would call actual smart meter API
-                        # For now, simulate reading collection
-                        reading = self._simulate_meter_reading(meter)
-                        
-                        if reading:
-                            readings_collected += 1
-                            logger.info(f"Reading collected from meter {meter['meter_id']}: {reading['value']} kWh")
-                        else:
-                            readings_failed += 1
-                        
-                    except Exception as e:
-                        readings_failed += 1
-                        logger.error(f"Error collecting reading from meter {meter['meter_id']}: {e}")
+                stored = self.db.insert_meter_readings_bulk(readings) if readings else []
+                readings_collected = sum(1 for o in stored if o and o.get('status') == 'created')
+                readings_failed = len(smart_meters) - readings_collected
+                for outcome in stored:
+                    if outcome and outcome.get('status') != 'created':
+                        logger.error(f"Could not store reading {readings[outcome['index']]}: {outcome.get('message')}")
+                
+                timer = ItemTimer()
+                for outcome in outcomes:
+                    timer.add(outcome['seconds'], failed=outcome['status'] != 'ok')
                 
                 logger.info(f"Meter reading collection completed: {readings_collected} collected, {readings_failed} failed")
                 
@@ -294,7 +624,12 @@ Avoid late fees - pay today!"""
                     "success": True,
                     "readings_collected": readings_collected,
                     "readings_failed": readings_failed,
-                    "total_meters": len(smart_meters)
+                    "total_meters": len(smart_meters),
+                    "poll_errors": [
+                        {"meter_id": o['meter_id'], "error": o['error'], "attempts": o['attempts']}
+                        for o in outcomes if o['status'] != 'ok'
+                    ][:50],
+                    **timer.summary()
                 }
                 
             except Exception as e:
@@ -327,113 +662,235 @@ Avoid late fees - pay today!"""
         ]
     
     def _generate_bill_for_meter(self, meter: Dict) -> Dict:
-        """Generate a bill for a specific meter"""
+        """Generate a bill for a specific meter (all pipeline stages in sequence)"""
         try:
-            # Get latest reading
-            readings = self.db.get_historical_readings(meter['meter_id'], limit=2)
-            
-            if len(readings) < 2:
-                logger.warning(f"Not enough readings for meter {meter['meter_id']}")
-                return None
-            
-            current_reading = readings[0]['reading_value']
-            previous_reading = readings[1]['reading_value']
-            
-            # Calculate bill
-            bill_calculation = self.ai_service.calculate_bill(
-                current_reading=current_reading,
-                previous_reading=previous_reading,
-                meter_id=meter['meter_id'],
-                customer_id=meter['customer_id'],
-                connected_load_kw=meter.get('connected_load_kw', 7.0),
-                tariff_type=meter.get('tariff_type', 'residential')
-            )
+            job = {"meter": meter}
+            for step in (
+                self._read_meter_history,
+                self._calculate_meter_bill,
+                self._store_meter_bill,
+                self._link_meter_bill,
+                self._notify_meter_bill,
+            ):
+                job = step(job)
+                if job is None:
+                    return None
+            return job
             
-            # Create bill in database
-            bill_data = {
-                "customer_id": meter['customer_id'],
-                "meter_id": meter['meter_id'],
-                "billing_period_start": readings[1]['reading_date'],
-                "billing_period_end": readings[0]['reading_date'],
-                "consumption_kwh": bill_calculation['consumption_kwh'],
-                "amount": bill_calculation['total_amount'],
-                "status": "pending",
-                "created_at": datetime.now().isoformat()
+        except Exception as e:
+            logger.error(f"Error generating bill for meter {meter['meter_id']}: {e}")
+            return None
+    
+    # Billing pipeline stages. Each takes the job dict built so far and
+    # returns it for the next stage, or None to skip the meter. Jobs of
+    # a billing run carry their checkpoint row as job['item']; stages the
+    # meter already passed in an earlier attempt are skipped.
+    
+    @staticmethod
+    def _job_from_checkpoint(meter: Dict, item: Dict) -> Dict:
+        job = {"meter": meter, "item": item}
+        if item.get('bill_id') is not None:
+            job['bill'] = {"id": item['bill_id']}
+            job['amount'] = float(item.get('amount') or 0)
+            job['due_date'] = str(item.get('due_date') or '')
+        if item.get('payment_link_id'):
+            job['payment_link'] = {"url": item.get('payment_link'), "id": item['payment_link_id']}
+        return job
+    
+    @staticmethod
+    def _reached(job: Dict, state: str) -> bool:
+        """True when the meter's checkpoint is already at or past ``state``"""
+        item = job.get('item')
+        if item is None or item['state'] not in RUN_ITEM_STATES:
+            return False
+        return RUN_ITEM_STATES.index(item['state']) >= RUN_ITEM_STATES.index(state)
+    
+    def _checkpoint(self, job: Dict, state: str = None, **fields) -> None:
+        """Persist a meter's progress (no-op outside a billing run)"""
+        item = job.get('item')
+        if item is None:
+            return
+        if state:
+            fields['state'] = state
+        self.db.update_billing_run_item(item['id'], fields)
+        item.update(fields)
+    
+    def _record_stage_errors(self, step):
+        """Store a stage's exception on the meter's checkpoint, then re-raise"""
+        def run(job: Dict) -> Dict:
+            try:
+                return step(job)
+            except Exception as e:
+                try:
+                    self._checkpoint(job, error=str(e)[:500])
+                except Exception as checkpoint_error:
+                    logger.error(f"Could not checkpoint error for meter {job['meter'].get('meter_id')}: {checkpoint_error}")
+                raise
+        return run
+    
+    def _read_meter_history(self, job: Dict) -> Dict:
+        """DB read: latest two readings"""
+        if self._reached(job, 'billed'):
+            return job
+        meter = job['meter']
+        readings = self.db.get_historical_readings(meter['meter_id'], limit=2)
+        
+        if len(readings) < 2:
+            logger.warning(f"Not enough readings for meter {meter['meter_id']}")
+            self._checkpoint(job, 'skipped', error='Not enough readings')
+            return None
+        
+        job['readings'] = readings
+        return job
+    
+    def _calculate_meter_bill(self, job: Dict) -> Dict:
+        """Compute: bill amount from the two readings and the flat's motor share"""
+        if self._reached(job, 'billed'):
+            return job
+        meter, readings = job['meter'], job['readings']
+        # Water-motor share for the month of the latest reading (one
+        # cached allocation per month for the whole run)
+        allocation = self.db.get_flat_motor_allocation(
+            readings[0].get('reading_date'), meter_id=meter['meter_id'], customer_id=meter['customer_id']
+        )
+        job['calculation'] = self.ai_service.calculate_bill(
+            current_reading=readings[0]['reading_value'],
+            previous_reading=readings[1]['reading_value'],
+            meter_id=meter['meter_id'],
+            customer_id=meter['customer_id'],
+            connected_load_kw=meter.get('connected_load_kw', 7.0),
+            tariff_type=meter.get('tariff_type', 'residential'),
+            motor_units=allocation.get('motor_units', 0.0),
+            total_flat_units_for_motor=allocation.get('total_flat_units_for_motor', 0.0)
+        )
+        return job
+    
+    def _store_meter_bill(self, job: Dict) -> Dict:
+        """DB write: insert the bill (or reuse one from an earlier run)"""
+        if self._reached(job, 'billed'):
+            return job
+        item = job.get('item')
+        
+        # A bill already created for this meter and period by an earlier
+        # run is reused instead of hitting create_bill's duplicate path,
+        # and a customer that run already notified is not notified again.
+        previous = self.db.find_billed_run_item(item['idempotency_key']) if item else None
+        if previous is not None:
+            logger.info(f"Reusing bill {previous['bill_id']} for meter {job['meter']['meter_id']} from an earlier run")
+            fields = {
+                'bill_id': previous['bill_id'],
+                'amount': previous.get('amount'),
+                'due_date': previous.get('due_date'),
+                'error': None,
             }
-            
-            bill = self.db.create_bill(bill_data)
-            
-            # Create payment link
-            payment_link = self.payment_service.create_payment_link(
-                amount=bill_calculation['total_amount'],
-                bill_id=bill['id'],
-                customer_id=meter['customer_id'],
-                meter_id=meter['meter_id'],
-                description=f"Electricity Bill - {meter['meter_id']}"
-            )
-            
-            # Update bill with payment link
-            self.db.update_bill_payment_info(
-                bill_id=bill['id'],
-                payment_link=payment_link['url'],
-                payment_link_id=payment_link['id']
-            )
-            
-            # Send notification
-            result = self.discord_service.send_bill_notification(
+            linked = previous.get('payment_link_id') and previous['state'] in ('linked', 'notified')
+            if linked:
+                fields.update(payment_link_id=previous['payment_link_id'], payment_link=previous.get('payment_link'))
+                state = 'notified' if previous['state'] == 'notified' else 'linked'
+            else:
+                state = 'billed'
+            self._checkpoint(job, state, **fields)
+            job.update(self._job_from_checkpoint(job['meter'], item))
+            job['reused'] = True
+            return job
+        
+        meter, readings, calculation = job['meter'], job['readings'], job['calculation']
+        bill_data = {
+            "customer_id": meter['customer_id'],
+            "meter_id": meter['meter_id'],
+            "billing_period_start": readings[1]['reading_date'],
+            "billing_period_end": readings[0]['reading_date'],
+            "consumption_kwh": calculation['consumption_kwh'],
+            "amount": calculation['total_amount'],
+            "status": "pending",
+            "created_at": datetime.now().isoformat()
+        }
+        # A crash between create_bill and the 'billed' checkpoint leaves a
+        # stored bill with a pending checkpoint; pick that bill up rather
+        # than storing a second one under an alternate start date.
+        existing = self.db.find_bill_for_period(
+            meter['meter_id'], meter['customer_id'],
+            bill_data['billing_period_start'], bill_data['billing_period_end']
+        ) if item else None
+        if existing is not None:
+            logger.info(f"Found stored bill {existing['id']} for meter {meter['meter_id']}; resuming from it")
+            job['bill'] = existing
+            job['amount'] = float(existing.get('amount', existing.get('total_amount')) or 0)
+            job['due_date'] = str(existing.get('due_date') or existing.get('billing_period_end') or bill_data['billing_period_end'])[:10]
+        else:
+            job['bill'] = self.db.create_bill(bill_data)
+            job['amount'] = calculation['total_amount']
+            job['due_date'] = bill_data['billing_period_end']
+        self._checkpoint(
+            job, 'billed',
+            bill_id=job['bill']['id'], amount=job['amount'], due_date=job['due_date'], error=None
+        )
+        return job
+    
+    def _link_meter_bill(self, job: Dict) -> Dict:
+        """Stripe: payment link, then store it on the bill"""
+        if self._reached(job, 'linked'):
+            return job
+        meter, bill, item = job['meter'], job['bill'], job.get('item')
+        payment_link = self.payment_service.create_payment_link(
+            amount=job['amount'],
+            bill_id=bill['id'],
+            customer_id=meter['customer_id'],
+            meter_id=meter['meter_id'],
+            description=f"Electricity Bill - {meter['meter_id']}",
+            idempotency_key=item['idempotency_key'] if item else None
+        )
+        
+        self.db.update_bill_payment_info(
+            bill_id=bill['id'],
+            payment_link=payment_link['url'],
+            payment_link_id=payment_link['id']
+        )
+        job['payment_link'] = payment_link
+        self._checkpoint(
+            job, 'linked',
+            payment_link_id=payment_link['id'], payment_link=payment_link['url'], error=None
+        )
+        return job
+    
+    def _notify_meter_bill(self, job: Dict) -> Dict:
+        """Notification: post the bill to Discord"""
+        meter, bill = job['meter'], job['bill']
+        if not self._reached(job, 'notified'):
+            self.discord_service.send_bill_notification(
                 customer_id=meter['customer_id'],
                 bill_id=str(bill['id']),
-                amount=bill_calculation['total_amount'],
-                due_date=bill_data['billing_period_end'],
-                payment_link=payment_link['url']
+                amount=job['amount'],
+                due_date=job['due_date'],
+                payment_link=job['payment_link']['url']
             )
-            
-            return {
-                "id": bill['id'],
-                "amount": bill_calculation['total_amount'],
-                "consumption": bill_calculation['consumption_kwh']
-            }
-            
-        except Exception as e:
-            logger.error(f"Error generating bill for meter {meter['meter_id']}: {e}")
-            return None
+            self._checkpoint(job, 'notified', error=None)
+        
+        logger.info(f"Bill {'reused' if job.get('reused') else 'generated'} for meter {meter['meter_id']}: ₹{job['amount']}")
+        return {
+            "id": bill['id'],
+            "amount": job['amount'],
+            "consumption": job.get('calculation', {}).get('consumption_kwh'),
+            "reused": bool(job.get('reused'))
+        }
     
-    def _get_upcoming_due_bills(self, days: int = 3) -> List[Dict]:
+    def _get_due_window(self, days: int = DUE_WINDOW_DAYS) -> List[Dict]:
+        """Pending bills due on or before today + ``days``, overdue ones included.
+
+        One indexed due_date range query with a projected column set
+        (see DatabaseService.get_bills_due).
+        """
+        due_to = (date.today() + timedelta(days=days)).isoformat()
+        return self.db.get_bills_due(due_to=due_to)
+    
+    def _get_upcoming_due_bills(self, days: int = DUE_WINDOW_DAYS) -> List[Dict]:
         """Get bills due in next N days"""
         try:
-            from datetime import date, timedelta
-            
-            # Get all pending bills
-            all_bills = self.db.get_all_bills(status='pending')
-            
-            if not all_bills:
-                logger.info("No pending bills found")
-                return []
-            
-            # Filter bills due in next N days
-            upcoming_bills = []
-            today = date.today()
-            future_date = today + timedelta(days=days)
-            
-            for bill in all_bills:
-                try:
-                    # Parse the billing_period_end date
-                    due_date_str = bill.get('billing_period_end', '')
-                    if due_date_str:
-                        # Handle both date and datetime formats
-                        if 'T' in due_date_str:
-                            due_date = datetime.fromisoformat(due_date_str.replace('Z', '+00:00')).date()
-                        else:
-                            due_date = datetime.strptime(due_date_str[:10], '%Y-%m-%d').date()
-                        
-                        # Check if bill is due within the next N days
-                        if today <= due_date <= future_date:
-                            upcoming_bills.append(bill)
-                            logger.debug(f"Bill {bill['id']} due on {due_date} (in {(due_date - today).days} days)")
-                except Exception as e:
-                    logger.error(f"Error parsing date for bill {bill.get('id')}: {e}")
-                    continue
-            
+            today = date.today().isoformat()
+            upcoming_bills = [
+                bill for bill in self._get_due_window(days)
+                if str(bill['due_date'])[:10] >= today
+            ]
             logger.info(f"Found {len(upcoming_bills)} bills due in next {days} days")
             return upcoming_bills
             
@@ -441,47 +898,12 @@ Avoid late fees - pay today!"""
             logger.error(f"Error fetching upcoming bills: {e}")
             return []
     
-    def _get_overdue_bills(self) -> List[Dict]:
-        """Get bills past due date and still pending"""
-        try:
-            from datetime import date
-            
-            # Get all pending bills
-            all_bills = self.db.get_all_bills(status='pending')
-            
-            if not all_bills:
-                logger.info("No pending bills found")
-                return []
-            
-            # Filter overdue bills
-            overdue_bills = []
-            today = date.today()
-            
-            for bill in all_bills:
-                try:
-                    # Parse the billing_period_end date
-                    due_date_str = bill.get('billing_period_end', '')
-                    if due_date_str:
-                        # Handle both date and datetime formats
-                        if 'T' in due_date_str:
-                            due_date = datetime.fromisoformat(due_date_str.replace('Z', '+00:00')).date()
-                        else:
-                            due_date = datetime.strptime(due_date_str[:10], '%Y-%m-%d').date()
-                        
-                        # Check if bill is overdue
-                        if due_date < today:
-                            overdue_bills.append(bill)
-                            logger.debug(f"Bill {bill['id']} overdue by {(today - due_date).days} days")
-                except Exception as e:
-                    logger.error(f"Error parsing date for bill {bill.get('id')}: {e}")
-                    continue
-            
-            logger.info(f"Found {len(overdue_bills)} overdue bills")
-            return overdue_bills
-            
-        except Exception as e:
-            logger.error(f"Error fetching overdue bills: {e}")
-            return []
+    def _bill_customer_id(self, bill: Dict) -> str:
+        """Customer shown in notices: legacy customer_id, else the flat code"""
+        if bill.get('customer_id'):
+            return bill['customer_id']
+        flat = self.db.identity.get_flat(bill.get('flat_id')) or {}
+        return flat.get('code') or str(bill.get('flat_id'))
     
     def _get_customer_phone(self, customer_id: str) -> str:
         """Get customer phone number (would query customers table)"""
@@ -513,26 +935,27 @@ Avoid late fees - pay today!"""
             logger.error(f"Error calculating days overdue: {e}")
             return 0
     
-    def _simulate_meter_reading(self, meter: Dict) -> Dict:
-        """Simulate collecting a meter reading (in production, call real API)"""
-        # In production, this would call the smart meter API
-        # For now, just log that we would collect it
-        logger.info(f"Would collect reading from {meter.get('api_endpoint', 'N/A')}")
-        return None
-    
-    def run_job_now(self, job_id: str):
-        """Manually trigger a job (for testing)"""
+    def run_job_now(self, job_id: str, resume: bool = True):
+        """Manually trigger a job (for testing)
+
+        ``resume`` applies to monthly bill generation: continue the
+        unfinished run for the period (default) or start a new run.
+        """
         job = self.scheduler.get_job(job_id)
         if job:
-            logger.info(f"Manually triggering job: {job_id}")
-            job.func()
-            return {"success": True, "job": job_id}
+            logger.info(f"Manually triggering job: {job_id} (resume={resume})")
+            # A manual trigger runs here, whichever process leads
+            if job_id == MONTHLY_BILLING_JOB:
+                result = self._run_recorded(job_id, 'manual', self.generate_monthly_bills, resume=resume)
+            else:
+                result = self._run_recorded(job_id, 'manual', getattr(job.func, '__wrapped__', job.func))
+            return {"success": True, "job": job_id, "resume": resume, "result": result}
         else:
             logger.error(f"Job not found: {job_id}")
             return {"success": False, "error": f"Job {job_id} not found"}
     
-    def get_job_status(self) -> List[Dict]:
-        """Get status of all scheduled jobs"""
+    def get_job_status(self, history: int = 10) -> List[Dict]:
+        """Get status of all scheduled jobs, with their last ``history`` runs"""
         from datetime import datetime
         jobs = self.scheduler.get_jobs()
         result = []
@@ -564,9 +987,35 @@ Avoid late fees - pay today!"""
                 "next_run": next_run_formatted,
                 "next_run_raw": job.next_run_time.isoformat() if job.next_run_time else None,
                 "time_until": time_until,
-                "trigger": str(job.trigger)
+                "trigger": str(job.trigger),
+                **self.get_job_history(job.id, limit=history)
             })
         return result
+    
+    def get_job_history(self, job_id: str, limit: int = 10) -> Dict:
+        """Recent runs of a job (newest first) and how the latest compares"""
+        if limit <= 0:
+            return {}
+        runs = self.db.get_job_runs(job_id, limit=limit)
+        return {
+            "last_run": runs[0] if runs else None,
+            "history": runs,
+            "trend": job_trend(runs)
+        }
+
+
+# Billing shard worker processes: one service set per process, built by
+# the pool initializer and reused for the shard it is given.
+_billing_worker: Optional[BillingScheduler] = None
+
+
+def _init_billing_worker() -> None:
+    global _billing_worker
+    _billing_worker = BillingScheduler.for_billing_worker()
+
+
+def _run_billing_shard(jobs: List[Dict]) -> Tuple[List[Dict], Dict]:
+    return _billing_worker._run_billing_jobs(jobs, samples=True)
 
 
 # Global scheduler instance
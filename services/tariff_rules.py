@@ -1,7 +1,127 @@
 """
 Synthetic tariff rules based on residential billing structure
 """
+from bisect import bisect_left
+from typing import TYPE_CHECKING, Dict, List, Tuple
 
+if TYPE_CHECKING:  # numpy is imported lazily, only by the array methods
+    import numpy as np
+
+
+class CompiledTariff:
+    """Immutable, pre-computed form of a tariff dict.
+
+    Tier capacities are turned into cumulative upper boundaries and the
+    charge for every fully consumed tier is summed up front, so the
+    energy charge for a consumption value is one binary search plus one
+    multiply-add instead of a walk over the tier dicts. Results are
+    identical to the original linear walk (same additions in the same
+    order). Build instances with ``TariffRules.compiled``.
+    """
+
+    __slots__ = (
+        "tariff_id", "name", "currency",
+        "tier_names", "rates", "lower_bounds", "upper_bounds", "cumulative_charges",
+        "_full_tiers",
+        "motor_charges", "common_area_maintenance", "grid_charges_per_kw",
+        "electricity_duty", "tax_on_sale", "_payment_terms",
+    )
+
+    def __init__(self, tariff: Dict):
+        set_ = object.__setattr__
+        set_(self, "tariff_id", tariff["id"])
+        set_(self, "name", tariff["name"])
+        set_(self, "currency", tariff["currency"])
+
+        names, rates, lowers, uppers, cumulative, full_tiers = [], [], [], [], [], []
+        consumed = 0.0
+        charged = 0.0
+        for tier in tariff["energy_tiers"]:
+            tier_max = tier["max_kwh"]
+            capacity = tier_max - tier["min_kwh"] + 1 if tier_max != float("inf") else float("inf")
+            names.append(tier["tier"])
+            rates.append(tier["rate"])
+            lowers.append(consumed)
+            cumulative.append(charged)
+            consumed += capacity
+            uppers.append(consumed)
+            if capacity != float("inf"):
+                amount = capacity * tier["rate"]
+                full_tiers.append((tier["tier"], round(capacity, 2), tier["rate"], round(amount, 2)))
+                charged += amount
+
+        set_(self, "tier_names", tuple(names))
+        set_(self, "rates", tuple(rates))
+        set_(self, "lower_bounds", tuple(lowers))
+        set_(self, "upper_bounds", tuple(uppers))
+        set_(self, "cumulative_charges", tuple(cumulative))
+        set_(self, "_full_tiers", tuple(full_tiers))
+
+        fixed = tariff["fixed_charges"]
+        set_(self, "motor_charges", fixed["motor_charges"])
+        set_(self, "common_area_maintenance", fixed["common_area_maintenance"])
+        set_(self, "grid_charges_per_kw", fixed["grid_charges_per_kw"])
+        set_(self, "electricity_duty", tariff["taxes"]["electricity_duty"])
+        set_(self, "tax_on_sale", tariff["taxes"].get("tax_on_sale", 0))
+        set_(self, "_payment_terms", tuple(tariff["payment_terms"].items()))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __repr__(self):
+        return f"CompiledTariff({self.tariff_id!r}, tiers={len(self.rates)})"
+
+    @property
+    def payment_terms(self) -> Dict:
+        return dict(self._payment_terms)
+
+    def _locate(self, consumption_kwh: float) -> Tuple[int, float]:
+        """Index of the tier the consumption ends in and the kWh used in it."""
+        index = bisect_left(self.upper_bounds, consumption_kwh)
+        return index, consumption_kwh - self.lower_bounds[index]
+
+    def energy_charge(self, consumption_kwh: float) -> float:
+        """Unrounded energy charge for one consumption value."""
+        if not consumption_kwh > 0:
+            return 0.0
+        index, kwh_in_tier = self._locate(consumption_kwh)
+        return self.cumulative_charges[index] + kwh_in_tier * self.rates[index]
+
+    def energy_charges(self, consumption_kwh) -> "np.ndarray":
+        """Energy charges for an array of consumption values, rounded to 2
+        decimals like ``calculate_energy_charges``."""
+        import numpy as np
+        from services.billing_engine import round2
+
+        consumption = np.asarray(consumption_kwh, dtype=float)
+        index = np.searchsorted(np.asarray(self.upper_bounds), consumption, side="left")
+        index = np.minimum(index, len(self.rates) - 1)
+        charge = (
+            np.asarray(self.cumulative_charges)[index]
+            + (consumption - np.asarray(self.lower_bounds)[index]) * np.asarray(self.rates)[index]
+        )
+        return round2(np.where(consumption > 0, charge, 0.0))
+
+    def tier_breakdown(self, consumption_kwh: float) -> List[Dict]:
+        """Per-tier kWh and amounts (only built when a caller shows them)."""
+        if not consumption_kwh > 0:
+            return []
+        index, kwh_in_tier = self._locate(consumption_kwh)
+        breakdown = [
+            {"tier": name, "kwh": kwh, "rate": rate, "amount": amount}
+            for name, kwh, rate, amount in self._full_tiers[:index]
+        ]
+        rate = self.rates[index]
+        breakdown.append({
+            "tier": self.tier_names[index],
+            "kwh": round(kwh_in_tier, 2),
+            "rate": rate,
+            "amount": round(kwh_in_tier * rate, 2)
+        })
+        return breakdown
 
 
 class TariffRules:
@@ -147,6 +267,19 @@ class TariffRules:
             cls.COMMERCIAL_STANDARD
         ]
 
+    # Compiled tariffs, keyed by tariff id (built on first use)
+    _compiled: Dict[str, CompiledTariff] = {}
+
+    @classmethod
+    def compiled(cls, tariff_type: str = "residential") -> CompiledTariff:
+        """Get the compiled form of a tariff (see CompiledTariff)"""
+        tariff = cls.get_tariff_by_type(tariff_type)
+        compiled = cls._compiled.get(tariff["id"])
+        if compiled is None:
+            compiled = CompiledTariff(tariff)
+            cls._compiled[tariff["id"]] = compiled
+        return compiled
+
     # ------------------------------------------------------------------
     # NEW FORMULA-BASED HELPERS
     # ------------------------------------------------------------------
@@ -251,49 +384,27 @@ class TariffRules:
         }
     
     @classmethod
-    def calculate_energy_charges(cls, consumption_kwh: float, tariff_type: str = "residential"):
+    def calculate_energy_charges(
+        cls,
+        consumption_kwh: float,
+        tariff_type: str = "residential",
+        include_breakdown: bool = True
+    ):
         """
         Calculate energy charges based on tiered pricing
         
         Args:
             consumption_kwh: Total consumption in kWh
             tariff_type: Type of tariff (residential/commercial)
+            include_breakdown: Build the per-tier breakdown (empty list if False)
         
         Returns:
             dict with tier breakdown and total
         """
-        tariff = cls.get_tariff_by_type(tariff_type)
-        tiers = tariff["energy_tiers"]
-        
-        tier_breakdown = []
-        remaining_kwh = consumption_kwh
-        total_energy_charge = 0.0
-        
-        for tier in tiers:
-            if remaining_kwh <= 0:
-                break
-            
-            # Calculate kWh in this tier
-            tier_min = tier["min_kwh"]
-            tier_max = tier["max_kwh"]
-            tier_capacity = tier_max - tier_min + 1 if tier_max != float('inf') else float('inf')
-            
-            kwh_in_tier = min(remaining_kwh, tier_capacity)
-            tier_amount = kwh_in_tier * tier["rate"]
-            
-            tier_breakdown.append({
-                "tier": tier["tier"],
-                "kwh": round(kwh_in_tier, 2),
-                "rate": tier["rate"],
-                "amount": round(tier_amount, 2)
-            })
-            
-            total_energy_charge += tier_amount
-            remaining_kwh -= kwh_in_tier
-        
+        tariff = cls.compiled(tariff_type)
         return {
-            "tier_breakdown": tier_breakdown,
-            "total_energy_charge": round(total_energy_charge, 2)
+            "tier_breakdown": tariff.tier_breakdown(consumption_kwh) if include_breakdown else [],
+            "total_energy_charge": round(tariff.energy_charge(consumption_kwh), 2)
         }
     
     @classmethod
@@ -302,7 +413,8 @@ class TariffRules:
         consumption_kwh: float,
         connected_load_kw: float = 7.0,
         tariff_type: str = "residential",
-        previous_outstanding: float = 0.0
+        previous_outstanding: float = 0.0,
+        include_breakdown: bool = True
     ):
         """
         Calculate complete bill amount
@@ -312,27 +424,27 @@ class TariffRules:
             connected_load_kw: Connected load in kW
             tariff_type: Type of tariff
             previous_outstanding: Previous outstanding amount
+            include_breakdown: Build the per-tier energy breakdown
         
         Returns:
             Complete bill breakdown
         """
-        tariff = cls.get_tariff_by_type(tariff_type)
+        tariff = cls.compiled(tariff_type)
         
         # Energy charges
-        energy_calc = cls.calculate_energy_charges(consumption_kwh, tariff_type)
-        energy_charges = energy_calc["total_energy_charge"]
+        energy_charges = round(tariff.energy_charge(consumption_kwh), 2)
         
         # Fixed charges
-        motor_charges = tariff["fixed_charges"]["motor_charges"]
-        grid_charges = connected_load_kw * tariff["fixed_charges"]["grid_charges_per_kw"]
-        common_area_charges = tariff["fixed_charges"]["common_area_maintenance"]
+        motor_charges = tariff.motor_charges
+        grid_charges = connected_load_kw * tariff.grid_charges_per_kw
+        common_area_charges = tariff.common_area_maintenance
         
         # Subtotal before taxes
         subtotal = energy_charges + motor_charges + grid_charges + common_area_charges
         
         # Taxes
-        electricity_duty = energy_charges * tariff["taxes"]["electricity_duty"]
-        tax_on_sale = subtotal * tariff["taxes"].get("tax_on_sale", 0)
+        electricity_duty = energy_charges * tariff.electricity_duty
+        tax_on_sale = subtotal * tariff.tax_on_sale
         
         # Total charges
         total_charges = subtotal + electricity_duty + tax_on_sale
@@ -344,11 +456,11 @@ class TariffRules:
             "consumption_kwh": round(consumption_kwh, 2),
             "connected_load_kw": connected_load_kw,
             "tariff_type": tariff_type,
-            "tariff_name": tariff["name"],
+            "tariff_name": tariff.name,
             
             # Energy charges breakdown
             "energy_charges": {
-                "tier_breakdown": energy_calc["tier_breakdown"],
+                "tier_breakdown": tariff.tier_breakdown(consumption_kwh) if include_breakdown else [],
                 "total": round(energy_charges, 2)
             },
             
@@ -373,8 +485,8 @@ class TariffRules:
             "previous_outstanding": round(previous_outstanding, 2),
             "amount_payable": round(amount_payable, 2),
             
-            "currency": tariff["currency"],
-            "payment_terms": tariff["payment_terms"]
+            "currency": tariff.currency,
+            "payment_terms": tariff.payment_terms
         }
 
 
@@ -0,0 +1,267 @@
+"""
+What-if tariff simulation over the full reading history.
+
+Before rates or BHK fixed charges change in PricingService, this
+replays every past month of readings against candidate pricing and
+reports what revenue would have been, per month and per flat type,
+compared with today's pricing.
+
+The history is loaded once into columns (one row per flat per month,
+with its water-motor share inputs and current pricing). Each scenario
+is then a handful of vectorised billing operations, and scenarios run
+in parallel worker processes:
+
+    history = load_billing_history(DatabaseService())
+    report = simulate_tariffs(history, [
+        TariffScenario.from_dict({"name": "13 rupees", "rates": {"12": 13}}),
+        TariffScenario.from_dict({"name": "5BHK 2500", "bhk_fixed": {"5": 2500}}),
+    ])
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from services.billing_engine import calculate_bills_batch
+from services.motor_allocation import active_motor_by_flat, allocate_motor_shares, month_bounds
+from services.pricing_service import PricingService
+from utils.logger import setup_logger
+
+logger = setup_logger('tariff_simulation')
+
+
+class TariffScenario(NamedTuple):
+    """Candidate pricing to replay the history against.
+
+    ``rates`` maps a current per-unit rate to the candidate rate, e.g.
+    ``((12.0, 13.0),)`` raises standard units and leaves 9₹ units
+    alone. ``bhk_fixed`` replaces the fixed charge for those BHK counts
+    (9₹ units never carry a fixed charge).
+    """
+
+    name: str
+    rates: Tuple[Tuple[float, float], ...] = ()
+    bhk_fixed: Tuple[Tuple[int, float], ...] = ()
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'TariffScenario':
+        """Build a scenario from JSON such as
+        ``{"name": "...", "rates": {"12": 13}, "bhk_fixed": {"5": 2500}}``.
+
+        Raises ValueError on malformed input.
+        """
+        if not isinstance(data, dict) or not str(data.get('name') or '').strip():
+            raise ValueError("Each scenario needs a name")
+        try:
+            rates = tuple(sorted((float(k), float(v)) for k, v in (data.get('rates') or {}).items()))
+            bhk_fixed = tuple(sorted((int(k), float(v)) for k, v in (data.get('bhk_fixed') or {}).items()))
+        except (AttributeError, TypeError, ValueError):
+            raise ValueError(f"Invalid rates/bhk_fixed in scenario {data.get('name')!r}")
+        return cls(str(data['name']).strip(), rates, bhk_fixed)
+
+
+class BillingHistory(NamedTuple):
+    """Columnar billing inputs: one row per flat per month with readings."""
+
+    months: Tuple[str, ...]
+    flat_types: Tuple[str, ...]
+    month_index: np.ndarray
+    type_index: np.ndarray
+    flat_units: np.ndarray
+    motor_units: np.ndarray
+    total_flat_units_for_motor: np.ndarray
+    rate_per_unit: np.ndarray
+    fixed_charge: np.ndarray
+    # BHK count from the flat type (-1 when unknown) and whether BHK
+    # fixed charges apply to the flat (not for 9₹ units)
+    bhk: np.ndarray
+    bhk_eligible: np.ndarray
+
+
+def load_billing_history(db) -> BillingHistory:
+    """Stream every reading once and build the columnar history.
+
+    Units are summed per (month, flat) and (month, motor) in one pass;
+    each month's motor shares come from the flat_motors rows active in
+    that month.
+    """
+    meters = {m['id']: m for m in db.identity.meters()}
+    flat_units: Dict[str, Dict[int, float]] = {}
+    motor_units: Dict[str, Dict[int, float]] = {}
+    for row in db.iter_readings(columns='meter_id, reading_date, consumption'):
+        meter = meters.get(row.get('meter_id'))
+        if meter is None or not row.get('reading_date'):
+            continue
+        month = str(row['reading_date'])[:7]
+        units = float(row.get('consumption') or 0)
+        if meter.get('flat_id') is not None:
+            bucket = flat_units.setdefault(month, {})
+            bucket[meter['flat_id']] = bucket.get(meter['flat_id'], 0.0) + units
+        elif meter.get('motor_id') is not None:
+            bucket = motor_units.setdefault(month, {})
+            bucket[meter['motor_id']] = bucket.get(meter['motor_id'], 0.0) + units
+
+    flat_motors = db.get_flat_motors()
+    months = tuple(sorted(flat_units))
+    flat_types: List[str] = []
+    type_positions: Dict[str, int] = {}
+    pricing: Dict[int, Tuple[str, float, float, int, bool]] = {}
+
+    def flat_pricing(flat_id: int) -> Tuple[str, float, float, int, bool]:
+        """(flat type, rate, fixed charge, BHK count, BHK-eligible) under current pricing"""
+        if flat_id not in pricing:
+            flat = db.identity.get_flat(flat_id) or {}
+            type_name = db.identity.flat_type_name(flat.get('type_id')) or 'Unknown'
+            code = flat.get('code') or ''
+            unit_id = f"{type_name}-{code}" if type_name != 'Unknown' else code
+            rate, fixed = PricingService.get_pricing_for_flat(unit_id)
+            info = PricingService.pricing_index().get(PricingService.normalize_flat_code(code) or '')
+            bhk = PricingService.extract_bhk_from_identifier(type_name)
+            pricing[flat_id] = (type_name, rate, fixed, bhk if bhk is not None else -1, bool(info and info.bhk_fixed))
+        return pricing[flat_id]
+
+    columns: Dict[str, list] = {name: [] for name in BillingHistory._fields[2:]}
+    for month_position, month in enumerate(months):
+        start, end = month_bounds(f"{month}-01")
+        allocations = allocate_motor_shares(
+            active_motor_by_flat(flat_motors, start, end), flat_units[month], motor_units.get(month, {})
+        )
+        for flat_id in sorted(flat_units[month]):
+            allocation = allocations[flat_id]
+            type_name, rate, fixed, bhk, eligible = flat_pricing(flat_id)
+            if type_name not in type_positions:
+                type_positions[type_name] = len(flat_types)
+                flat_types.append(type_name)
+            columns['month_index'].append(month_position)
+            columns['type_index'].append(type_positions[type_name])
+            columns['flat_units'].append(flat_units[month][flat_id])
+            columns['motor_units'].append(allocation['motor_units'])
+            columns['total_flat_units_for_motor'].append(allocation['total_flat_units_for_motor'])
+            columns['rate_per_unit'].append(rate)
+            columns['fixed_charge'].append(fixed)
+            columns['bhk'].append(bhk)
+            columns['bhk_eligible'].append(eligible)
+
+    logger.info(f"Loaded billing history: {len(columns['month_index'])} flat-months over {len(months)} months")
+    return BillingHistory(
+        months=months,
+        flat_types=tuple(flat_types),
+        month_index=np.asarray(columns['month_index'], dtype=np.int64),
+        type_index=np.asarray(columns['type_index'], dtype=np.int64),
+        flat_units=np.asarray(columns['flat_units'], dtype=float),
+        motor_units=np.asarray(columns['motor_units'], dtype=float),
+        total_flat_units_for_motor=np.asarray(columns['total_flat_units_for_motor'], dtype=float),
+        rate_per_unit=np.asarray(columns['rate_per_unit'], dtype=float),
+        fixed_charge=np.asarray(columns['fixed_charge'], dtype=float),
+        bhk=np.asarray(columns['bhk'], dtype=np.int64),
+        bhk_eligible=np.asarray(columns['bhk_eligible'], dtype=bool),
+    )
+
+
+def scenario_revenue(history: BillingHistory, scenario: TariffScenario) -> np.ndarray:
+    """Billed revenue per (month, flat type) cell under a scenario.
+
+    Returns a ``len(months) x len(flat_types)`` array.
+    """
+    rate = history.rate_per_unit.copy()
+    for current, candidate in scenario.rates:
+        rate[np.isclose(history.rate_per_unit, current)] = candidate
+    fixed = history.fixed_charge.copy()
+    for bhk, candidate in scenario.bhk_fixed:
+        fixed[(history.bhk == bhk) & history.bhk_eligible] = candidate
+
+    bills = calculate_bills_batch(
+        flat_units=history.flat_units,
+        motor_units=history.motor_units,
+        total_flat_units_for_motor=history.total_flat_units_for_motor,
+        rate_per_unit=rate,
+        fixed_charge=fixed,
+    )
+    shape = (len(history.months), len(history.flat_types))
+    cells = history.month_index * shape[1] + history.type_index
+    revenue = np.bincount(cells, weights=bills['total_amount'], minlength=shape[0] * shape[1])
+    return revenue.reshape(shape)
+
+
+# Set once per worker process by the pool initializer, so the history
+# is pickled to each worker once rather than with every scenario.
+_worker_history: Optional[BillingHistory] = None
+
+
+def _init_worker(history: BillingHistory) -> None:
+    global _worker_history
+    _worker_history = history
+
+
+def _simulate_in_worker(scenario: TariffScenario) -> np.ndarray:
+    return scenario_revenue(_worker_history, scenario)
+
+
+def simulate_tariffs(
+    history: BillingHistory,
+    scenarios: Sequence[TariffScenario],
+    max_workers: Optional[int] = None
+) -> Dict:
+    """Revenue of each scenario against current pricing.
+
+    Scenarios run in a process pool (``max_workers`` defaults to the
+    CPU count; 0 runs them in this process). Returns baseline and
+    per-scenario totals plus per-month, per-flat-type revenue deltas.
+    """
+    baseline = scenario_revenue(history, TariffScenario('baseline'))
+
+    workers = (os.cpu_count() or 1) if max_workers is None else max_workers
+    workers = min(workers, len(scenarios))
+    if workers > 1:
+        # Spawn, not fork: callers such as the Flask app run scheduler,
+        # audit and pool threads that a forked child would inherit
+        # mid-operation.
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(history,)
+        ) as executor:
+            results = list(executor.map(_simulate_in_worker, scenarios))
+    else:
+        results = [scenario_revenue(history, scenario) for scenario in scenarios]
+
+    baseline_total = float(baseline.sum())
+    report = {
+        'months': list(history.months),
+        'flat_types': list(history.flat_types),
+        'flat_months': int(len(history.month_index)),
+        'baseline_revenue': round(baseline_total, 2),
+        'scenarios': [],
+    }
+    for scenario, revenue in zip(scenarios, results):
+        delta = revenue - baseline
+        total = float(revenue.sum())
+        cells = []
+        for m, month in enumerate(history.months):
+            for t, flat_type in enumerate(history.flat_types):
+                if baseline[m, t] or revenue[m, t]:
+                    cells.append({
+                        'month': month,
+                        'flat_type': flat_type,
+                        'baseline': round(float(baseline[m, t]), 2),
+                        'revenue': round(float(revenue[m, t]), 2),
+                        'delta': round(float(delta[m, t]), 2),
+                    })
+        report['scenarios'].append({
+            'name': scenario.name,
+            'rates': dict(scenario.rates),
+            'bhk_fixed': dict(scenario.bhk_fixed),
+            'revenue': round(total, 2),
+            'delta': round(total - baseline_total, 2),
+            'delta_pct': round((total - baseline_total) / baseline_total * 100, 2) if baseline_total else None,
+            'by_month': cells,
+        })
+
+    logger.info(
+        f"Simulated {len(scenarios)} tariff scenarios over {report['flat_months']} flat-months "
+        f"({max(workers, 1)} processes)"
+    )
+    return report
@@ -8,6 +8,8 @@ import services.database_service
 importlib.reload(services.database_service)
 from services import DatabaseService, TariffRules
 from services.pricing_service import PricingService
+from services.motor_allocation import month_bounds
+from services.async_database_service import AsyncDatabaseService
 from services.graph_service import GraphService
 import openai
 from services.graph_service import GraphService
@@ -29,6 +31,13 @@ def get_db_service(ttl_hash=None):
 
 db = get_db_service(ttl_hash="v4")
 
+
+@st.cache_resource
+def get_async_db_service(_db):
+    return AsyncDatabaseService(_db)
+
+adb = get_async_db_service(db)
+
 FLAT_REGISTRY_PATH = Path("data/meter_registry.json")
 PHOTO_INDEX_PATH = Path("data/meter_photo_links.json")
 
@@ -273,6 +282,7 @@ elif st.session_state.user_role == "admin_login":
 elif st.session_state.user_role == "field_engineer":
     # Initialize field engineer session flag
     if 'fe_initialized' not in st.session_state:
+        db.refresh_cache('readings', 'meters')
         st.cache_resource.clear()
         st.cache_data.clear()
         st.session_state.fe_initialized = True
@@ -322,6 +332,7 @@ elif st.session_state.user_role == "field_engineer":
         if st.button("🔄 Switch Role"):
             st.session_state.user_role = None
             if 'fe_initialized' in st.session_state: del st.session_state.fe_initialized
+            db.refresh_cache('readings', 'meters')
             st.cache_resource.clear()
             st.rerun()
         
@@ -332,6 +343,7 @@ elif st.session_state.user_role == "field_engineer":
         st.markdown("---")
         st.header("🎯 Quick Actions")
         if st.button("🔄 Refresh Data"):
+            db.refresh_cache('readings', 'meters')
             st.cache_resource.clear()
             st.rerun()
 
@@ -393,34 +405,19 @@ elif st.session_state.user_role == "field_engineer":
             # Update selected_flat_no variable for messages
             selected_flat_no = selected_meter_entry.get('flat_no', selected_base_flat)
 
-            # Try to resolve associated motor meter for this flat (via mapping tables)
+            # Resolve the motor meter for this flat from the society-wide
+            # motor allocation for the current month (cached, one load)
             motor_meter = None
             try:
                 flat_code_for_motor = selected_meter_entry.get("flat_no")
-                if flat_code_for_motor and hasattr(db, "supabase"):
-                    flat_resp = db.supabase.table('flats')\
-                        .select('id')\
-                        .eq('code', flat_code_for_motor)\
-                        .limit(1)\
-                        .execute()
-                    if flat_resp.data:
-                        flat_id = flat_resp.data[0]['id']
-                        fm_resp = db.supabase.table('flat_motors')\
-                            .select('motor_id, start_date')\
-                            .eq('flat_id', flat_id)\
-                            .order('start_date', desc=True)\
-                            .limit(1)\
-                            .execute()
-                        if fm_resp.data:
-                            motor_id = fm_resp.data[0]['motor_id']
-                            meter_resp = db.supabase.table('meters')\
-                                .select('id, meter_number')\
-                                .eq('motor_id', motor_id)\
-                                .eq('status', 'active')\
-                                .limit(1)\
-                                .execute()
-                            if meter_resp.data:
-                                motor_meter = meter_resp.data[0]
+                if flat_code_for_motor:
+                    flat_id = db.identity.flat_id_for_code(flat_code_for_motor)
+                    allocation = db.get_motor_allocations(*month_bounds(date.today())).get(flat_id) or {}
+                    if allocation.get('motor_meter_id') is not None:
+                        motor_meter = {
+                            'id': allocation['motor_meter_id'],
+                            'meter_number': allocation.get('motor_meter_number'),
+                        }
             except Exception as e:
                 st.warning(f"Could not load motor meter for {selected_flat_no}: {e}")
 
@@ -589,6 +586,7 @@ else:  # admin role
 
     # Initialize admin session flag
     if 'admin_initialized' not in st.session_state:
+        db.refresh_cache('bills', 'readings', 'meters')
         st.cache_resource.clear()
         st.cache_data.clear()
         st.session_state.admin_initialized = True
@@ -609,6 +607,7 @@ else:  # admin role
                 del st.session_state.fe_initialized
             if 'admin_initialized' in st.session_state:
                 del st.session_state.admin_initialized
+            db.refresh_cache('bills', 'readings', 'meters')
             st.cache_resource.clear()
             st.cache_data.clear()
             st.rerun()
@@ -623,6 +622,7 @@ else:  # admin role
         st.header("🎯 Quick Actions")
 
         if st.button("🔄 Refresh Data"):
+            db.refresh_cache('bills', 'readings', 'meters')
             st.cache_resource.clear()
             st.rerun()
 
@@ -663,6 +663,7 @@ else:  # admin role
         col1, col2 = st.columns([3, 1])
         with col2:
             if st.button("🔄 Refresh", key="refresh_neo4j_bills", width='stretch'):
+                db.refresh_cache('bills')
                 st.cache_resource.clear()
                 st.cache_data.clear()
                 st.rerun()
@@ -725,9 +726,23 @@ else:  # admin role
         if "approved_readings" not in st.session_state:
             st.session_state.approved_readings = set()
 
+        # The unbilled readings, bill status summary and unbilled count
+        # are independent queries, so load them concurrently.
+        dashboard = adb.gather_sync(
+            return_exceptions=True,
+            raw_readings=lambda: adb.get_unbilled_readings(limit=100),
+            bill_summary=lambda: adb.get_bill_status_summary(),
+            unbilled_count=lambda: adb.count_unbilled_readings(
+                min_value=0,
+                exclude_ids=list(st.session_state.approved_readings),
+            ),
+        )
+
         try:
             # Get unbilled readings and filter out 0-value readings (imported template data)
-            raw_readings = db.get_unbilled_readings(limit=100)
+            raw_readings = dashboard["raw_readings"]
+            if isinstance(raw_readings, Exception):
+                raise raw_readings
             # Filter: >0 value AND not in approved set
             pending_readings = [
                 r for r in raw_readings 
@@ -740,32 +755,28 @@ else:  # admin role
         new_readings_count = len(pending_readings)
 
         try:
-            all_bills = db.get_all_bills()
+            # Counts and sums per status are aggregated in the database
+            bill_summary = dashboard["bill_summary"]
+            if isinstance(bill_summary, Exception):
+                raise bill_summary
+            open_statuses = ["pending", "generated", "overdue"]
+
             # Count pending, generated, and overdue bills as invoices to be processed/paid
-            invoices = len([b for b in all_bills if b.get("status") in ["pending", "generated", "overdue"]])
+            invoices = sum(bill_summary.get(s, {}).get("count", 0) for s in open_statuses)
 
-            # Calculate overdue (unbilled readings) manually to filter out 0-value imports AND approved readings
-            unbilled_all = db.get_unbilled_readings(limit=1000)
-            overdue = len([
-                r for r in unbilled_all
-                if float(r.get('reading_value', 0)) > 0
-                and r['id'] not in st.session_state.approved_readings
-            ])
+            # Count overdue (unbilled readings) server-side, excluding 0-value imports AND approved readings
+            overdue = dashboard["unbilled_count"]
+            if isinstance(overdue, Exception):
+                raise overdue
 
             # Use the bill's total_amount field for monetary summaries,
             # since the "amount" column is not populated in the current
             # Supabase schema.
-            total_paid = sum(
-                float(b.get("total_amount") or 0)
-                for b in all_bills
-                if b.get("status") == "paid"
-            )
+            total_paid = bill_summary.get("paid", {}).get("total_amount", 0.0)
 
             # Outstanding includes pending, generated, and overdue bills
             total_outstanding = sum(
-                float(b.get("total_amount") or 0)
-                for b in all_bills
-                if b.get("status") in ["pending", "generated", "overdue"]
+                bill_summary.get(s, {}).get("total_amount", 0.0) for s in open_statuses
             )
         except:
             invoices = overdue = total_paid = total_outstanding = 0
@@ -875,6 +886,21 @@ else:  # admin role
                 if m.get("meter_id") is not None
             }
             photo_links_index = load_photo_links_index()
+
+            # Motor share allocations per billing month, loaded once per
+            # month for the whole society rather than per reading
+            motor_allocations_by_month = {}
+
+            def motor_allocation_for(reading):
+                meter_row = db.identity.get_meter(reading.get("meter_id"), prefer_pk=True) or {}
+                period = month_bounds(reading.get("reading_date"))
+                if period not in motor_allocations_by_month:
+                    try:
+                        motor_allocations_by_month[period] = db.get_motor_allocations(*period)
+                    except Exception:
+                        motor_allocations_by_month[period] = {}
+                return motor_allocations_by_month[period].get(meter_row.get("flat_id")) or {}
+
             # Initialize session state for approved readings if not present
             if "approved_readings" not in st.session_state:
                 st.session_state.approved_readings = set()
@@ -939,7 +965,8 @@ else:  # admin role
                     except Exception:
                         rate_per_unit, total_fixed = 12.0, 0.0
 
-                    # Calculate estimated bill using simple formula (no motor share here)
+                    # Calculate estimated bill using simple formula, including
+                    # this flat's share of its water motor for the month
                     try:
                         # Prefer the precomputed consumption from the new 'readings' table.
                         # However, some imported rows can have a negative/zero
@@ -956,10 +983,11 @@ else:  # admin role
                         if consumption < 0:
                             consumption = 0.0
 
+                        motor_allocation = motor_allocation_for(r)
                         simple_bill = TariffRules.calculate_simple_bill(
                             flat_units=consumption,
-                            motor_units=0.0,
-                            total_flat_units_for_motor=0.0,
+                            motor_units=motor_allocation.get("motor_units", 0.0),
+                            total_flat_units_for_motor=motor_allocation.get("total_flat_units_for_motor", 0.0),
                             rate_per_unit=rate_per_unit,
                             fixed_charge=total_fixed,
                         )
@@ -1276,6 +1304,15 @@ else:  # admin role
                     # workflow reading already represents the total
                     # units for the period.
                     consumption = current_val
+
+                    # Water-motor share for this flat's month
+                    try:
+                        wf_flat_id = db.identity.flat_id_for_code(wf_customer_id)
+                        wf_motor_allocation = db.get_motor_allocations(
+                            *month_bounds(wf_reading_date)
+                        ).get(wf_flat_id) or {}
+                    except Exception:
+                        wf_motor_allocation = {}
                 
                     bill_calculation = ai_service.calculate_bill(
                         current_reading=current_val,
@@ -1286,6 +1323,8 @@ else:  # admin role
                         customer_id=wf_customer_id,
                         rate_per_unit=rate_per_unit,
                         fixed_charge=fixed_charge,
+                        motor_units=wf_motor_allocation.get("motor_units", 0.0),
+                        total_flat_units_for_motor=wf_motor_allocation.get("total_flat_units_for_motor", 0.0),
                     )
                 
                     st.success(
@@ -1593,7 +1632,7 @@ else:  # admin role
             meter_by_flat_map = {}
 
             try:
-                if getattr(db, "use_supabase", False) and hasattr(db, "supabase"):
+                if getattr(db, "identity", None) is not None:
                     flat_ids = {
                         _safe_int(b.get("flat_id"))
                         for b in pending_bills
@@ -1605,46 +1644,16 @@ else:  # admin role
                         if _safe_int(b.get("meter_id")) is not None
                     }
 
-                    # Fetch flat details (code, floor, type) to build
-                    # unit IDs like "5BHK-B17-FF" and flat codes like
-                    # "B17-FF".
+                    # Flat details (code, floor, type) to build unit IDs
+                    # like "5BHK-B17-FF" and flat codes like "B17-FF" come
+                    # from the in-memory identity registry, so no queries
+                    # are issued here.
                     if flat_ids:
-                        flats_resp = (
-                            db.supabase
-                            .table("flats")
-                            .select("id, code, floor_id, type_id")
-                            .in_("id", list(flat_ids))
-                            .execute()
-                        )
-                        flats_data = flats_resp.data or []
-
-                        floor_ids = {f.get("floor_id") for f in flats_data if f.get("floor_id") is not None}
-                        type_ids = {f.get("type_id") for f in flats_data if f.get("type_id") is not None}
-
-                        floor_map = {}
-                        flat_type_map = {}
-
-                        if floor_ids:
-                            floors_resp = (
-                                db.supabase
-                                .table("floors")
-                                .select("id, code")
-                                .in_("id", list(floor_ids))
-                                .execute()
-                            )
-                            for row in floors_resp.data or []:
-                                floor_map[row["id"]] = row.get("code")
-
-                        if type_ids:
-                            types_resp = (
-                                db.supabase
-                                .table("flat_types")
-                                .select("id, name")
-                                .in_("id", list(type_ids))
-                                .execute()
-                            )
-                            for row in types_resp.data or []:
-                                flat_type_map[row["id"]] = row.get("name")
+                        flats_data = [
+                            f for f in (db.identity.get_flat(fid) for fid in flat_ids) if f
+                        ]
+                        floor_map = db.identity.floor_map()
+                        flat_type_map = db.identity.flat_type_map()
 
                         for row in flats_data:
                             fid = row["id"]
@@ -1669,25 +1678,18 @@ else:  # admin role
                                 "unit_id": unit_id or code or str(fid),
                             }
 
-                    # Fetch meter numbers for the meters referenced by
+                    # Look up meter numbers for the meters referenced by
                     # these unpaid bills, and also prepare a
                     # flat_id → meter_number fallback map so that even
                     # bills without an explicit meter_id can still
                     # show a meter number.
                     if meter_ids or flat_ids:
-                        meters_query = (
-                            db.supabase
-                            .table("meters")
-                            .select("id, meter_number, flat_id, status")
-                        )
-
-                        if meter_ids:
-                            meters_query = meters_query.in_("id", list(meter_ids))
-                        if flat_ids:
-                            meters_query = meters_query.in_("flat_id", list(flat_ids))
-
-                        meters_resp = meters_query.execute()
-                        for m in meters_resp.data or []:
+                        bill_meters = [
+                            m for m in db.identity.meters()
+                            if (not meter_ids or m.get("id") in meter_ids)
+                            and (not flat_ids or m.get("flat_id") in flat_ids)
+                        ]
+                        for m in bill_meters:
                             mid = m.get("id")
                             mnum = m.get("meter_number") or (str(mid) if mid is not None else None)
                             if mid is not None and mnum:
@@ -1850,6 +1852,7 @@ else:  # admin role
         with col3:
             st.write("")
             if st.button("🔄 Refresh", use_container_width=True):
+                db.refresh_cache('readings')
                 st.cache_resource.clear()
                 st.rerun()
 
@@ -1878,15 +1881,16 @@ else:  # admin role
                     st.error("❌ Neo4j is not connected. Please check your configuration.")
                 else:
                     with st.spinner("Syncing readings to Neo4j..."):
-                        readings = db.get_all_readings(limit=10000)  # Get all readings
+                        # Stream readings page by page rather than loading them all
+                        readings = db.iter_readings(page_size=1000)
+
+                        # Delegate to the Neo4j service utility which already
+                        # understands the new schema (unit_id, meter_id, etc.).
+                        result = neo4j_service.sync_readings_from_supabase(readings)
 
-                        if not readings:
+                        if result.get("success") and not result.get("total"):
                             st.warning("⚠️ No readings found in Supabase to sync.")
                         else:
-                            # Delegate to the Neo4j service utility which already
-                            # understands the new schema (unit_id, meter_id, etc.).
-                            result = neo4j_service.sync_readings_from_supabase(readings)
-
                             if result.get("success"):
                                 synced = result.get("synced", 0)
                                 deleted = result.get("deleted", 0)
@@ -1940,14 +1944,13 @@ else:  # admin role
                     st.info("💡 **Note:** All your bills are already in Supabase. Neo4j adds graph-based queries but is not required.")
                 else:
                     with st.spinner("Syncing bills to Neo4j..."):
-                        # Get all bills from Supabase
-                        all_bills = db.supabase.table('bills').select('*').execute()
-                        bills_data = all_bills.data if hasattr(all_bills, 'data') else []
+                        # Stream all bills from Supabase page by page
+                        bills_data = db.iter_bills(page_size=1000)
                         
-                        if bills_data:
-                            # Sync to Neo4j
-                            result = neo4j_service.sync_bills_from_supabase(bills_data)
-                            
+                        # Sync to Neo4j
+                        result = neo4j_service.sync_bills_from_supabase(bills_data)
+                        
+                        if not result.get('success') or result.get('total'):
                             if result.get('success'):
                                 st.success("✅ Perfect Sync Complete!")
                                 
@@ -2564,8 +2567,10 @@ else:  # admin role
                         base_consumption=200.0
                     )
                 
-                    for reading in readings:
-                        db.insert_meter_reading(reading)
+                    outcomes = db.insert_meter_readings_bulk(readings)
+                    failed = [o for o in outcomes if o['status'] == 'error']
+                    if failed:
+                        raise Exception(failed[0].get('message'))
                 
                     st.success(f"✅ Generated {len(readings)} readings")
                     st.cache_resource.clear()